@@ -0,0 +1,90 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from matcha_dl.core.entities.configs import ConfigModel
+from matcha_dl.core.entities.dataset import MlpDataset
+from matcha_dl.core.values import MATCHERS
+from matcha_dl.impl.trainer import MLPTrainer
+
+
+def make_dataset(rows: int, seed: int = 42) -> MlpDataset:
+    """Builds a synthetic training set whose labels depend on the matcha scores."""
+    rng = np.random.default_rng(seed)
+
+    features = rng.random((rows, len(MATCHERS)), dtype=np.float32)
+    labels = (features.mean(axis=1) > 0.6).astype(np.float32)
+
+    dataframe = pd.DataFrame(
+        {
+            "SrcEntity": np.arange(rows, dtype=np.int32),
+            "TgtEntity": np.arange(rows, dtype=np.int32),
+            "Labels": labels,
+            "train": True,
+            "inference": False,
+        }
+    )
+
+    return MlpDataset(dataframe, features=features, ref=dataframe)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data-parallel CPU training")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch_size", type=int, default=8192)
+    parser.add_argument("--mode", type=str, default="batched")
+    args = parser.parse_args()
+
+    config = ConfigModel()
+    dataset = make_dataset(args.rows)
+
+    print(f"{'workers':>8} {'time (s)':>10} {'rows/sec':>14} {'speedup':>9}")
+
+    baseline = None
+
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+
+            model_params = {**config.model.params, "n": len(MATCHERS), "n_classes": 1}
+            model_params["layers"] = list(model_params["layers"])
+
+            trainer = MLPTrainer(
+                dataset=dataset,
+                model=config.model.model,
+                loss=config.loss.loss,
+                optimizer=config.optimizer.optimizer,
+                loss_params=config.loss.params,
+                optimizer_params=config.optimizer.params,
+                model_params=model_params,
+                device="cpu",
+                output_dir=Path(tmp_dir),
+                seed=config.seed,
+            )
+
+            start_time = time.perf_counter()
+            trainer.train(
+                epochs=args.epochs,
+                batch_size=args.batch_size,
+                save_interval=args.epochs,
+                mode=args.mode,
+                workers=workers,
+            )
+            elapsed_time = time.perf_counter() - start_time
+
+        baseline = baseline or elapsed_time
+        rows_per_sec = args.rows * args.epochs / elapsed_time
+
+        print(
+            f"{workers:>8} {elapsed_time:>10.2f} {rows_per_sec:>14,.0f} "
+            f"{baseline / elapsed_time:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
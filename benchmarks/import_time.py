@@ -0,0 +1,56 @@
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["torch", "pydantic", "jpype", "deeponto", "pandas"]
+
+PROBE = """
+import sys, time
+start_time = time.perf_counter()
+import matcha_dl
+elapsed_time = time.perf_counter() - start_time
+print(elapsed_time)
+print(",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def measure() -> tuple:
+    """Imports matcha_dl in a fresh interpreter and returns the import time and heavy modules."""
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.splitlines()
+
+    return float(out[-2]), [m for m in out[-1].split(",") if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time of matcha_dl")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--max_time", type=float, default=0.5, help="Fail if the median time exceeds it (s)"
+    )
+    args = parser.parse_args()
+
+    times, loaded = [], set()
+    for _ in range(args.runs):
+        elapsed_time, heavy = measure()
+        times.append(elapsed_time)
+        loaded.update(heavy)
+
+    median = statistics.median(times)
+
+    print(f"import matcha_dl: median {median * 1000:.1f} ms over {args.runs} runs")
+
+    if loaded:
+        sys.exit(f"Heavy modules imported eagerly: {sorted(loaded)}")
+
+    if median > args.max_time:
+        sys.exit(f"Import time regressed over {args.max_time} seconds")
+
+
+if __name__ == "__main__":
+    main()
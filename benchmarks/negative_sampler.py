@@ -0,0 +1,55 @@
+import argparse
+import time
+
+import numpy as np
+
+from matcha_dl.impl.negative_sampler import RandomNegativeSampler
+
+
+def legacy_sample(sources, targets, n_samples, seed):
+    """The previous RandomNegativeSampler.sample, kept as a baseline."""
+    random = np.random.RandomState(seed)
+
+    cands = {src: [cand for cand in targets if cand != trg] for src, trg in zip(sources, targets)}
+
+    if len(targets) < n_samples + 1:
+        return [[source, candidate, 0.0] for source in sources for candidate in cands[source]]
+
+    return [
+        [source, candidate, 0.0]
+        for source in sources
+        for candidate in random.choice(cands[source], n_samples, replace=False)
+    ]
+
+
+def timeit(fn, *args):
+    start_time = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark negative sampling against its size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000, 20000])
+    parser.add_argument("--n_samples", type=int, default=99)
+    parser.add_argument("--legacy_max", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'pairs':>8} {'legacy (s)':>12} {'vectorized (s)':>16} {'speedup':>10}")
+
+    for size in args.sizes:
+        sources = [f"http://source.org/onto#{i}" for i in range(size)]
+        targets = [f"http://target.org/onto#{i}" for i in range(size)]
+
+        sampler = RandomNegativeSampler(n_samples=args.n_samples, seed=42)
+        vectorized = timeit(sampler.sample, sources, targets)
+
+        if size <= args.legacy_max:
+            legacy = timeit(legacy_sample, sources, targets, args.n_samples, 42)
+            print(f"{size:>8} {legacy:>12.3f} {vectorized:>16.3f} {legacy / vectorized:>9.0f}x")
+        else:
+            print(f"{size:>8} {'-':>12} {vectorized:>16.3f} {'-':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.values import MATCHERS, N_CLASSES, SOURCE_COLUMN, TARGET_COLUMN
+from matcha_dl.delivery.server import RankingServer
+from matcha_dl.impl.models import MlpClassifier
+from matcha_dl.impl.service import RankingService
+
+
+def make_service(n_sources: int, n_candidates: int, seed: int = 42) -> RankingService:
+    """Builds a ranking service over synthetic matcha scores and an untrained model."""
+    rng = np.random.default_rng(seed)
+
+    sources = np.repeat([f"http://s.org#{i}" for i in range(n_sources)], n_candidates)
+    targets = [f"http://t.org#{i}" for i in rng.integers(0, n_sources, len(sources))]
+
+    scores = pd.DataFrame(rng.random((len(sources), len(MATCHERS))), columns=MATCHERS)
+    scores.insert(0, TARGET_COLUMN, targets)
+    scores.insert(0, SOURCE_COLUMN, sources)
+
+    model = MlpClassifier(layers=[128, 256, 128], n=len(MATCHERS), n_classes=N_CLASSES)
+
+    return RankingService(MatchaScores.from_frame(scores), model=model)
+
+
+async def post(host: str, port: int, path: str, payload=None) -> dict:
+    """Sends a single HTTP request over a new connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+
+    body = json.dumps(payload).encode() if payload is not None else b""
+    method = "POST" if payload is not None else "GET"
+
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+
+    return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def run(args, max_batch_size: int) -> dict:
+
+    service = make_service(args.sources, args.candidates)
+    server = RankingServer(
+        service, port=0, max_batch_size=max_batch_size, logger=logging.getLogger("benchmark")
+    )
+    await server.start()
+
+    rng = np.random.default_rng(0)
+    queries = [
+        {
+            "source": f"http://s.org#{rng.integers(args.sources)}",
+            "candidates": [f"http://t.org#{i}" for i in rng.integers(0, args.sources, 100)],
+        }
+        for _ in range(args.requests)
+    ]
+
+    # Rankings must not depend on the batches requests were scored in
+
+    expected = service.rank(queries[0]["source"], queries[0]["candidates"])
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def client(query):
+        async with semaphore:
+            return await post("127.0.0.1", server.port, "/rank", query)
+
+    start_time = time.perf_counter()
+    answers = await asyncio.gather(*(client(query) for query in queries))
+    elapsed_time = time.perf_counter() - start_time
+
+    assert [tuple(pair) for pair in answers[0]["ranking"]] == expected
+
+    metrics = await post("127.0.0.1", server.port, "/metrics")
+    await server.stop()
+
+    return {"requests/sec": args.requests / elapsed_time, **metrics}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the micro-batching ranking server")
+    parser.add_argument("--sources", type=int, default=10000)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max_batch_size", type=int, nargs="+", default=[1, 8, 64])
+    args = parser.parse_args()
+
+    print(f"{'batch':>6} {'req/sec':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'mean batch':>11}")
+
+    for max_batch_size in args.max_batch_size:
+        result = asyncio.run(run(args, max_batch_size))
+
+        print(
+            f"{max_batch_size:>6} {result['requests/sec']:>9.0f} "
+            f"{result['latency_p50_ms']:>9.2f} {result['latency_p99_ms']:>9.2f} "
+            f"{result['batch_size_mean']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.values import MATCHERS, SOURCE_COLUMN, TARGET_COLUMN
+
+
+def write_scores(path: Path, rows: int, candidates: int, seed: int = 42) -> None:
+    """Writes a synthetic matcha scores file with `candidates` targets per source."""
+    rng = np.random.default_rng(seed)
+
+    n_sources = max(rows // candidates, 1)
+    n_targets = max(n_sources, candidates)
+
+    sources = np.repeat(np.arange(n_sources), candidates)[:rows]
+    targets = rng.integers(0, n_targets, size=len(sources))
+
+    df = pd.DataFrame(
+        {
+            SOURCE_COLUMN: np.char.add("http://source.org/onto#", sources.astype(str)),
+            TARGET_COLUMN: np.char.add("http://target.org/onto#", targets.astype(str)),
+        }
+    )
+
+    for matcher in MATCHERS:
+        df[matcher] = rng.random(len(df), dtype=np.float32)
+
+    df.to_csv(path, index=False, float_format="%.6f")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the matcha scores loader")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--scores_file", type=str, required=False)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+
+        scores_file = Path(args.scores_file or Path(tmp_dir) / "matcha_scores.csv")
+
+        if not scores_file.is_file():
+            print(f"Writing {args.rows} synthetic rows to {scores_file}...")
+            write_scores(scores_file, args.rows, args.candidates)
+
+        start_time = time.perf_counter()
+        scores = MatchaScores.from_csv(str(scores_file))
+        elapsed_time = time.perf_counter() - start_time
+
+        print(f"Loaded {len(scores)} rows in {elapsed_time:.2f} seconds")
+        print(f"{len(scores) / elapsed_time:,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
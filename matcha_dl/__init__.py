@@ -1,19 +1,28 @@
+import importlib
 from pathlib import Path
 
-import yaml
-from deeponto import init_jvm
+MATCHA_DL_DIR = Path(__file__).parent
 
-import tarfile
-import os
-import urllib.request
+# Heavy dependencies (torch, pydantic, the JVM) are only imported by the submodules that use
+# them, so `import matcha_dl` stays cheap. Package attributes are resolved on first access.
 
-MATCHA_DL_DIR = Path(__file__).parent
+_LAZY_ATTRIBUTES = {
+    "AlignmentRunner": "matcha_dl.delivery.api",
+    "BatchAlignmentRunner": "matcha_dl.delivery.api",
+    "SweepRunner": "matcha_dl.delivery.api",
+    "RankingService": "matcha_dl.impl.service",
+    "RankingServer": "matcha_dl.delivery.server",
+}
 
-print(MATCHA_DL_DIR)
 
 # If matchaJar and dependencies don't exist, download them.
 
+
 def download_macha():
+    import os
+    import tarfile
+    import urllib.request
+
     url = "https://github.com/liseda-lab/Matcha-DL/releases/download/JARv0.1.0/matcha_jar.tar.gz"
     download_path = MATCHA_DL_DIR / "impl/matcha/"
     filename = download_path / "macha.tar.gz"
@@ -24,25 +33,26 @@ def download_macha():
 
     # Uncompress the tar.gz file
     print("Uncompressing Matcha-DL jar and dependencies...")
-    with tarfile.open(str(filename), 'r:gz') as tar_ref:
+    with tarfile.open(str(filename), "r:gz") as tar_ref:
         tar_ref.extractall(download_path)
 
     # Remove the tar.gz file
     os.remove(str(filename))
 
-# Check if the matcha directory exists
-if not (MATCHA_DL_DIR / "impl/matcha/matcha/").exists():
-    print("Matcha-DL jar and dependencies not found. Downloading...")
-    download_macha()
 
-# Init JVM to skip prompt
+def ensure_macha():
+    """Downloads the Matcha-DL jar and dependencies, if they don't exist yet."""
+    if not (MATCHA_DL_DIR / "impl/matcha/matcha/").exists():
+        print("Matcha-DL jar and dependencies not found. Downloading...")
+        download_macha()
 
-init_jvm("8G")
 
 ## Load default configuration file
 
 
 def read_yaml(file_path):
+    import yaml
+
     with open(file_path, "r") as file:
         return yaml.safe_load(file)
 
@@ -54,10 +64,20 @@ def get_config_path():
     return config_path
 
 
-## get current directory
+def __getattr__(name):
+    if name == "config":
+        value = read_yaml(get_config_path())
+
+    elif name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
 
-config = read_yaml(get_config_path())
+    return value
 
-# Get AlignmentRunner
 
-from .delivery.api import AlignmentRunner
+def __dir__():
+    return sorted({*globals(), "config", *_LAZY_ATTRIBUTES})
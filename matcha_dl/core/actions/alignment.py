@@ -1,18 +1,50 @@
 import logging
 import time
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Optional, Protocol
+from typing import ContextManager, Dict, Optional, Protocol, Tuple
 
-from deeponto import init_jvm
+from torch.utils.tensorboard import SummaryWriter
 
 from matcha_dl.core.entities.configs import ConfigModel
-from matcha_dl.core.values import N_CLASSES
+from matcha_dl.core.entities.dataset import MlpDataset
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.values import MATCHA_SCORES_FILE, N_CLASSES, PROCESSED_DATASET
+from matcha_dl.impl.cache import StageCache
+from matcha_dl.impl.dp.utils import read_table
 from matcha_dl.impl.matcha import Matcha
-from matcha_dl.impl.negative_sampler import RandomNegativeSampler
 from matcha_dl.impl.processor import MainProcessor
+from matcha_dl.impl.profiler import RUN_REPORT_FILE, Profiler
 from matcha_dl.impl.trainer import MLPTrainer
 
 
+def load_previous_run(
+    output_dir_path: str, logger: logging.Logger
+) -> Optional[Tuple[MatchaScores, MlpDataset]]:
+    """Loads the matcha scores and the processed dataset of a previous alignment in the output
+    directory, over a shared vocabulary.
+
+    Args:
+        output_dir_path (str): The output directory.
+        logger (logging.Logger): The logger.
+
+    Returns:
+        Optional[Tuple[MatchaScores, MlpDataset]]: The matcha scores and the dataset, None if
+            the output directory holds no previous alignment.
+    """
+
+    scores_file = Path(output_dir_path) / MATCHA_SCORES_FILE
+    dataset_file = Path(output_dir_path) / PROCESSED_DATASET
+
+    if not (scores_file.is_file() and MlpDataset.exists(dataset_file)):
+        logger.info(f"No previous alignment in {output_dir_path}, running a full alignment")
+        return None
+
+    matcha_scores = MatchaScores.from_csv(str(scores_file))
+
+    return matcha_scores, MlpDataset.load(dataset_file, vocab=matcha_scores.vocab)
+
+
 class AlignmentAction(Protocol):
     @staticmethod
     def run(
@@ -22,9 +54,12 @@ class AlignmentAction(Protocol):
         configs_file_path: Optional[str] = None,
         reference_file_path: Optional[str] = None,
         candidates_file_path: Optional[str] = None,
-    ) -> None:
+        jvm_slots: Optional[ContextManager] = None,
+        incremental: Optional[bool] = False,
+    ) -> Dict[str, float]:
 
         start_time = time.time()
+        profiler = Profiler()
 
         # Load Configs
 
@@ -44,46 +79,104 @@ class AlignmentAction(Protocol):
         if configs_file_path is not None:
             logger.info(f"Using configuration from {configs_file_path}")
         else:
-            logger.info(f"Using default configuration")
+            logger.info("Using default configuration")
+
+        # Shared stage cache
+
+        cache = StageCache(configs.cache_dir, configs.cache_size, logger=logger)
+
+        # Previous alignment, loaded before Matcha and processing overwrite its files
+
+        previous = None
 
-        # Load JVM
+        if incremental:
+            logger.info(f"Loading previous alignment from {output_dir_path}")
 
-        init_jvm(configs.matcha_params.max_heap)
+            with profiler.stage("previous_loading"):
+                previous = load_previous_run(output_dir_path, logger)
+
+        stream_scores = configs.stream_scores and previous is None
 
         # Matcha module
 
         logger.info(f"Matching {source_file_path} and {target_file_path}")
 
         matcha = Matcha(
-            output_file=str(Path(output_dir_path) / "matcha_scores.csv"),
+            output_file=str(Path(output_dir_path) / MATCHA_SCORES_FILE),
             log_file=str(Path(output_dir_path) / "matcha.log"),
             logger=logger,
+            cache=cache,
+            profiler=profiler,
             **configs.matcha_params.model_dump(),
         )
 
-        logger.info(f"Computing matcha scores...")
+        logger.info("Computing matcha scores...")
         logger.debug(f"Matcha logs are being written to {matcha.log_file}")
 
-        matcha_output_file, cache_ok = matcha.match(source_file_path, target_file_path)
+        ## Bound the number of concurrent Matcha JVMs when running in a batch
 
-        # Processor module
+        with profiler.stage("matcha"), jvm_slots if jvm_slots is not None else nullcontext():
+            matcha_output_file, _ = matcha.match(
+                source_file_path, target_file_path, block=not stream_scores
+            )
 
-        logger.info(f"Processing dataset..")
-        processor = MainProcessor(
-            sampler=RandomNegativeSampler(n_samples=configs.number_of_negatives, seed=configs.seed),
-            seed=configs.seed,
-            logger=logger,
-            cache_ok=cache_ok,
-        )
+            # Processor module
 
-        dataset = processor.process(
-            matcha_output_file,
-            reference_file_path,
-            candidates_file_path,
-            output_file=str(Path(output_dir_path) / "processed_dataset.csv"),
-        )
+            processor = MainProcessor(
+                sampler=configs.negative_sampler.sampler(
+                    n_samples=configs.number_of_negatives,
+                    seed=configs.seed,
+                    **configs.negative_sampler.params,
+                ),
+                seed=configs.seed,
+                logger=logger,
+                cache=cache,
+                scores_key=matcha.key,
+                profiler=profiler,
+            )
+
+            process_args = dict(
+                scores_file=matcha_output_file,
+                ref_file=reference_file_path,
+                cands_file=candidates_file_path,
+                output_file=str(Path(output_dir_path) / PROCESSED_DATASET),
+            )
+
+            ## Streaming overlaps processing with Matcha, so it is nested in the matcha stage
+
+            if stream_scores:
+                logger.info("Processing dataset while matcha scores are written..")
+
+                with profiler.stage("processing"):
+                    try:
+                        dataset = processor.process(**process_args, running=matcha.is_running)
+                    finally:
+                        matcha.wait()
+
+        if previous is not None:
+            logger.info("Updating dataset with the changed matcha scores and references..")
+
+            with profiler.stage("processing"):
+                previous_scores, previous_dataset = previous
 
-        logger.info(f"Dataset parsed")
+                matcha_scores = MatchaScores.from_csv(
+                    matcha_output_file, vocab=previous_dataset.vocab
+                )
+
+                dataset = processor.update(
+                    previous_dataset,
+                    matcha_scores.diff(previous_scores),
+                    matcha_scores=matcha_scores,
+                    **process_args,
+                )
+
+        elif not stream_scores:
+            logger.info("Processing dataset..")
+
+            with profiler.stage("processing"):
+                dataset = processor.process(**process_args)
+
+        logger.info("Dataset parsed")
 
         # Trainer module
 
@@ -98,6 +191,13 @@ class AlignmentAction(Protocol):
         else:
             model_params = configs.model.params
 
+        ## Early stopping
+
+        early_stopping = None
+
+        if reference_file_path is not None and configs.early_stopping.stopper is not None:
+            early_stopping = configs.early_stopping.stopper(**configs.early_stopping.params)
+
         ## Train Model
 
         trainer = MLPTrainer(
@@ -108,28 +208,84 @@ class AlignmentAction(Protocol):
             loss_params=configs.loss.params,
             optimizer_params=configs.optimizer.params,
             model_params=model_params,
-            earlystoping=None,
+            earlystoping=early_stopping,
             device=configs.device,
             output_dir=Path(output_dir_path),
             seed=configs.seed,
-            use_last_checkpoint=configs.use_last_checkpoint,
+            use_last_checkpoint=configs.use_last_checkpoint or previous is not None,
+            checkpoint_params=configs.checkpoint_params.model_dump(),
             logger=logger,
+            profiler=profiler,
         )
 
         if reference_file_path is not None:
             logger.info(f"Training model with {reference_file_path}")
-            trainer.train(**configs.training_params.model_dump())
 
-        logger.info(f"Computing alignment...")
+            training_params = configs.training_params.model_dump()
+
+            ## Fine-tune the model of the last checkpoint instead of training from scratch
+
+            if previous is not None and trainer.epoch > 1:
+                training_params["epochs"] = trainer.epoch - 1 + configs.incremental_params.epochs
+                logger.info(
+                    f"Fine-tuning the model of epoch {trainer.epoch - 1} for "
+                    f"{configs.incremental_params.epochs} epochs"
+                )
+
+            with profiler.stage("training"):
+                trainer.train(**training_params)
+
+            model_file = trainer.save_model()
+            logger.info(f"Model saved to {model_file}")
+
+            if configs.export_formats:
+                exported = trainer.export_model(configs.export_formats)
+                logger.info(f"Model exported to {', '.join(exported.values())}")
 
-        alignment = trainer.predict(threshold=configs.threshold)
+        logger.info("Computing alignment...")
 
-        logger.info(f"Writing alignment...")
+        previous_alignment = None
 
-        trainer.save_alignment(alignment)
+        if previous is not None and trainer.alignment_file.is_file():
+            previous_alignment = read_table(str(trainer.alignment_file))
+
+        with profiler.stage("alignment"):
+            alignment = trainer.predict(
+                threshold=configs.threshold, chunk_size=configs.inference_chunk_size
+            )
+
+            logger.info("Writing alignment...")
+
+            trainer.save_alignment(alignment, **configs.alignment_params.model_dump())
+
+            if previous_alignment is not None:
+                delta_file = trainer.save_alignment_delta(previous_alignment)
+                logger.info(f"Alignment delta written to {delta_file}")
 
         logger.info(f"Alignment written to {trainer.alignment_dir}")
 
         end_time = time.time()
         elapsed_time = end_time - start_time
         logger.info(f"Alignment completed in {elapsed_time} seconds")
+
+        # Run report
+
+        report_file = profiler.save(
+            Path(output_dir_path) / RUN_REPORT_FILE,
+            source=source_file_path,
+            target=target_file_path,
+            reference=reference_file_path,
+            candidates=candidates_file_path,
+            config=configs_file_path,
+        )
+
+        logger.info(f"Run report written to {report_file}")
+
+        if configs.run_report_tensorboard:
+            with SummaryWriter(trainer.logs_dir) as writer:
+                profiler.add_to_writer(writer)
+
+        timings = {name: stage["wall_time"] for name, stage in profiler.stages.items()}
+        timings["total"] = elapsed_time
+
+        return timings
@@ -0,0 +1,182 @@
+import logging
+import multiprocessing as mp
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol
+
+import pandas as pd
+
+from matcha_dl.core.actions.alignment import AlignmentAction
+from matcha_dl.core.entities.configs import ConfigModel, ManifestModel, PairModel
+
+STAGES = ["matcha", "processing", "training", "alignment", "total"]
+
+_SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+_JVM_SLOTS = None
+
+
+def parse_size(size: str) -> int:
+    """Parses a JVM style memory size, such as "64G" or "512m", into bytes."""
+    size = str(size).strip().upper()
+
+    if size[-1] in _SIZE_UNITS:
+        return int(float(size[:-1]) * _SIZE_UNITS[size[-1]])
+
+    return int(size)
+
+
+def _physical_memory() -> int:
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def _load_config(pair: PairModel) -> ConfigModel:
+    if pair.config_file is not None:
+        return ConfigModel.load_config(pair.config_file)
+    return ConfigModel()
+
+
+def _init_worker(jvm_slots: Any, num_threads: int) -> None:
+    global _JVM_SLOTS
+
+    import torch
+
+    _JVM_SLOTS = jvm_slots
+    torch.set_num_threads(num_threads)
+
+
+def _run_pair(pair: Dict[str, Any]) -> Dict[str, Any]:
+    """Aligns a single pair in a pool worker, reporting failures instead of raising them."""
+
+    report = {"name": pair["name"], "status": "done", "error": None}
+
+    try:
+        timings = AlignmentAction.run(
+            source_file_path=pair["source_ontology_file"],
+            target_file_path=pair["target_ontology_file"],
+            output_dir_path=pair["output_dir"],
+            configs_file_path=pair["config_file"],
+            reference_file_path=pair["reference_file"],
+            candidates_file_path=pair["candidates_file"],
+            jvm_slots=_JVM_SLOTS,
+        )
+        report.update(timings)
+
+    except Exception as e:
+        report.update(status="failed", error=f"{type(e).__name__}: {e}")
+        logging.getLogger("matcha-dl").debug(traceback.format_exc())
+
+    return report
+
+
+class BatchAlignmentAction(Protocol):
+    @staticmethod
+    def run(
+        manifest_file_path: str,
+        workers: Optional[int] = None,
+        memory_budget: Optional[str] = None,
+        report_file_path: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Aligns all the ontology pairs of a manifest across a pool of worker processes.
+
+        Every worker runs the whole pipeline of a pair, so the Matcha stage of a pair overlaps
+        with the processing and training stages of others. The number of concurrent Matcha
+        JVMs is bounded by the memory budget divided by the largest pair max_heap.
+
+        Args:
+            manifest_file_path (str): The path to the manifest file.
+            workers (int, optional): The number of worker processes. Defaults to the manifest
+                value, or the number of pairs bounded by the number of CPUs.
+            memory_budget (str, optional): The memory available to Matcha JVMs, e.g. "128G".
+                Defaults to the manifest value, or the physical memory.
+            report_file_path (str, optional): The tsv file the per-pair stage timings are
+                written to. Defaults to None.
+
+        Returns:
+            List[Dict[str, Any]]: The report of every pair, in manifest order.
+        """
+
+        start_time = time.time()
+
+        logger = logging.getLogger("matcha-dl")
+
+        manifest = ManifestModel.load_manifest(manifest_file_path)
+        pairs = [pair.model_dump() for pair in manifest.pairs]
+
+        if not pairs:
+            logger.info(f"No pairs found in {manifest_file_path}")
+            return []
+
+        for pair in pairs:
+            Path(pair["output_dir"]).mkdir(parents=True, exist_ok=True)
+
+        # Bound concurrent JVMs by the memory budget
+
+        matcha_params = [_load_config(pair).matcha_params for pair in manifest.pairs]
+
+        max_heap = max(parse_size(params.max_heap) for params in matcha_params)
+        memory_budget = memory_budget or manifest.memory_budget
+        budget = parse_size(memory_budget) if memory_budget else _physical_memory()
+
+        jvm_slots = max(1, budget // max_heap)
+
+        workers = workers or manifest.workers or min(len(pairs), os.cpu_count() or 1)
+
+        # Worker JVMs outlive the Matcha stage, so every worker holds a JVM slot
+
+        if any(params.engine == "worker" for params in matcha_params):
+            workers = min(workers, jvm_slots)
+
+        num_threads = max(1, (os.cpu_count() or 1) // workers)
+
+        logger.info(
+            f"Aligning {len(pairs)} pairs with {workers} workers and up to {jvm_slots} "
+            f"concurrent Matcha JVMs"
+        )
+
+        ctx = mp.get_context("spawn")
+
+        reports = {}
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(ctx.BoundedSemaphore(jvm_slots), num_threads),
+        ) as executor:
+
+            futures = {executor.submit(_run_pair, pair): i for i, pair in enumerate(pairs)}
+
+            for future in as_completed(futures):
+                report = future.result()
+                reports[futures[future]] = report
+
+                if report["status"] == "done":
+                    stages = ", ".join(
+                        f"{stage} {report[stage]:.1f}s" for stage in STAGES[:-1] if stage in report
+                    )
+                    logger.info(
+                        f"Pair {report['name']} aligned in {report['total']:.1f} seconds ({stages})"
+                    )
+                else:
+                    logger.error(f"Pair {report['name']} failed: {report['error']}")
+
+        reports = [reports[i] for i in range(len(pairs))]
+
+        elapsed_time = time.time() - start_time
+        done = sum(report["status"] == "done" for report in reports)
+
+        logger.info(
+            f"Batch completed in {elapsed_time:.1f} seconds, {done}/{len(pairs)} pairs aligned, "
+            f"{done / elapsed_time * 3600:.2f} pairs/hour"
+        )
+
+        if report_file_path is not None:
+            report = pd.DataFrame(reports, columns=["name", "status", *STAGES, "error"])
+            report.round(3).to_csv(report_file_path, sep="\t", index=False)
+            logger.info(f"Batch report written to {report_file_path}")
+
+        return reports
@@ -0,0 +1,297 @@
+import copy
+import json
+import logging
+import multiprocessing as mp
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol
+
+import pandas as pd
+
+from matcha_dl import read_yaml
+from matcha_dl.core.entities.configs import ConfigModel, SweepModel
+from matcha_dl.core.entities.dataset import MlpDataset
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.values import N_CLASSES
+from matcha_dl.impl.cache import StageCache
+from matcha_dl.impl.dp.metrics import VALIDATION_METRICS
+from matcha_dl.impl.matcha import Matcha
+from matcha_dl.impl.processor import MainProcessor
+from matcha_dl.impl.trainer import MLPTrainer
+
+SWEEP_DIR = "sweep"
+SWEEP_REPORT_FILE = "sweep_report.tsv"
+
+_DATASETS: List[MlpDataset] = []
+_CONFIGS: List[ConfigModel] = []
+
+
+def _sampling_key(configs: ConfigModel) -> str:
+    """Gets the settings a processed dataset depends on, trials sharing them share it."""
+
+    return json.dumps(
+        [
+            configs.negative_sampler.sampler.__name__,
+            configs.negative_sampler.params,
+            configs.number_of_negatives,
+            configs.seed,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+
+
+def _init_worker(datasets: List[MlpDataset], configs: List[ConfigModel], num_threads: int) -> None:
+    global _DATASETS, _CONFIGS
+
+    import torch
+
+    # Forked workers inherit the datasets, they are not pickled
+
+    _DATASETS = datasets
+    _CONFIGS = configs
+    torch.set_num_threads(num_threads)
+
+
+def _run_trial(trial: Dict[str, Any]) -> Dict[str, Any]:
+    """Trains and evaluates a single trial in a pool worker, reporting failures instead of
+    raising them."""
+
+    report = {"trial": trial["trial"], "status": "done", "error": None}
+
+    try:
+        start_time = time.time()
+
+        configs = _CONFIGS[trial["trial"]]
+        dataset = _DATASETS[trial["dataset"]]
+
+        model_params = copy.deepcopy(configs.model.params)
+        model_params["n"] = dataset.x().shape[1]
+        model_params["n_classes"] = N_CLASSES
+
+        early_stopping = None
+
+        if configs.early_stopping.stopper is not None:
+            early_stopping = configs.early_stopping.stopper(**configs.early_stopping.params)
+
+        trainer = MLPTrainer(
+            dataset=dataset,
+            model=configs.model.model,
+            loss=configs.loss.loss,
+            optimizer=configs.optimizer.optimizer,
+            loss_params=configs.loss.params,
+            optimizer_params=configs.optimizer.params,
+            model_params=model_params,
+            earlystoping=early_stopping,
+            device=configs.device,
+            output_dir=Path(trial["output_dir"]),
+            seed=configs.seed,
+            checkpoint_params=configs.checkpoint_params.model_dump(),
+            logger=logging.getLogger("matcha-dl"),
+        )
+
+        trainer.train(**configs.training_params.model_dump())
+        trainer.save_model()
+
+        report.update(trainer.evaluate(kind="validation"))
+        report.update(epochs=trainer.epoch - 1, time=time.time() - start_time)
+
+    except Exception as e:
+        report.update(status="failed", error=f"{type(e).__name__}: {e}")
+        logging.getLogger("matcha-dl").debug(traceback.format_exc())
+
+    return report
+
+
+class SweepAction(Protocol):
+    @staticmethod
+    def run(
+        source_file_path: str,
+        target_file_path: str,
+        output_dir_path: str,
+        sweep_file_path: str,
+        reference_file_path: str,
+        candidates_file_path: Optional[str] = None,
+        configs_file_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        report_file_path: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Sweeps the training hyperparameters of an ontology pair.
+
+        The matcha scores are computed and loaded once, and the dataset is processed once per
+        distinct sampling setting (negative sampler, number_of_negatives and seed), then the
+        trials are trained across a pool of forked worker processes sharing the datasets.
+        Every trial holds out the same validation sources and is ranked by the sweep metric.
+
+        Args:
+            source_file_path (str): The path to the source ontology file.
+            target_file_path (str): The path to the target ontology file.
+            output_dir_path (str): The path to the output directory, trials are written to its
+                sweep directory.
+            sweep_file_path (str): The path to the sweep file.
+            reference_file_path (str): The path to the reference file.
+            candidates_file_path (str, optional): The path to the candidates file.
+                Defaults to None.
+            configs_file_path (str, optional): The path to the configuration file the trials
+                are based on, if the sweep file has none. Defaults to None.
+            workers (int, optional): The number of worker processes. Defaults to the sweep
+                value, or the number of trials bounded by the number of CPUs.
+            report_file_path (str, optional): The tsv file the ranked trials are written to.
+                Defaults to sweep_report.tsv in the sweep directory.
+
+        Returns:
+            List[Dict[str, Any]]: The report of every trial, ranked by the sweep metric.
+        """
+
+        start_time = time.time()
+
+        sweep = SweepModel.load_sweep(sweep_file_path)
+        configs_file_path = sweep.config_file or configs_file_path
+        yaml_config = read_yaml(configs_file_path) if configs_file_path is not None else {}
+
+        trials = sweep.trials()
+        trial_configs = [ConfigModel.from_dict(SweepModel.apply(yaml_config, t)) for t in trials]
+        configs = ConfigModel.from_dict(yaml_config)
+
+        # Trials are ranked on held-out sources, so every trial needs a validation split
+
+        for trial_config in trial_configs:
+            params = trial_config.training_params
+            params.validation_split = params.validation_split or sweep.validation_split
+
+        logger = logging.getLogger("matcha-dl")
+        logger.setLevel(configs.logging_level)
+
+        sweep_dir = Path(output_dir_path) / SWEEP_DIR
+        sweep_dir.mkdir(parents=True, exist_ok=True)
+
+        cache = StageCache(configs.cache_dir, configs.cache_size, logger=logger)
+
+        # Matcha scores, computed and loaded once
+
+        matcha = Matcha(
+            output_file=str(Path(output_dir_path) / "matcha_scores.csv"),
+            log_file=str(Path(output_dir_path) / "matcha.log"),
+            logger=logger,
+            cache=cache,
+            **configs.matcha_params.model_dump(),
+        )
+
+        logger.info("Computing matcha scores...")
+
+        matcha_output_file, _ = matcha.match(source_file_path, target_file_path)
+        matcha_scores = MatchaScores.from_csv(matcha_output_file)
+
+        # Processed datasets, one per sampling setting
+
+        datasets = {}
+
+        for trial_config in trial_configs:
+            key = _sampling_key(trial_config)
+
+            if key in datasets:
+                continue
+
+            logger.info(f"Processing dataset {len(datasets)}..")
+
+            processor = MainProcessor(
+                sampler=trial_config.negative_sampler.sampler(
+                    n_samples=trial_config.number_of_negatives,
+                    seed=trial_config.seed,
+                    **trial_config.negative_sampler.params,
+                ),
+                seed=trial_config.seed,
+                logger=logger,
+                cache=cache,
+                scores_key=matcha.key,
+            )
+
+            datasets[key] = processor.process(
+                scores_file=matcha_output_file,
+                ref_file=reference_file_path,
+                cands_file=candidates_file_path,
+                output_file=str(sweep_dir / f"processed_dataset_{len(datasets)}"),
+                matcha_scores=matcha_scores,
+            )
+
+        dataset_ids = {key: i for i, key in enumerate(datasets)}
+
+        jobs = [
+            {
+                "trial": i,
+                "dataset": dataset_ids[_sampling_key(trial_config)],
+                "output_dir": str(sweep_dir / f"trial_{i}"),
+            }
+            for i, trial_config in enumerate(trial_configs)
+        ]
+
+        # Trials
+
+        workers = workers or sweep.workers or min(len(jobs), os.cpu_count() or 1)
+        num_threads = max(1, (os.cpu_count() or 1) // workers)
+
+        logger.info(
+            f"Sweeping {len(jobs)} trials over {len(datasets)} datasets with {workers} workers"
+        )
+
+        reports = []
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(list(datasets.values()), trial_configs, num_threads),
+        ) as executor:
+
+            futures = [executor.submit(_run_trial, job) for job in jobs]
+
+            for future in as_completed(futures):
+                report = future.result()
+                report.update(trials[report["trial"]])
+                reports.append(report)
+
+                if report["status"] == "done":
+                    logger.info(
+                        f"Trial {report['trial']} {trials[report['trial']]}: "
+                        f"{sweep.metric} {report[sweep.metric]:.4f} in {report['time']:.1f} seconds"
+                    )
+                else:
+                    logger.error(f"Trial {report['trial']} failed: {report['error']}")
+
+        # Ranking, failed trials last
+
+        higher_is_better = VALIDATION_METRICS[sweep.metric]
+
+        def rank_key(report: Dict[str, Any]) -> tuple:
+            if report["status"] != "done" or pd.isna(report[sweep.metric]):
+                return (1, 0.0, report["trial"])
+            value = report[sweep.metric]
+            return (0, -value if higher_is_better else value, report["trial"])
+
+        reports = sorted(reports, key=rank_key)
+
+        for rank, report in enumerate(reports, start=1):
+            report["rank"] = rank
+
+        elapsed_time = time.time() - start_time
+
+        if reports and reports[0]["status"] == "done":
+            best = reports[0]
+            logger.info(
+                f"Best trial {best['trial']} {trials[best['trial']]} with {sweep.metric} "
+                f"{best[sweep.metric]:.4f}, written to {jobs[best['trial']]['output_dir']}"
+            )
+
+        logger.info(f"Sweep completed in {elapsed_time:.1f} seconds")
+
+        report_file_path = report_file_path or str(sweep_dir / SWEEP_REPORT_FILE)
+        columns = ["rank", "trial", *sweep.parameters, *VALIDATION_METRICS, "epochs", "time"]
+
+        report = pd.DataFrame(reports, columns=[*columns, "status", "error"])
+        report.round(6).to_csv(report_file_path, sep="\t", index=False)
+        logger.info(f"Sweep report written to {report_file_path}")
+
+        return reports
@@ -1,10 +1,14 @@
 import logging
-import os
 import subprocess
 import sys
+import threading
 from abc import abstractmethod
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
+
+from matcha_dl.core.values import MATCHA_ENGINES
+from matcha_dl.impl.cache import KEY_SUFFIX, StageCache, cache_key, read_key, write_key
+from matcha_dl.impl.profiler import Profiler
 
 MATCHA = "matcha"
 
@@ -17,6 +21,7 @@ class IMatcha:
         output_file: str = "matcha_scores.csv",
         log_file: str = "matcha.log",
         max_heap="8G",
+        engine: str = "subprocess",
         **kwargs,
     ) -> None:
         """
@@ -27,6 +32,10 @@ class IMatcha:
             cardinality (int): The cardinality to use for matching.
             output_file (str): The path to the output file. Defaults to 'matcha_scores.csv'.
             max_heap (str): The maximum heap size to use for the Java Virtual Machine. Defaults to '8G'.
+            engine (str): "subprocess" runs every match in a new JVM, "worker" in a long-lived
+                JVM worker shared by all matches of the process. Defaults to 'subprocess'.
+            cache (StageCache, optional): The shared cache of matcha scores. Defaults to None.
+            profiler (Profiler, optional): The profiler of the run. Defaults to None.
         """
 
         self.threshold = threshold
@@ -35,7 +44,21 @@ class IMatcha:
         self.log_file = Path(log_file)
         self.max_heap = max_heap
 
+        if engine not in MATCHA_ENGINES:
+            raise ValueError(
+                f"Matcha engine {engine} not recognized, expected one of {MATCHA_ENGINES}"
+            )
+
+        self.engine = engine
+
+        self.key = None
+
+        self._thread = None
+        self._error = None
+
         self.logger = kwargs.get("logger")
+        self.cache: Optional[StageCache] = kwargs.get("cache")
+        self.profiler: Profiler = kwargs.get("profiler") or Profiler(enabled=False)
 
     @property
     @abstractmethod
@@ -59,27 +82,52 @@ class IMatcha:
         """
         pass
 
+    @abstractmethod
+    def ensure_jar(self) -> None:
+        """
+        Make sure the matcha.jar file and its dependencies are available.
+        """
+        pass
+
     @property
     def has_cache(self) -> bool:
         """
-        Check if the output file exists.
+        Check if the output file exists and was computed from the current inputs.
+
+        Returns:
+            bool: True if the output file is up to date, False otherwise.
+        """
+        return self.output_file.is_file() and read_key(self.output_file) == self.key
+
+    def cache_key(self, ont1: str, ont2: str) -> str:
+        """
+        Get the content-addressed key of a matching task.
+
+        Args:
+            ont1 (str): The path to the first ontology.
+            ont2 (str): The path to the second ontology.
 
         Returns:
-            bool: True if the output file exists, False otherwise.
+            str: The key.
         """
-        return self.output_file.is_file()
+        return cache_key(ont1, ont2, threshold=self.threshold, cardinality=self.cardinality)
 
-    def match(self, ont1: str, ont2: str) -> Tuple[str, bool]:
+    def match(self, ont1: str, ont2: str, block: bool = True) -> Tuple[str, bool]:
         """
         Match two ontologies and write the result to the output file.
 
         Args:
             ont1 (str): The path to the first ontology.
             ont2 (str): The path to the second ontology.
+            block (bool): Whether to wait for Matcha to finish. Otherwise Matcha runs in the
+                background while the output file is written, `is_running` tells whether it is
+                still running and `wait` finishes the match. Defaults to True.
 
         Returns:
-            Path: The path to the output file.
+            Tuple[str, bool]: The path to the output file and whether it was found in cache.
         """
+        self.key = self.cache_key(ont1, ont2)
+
         if self.has_cache:
 
             self.log(
@@ -89,39 +137,157 @@ class IMatcha:
 
             return str(self.output_file), True
 
+        elif self.cache is not None and self.cache.restore(MATCHA, self.key, self.output_file):
+
+            self.log(
+                f"Matcha scores restored from cache to {self.output_file}. Skipping computation.",
+                level="info",
+            )
+
+            return str(self.output_file), True
+
         else:
 
-            current_cwd = os.getcwd()
-            os.chdir(self.matcha_path)
-
-            jar_command = [
-                "java",
-                "-jar",
-                f"-Xmx{self.max_heap}",
-                str(self.jar_path),
-                str(ont1),
-                str(ont2),
-                str(self.output_file),
+            self.ensure_jar()
+
+            args = [
+                str(Path(ont1).resolve()),
+                str(Path(ont2).resolve()),
+                str(self.output_file.resolve()),
                 str(self.threshold),
                 str(self.cardinality),
                 "true",
                 sys.executable,
             ]
 
-            self.log("Running command:" + " ".join(jar_command), level="debug")
+            if block:
+                self._run(args)
+                self._save()
 
-            try:
-                with open(str(self.log_file), "w") as f:
-                    _ = subprocess.run(jar_command, stdout=f, stderr=f, check=True)
+            else:
+                # Readers tail the output file, so a stale one must not be read
+                self.output_file.unlink(missing_ok=True)
+                Path(str(self.output_file) + KEY_SUFFIX).unlink(missing_ok=True)
 
-            except subprocess.CalledProcessError as e:
-                raise RuntimeError(f"Matcha subprocess returned with error code {e.returncode}")
+                self._thread = threading.Thread(target=self._run_background, args=(args,))
+                self._thread.start()
 
-            os.chdir(current_cwd)
+            return str(self.output_file), False
 
-            self.log(f"Matcha scores written to {self.output_file}", level="info")
+    def is_running(self) -> bool:
+        """
+        Check if a non-blocking match is still running.
 
-            return str(self.output_file), False
+        Returns:
+            bool: True if Matcha is still writing the output file, False otherwise.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self) -> None:
+        """
+        Wait for a non-blocking match to finish and save its output.
+
+        Raises:
+            RuntimeError: If Matcha failed.
+        """
+        if self._thread is None:
+            return
+
+        self._thread.join()
+        self._thread = None
+
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+        self._save()
+
+    def _save(self) -> None:
+        """
+        Record the key of the output file and store it in the shared cache.
+        """
+        write_key(self.output_file, self.key)
+
+        if self.cache is not None:
+            self.cache.put(MATCHA, self.key, self.output_file)
+
+        self.log(f"Matcha scores written to {self.output_file}", level="info")
+
+    def _run(self, args: List[str]) -> None:
+        """
+        Run Matcha with the configured engine.
+
+        Args:
+            args (List[str]): The Matcha command line arguments.
+
+        Raises:
+            RuntimeError: If Matcha did not write the output file.
+        """
+        # A stale output file must not pass for the output of this run
+        self.output_file.unlink(missing_ok=True)
+
+        with self.profiler.stage("matcha_run"):
+            if self.engine == "worker":
+                self._run_engine(args)
+            else:
+                self._run_subprocess(args)
+
+        if not self.output_file.is_file() or self.output_file.stat().st_size == 0:
+            raise RuntimeError(
+                f"Matcha did not write its scores to {self.output_file}, see {self.log_file}"
+            )
+
+    def _run_background(self, args: List[str]) -> None:
+        try:
+            self._run(args)
+        except Exception as e:
+            self._error = e
+
+    def _run_subprocess(self, args: List[str]) -> None:
+        """
+        Run Matcha in a new JVM.
+
+        Args:
+            args (List[str]): The Matcha command line arguments.
+        """
+        jar_command = ["java", "-jar", f"-Xmx{self.max_heap}", str(self.jar_path), *args]
+
+        self.log("Running command:" + " ".join(jar_command), level="debug")
+
+        try:
+            with open(str(self.log_file), "w") as f:
+                _ = subprocess.run(
+                    jar_command, stdout=f, stderr=f, cwd=self.matcha_path, check=True
+                )
+
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Matcha subprocess returned with error code {e.returncode}")
+
+    def _run_engine(self, args: List[str]) -> None:
+        """
+        Run Matcha in the shared long-lived Matcha engine.
+
+        Args:
+            args (List[str]): The Matcha command line arguments.
+        """
+        # The engine module is imported on use, it imports the Matcha implementation
+        from matcha_dl.impl.matcha.engine import get_engine
+
+        engine = get_engine(self.matcha_path, self.jar_path, self.max_heap, logger=self.logger)
+
+        # A Matcha exiting the JVM would restart the engine for every task
+
+        if engine.exits_jvm:
+            self._run_subprocess(args)
+            return
+
+        if not engine.alive:
+            with self.profiler.stage("jvm_init"):
+                engine.start()
+
+        self.log("Running Matcha engine with arguments:" + " ".join(args), level="debug")
+
+        engine.run(args, self.log_file)
 
     def log(self, msg: str, level: Optional[str] = "info") -> None:
         if self.logger:
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
@@ -18,9 +18,34 @@ class INegativeSampler:
         return self._n_samples
 
     @property
-    def random(self) -> np.random.RandomState:
-        return np.random.RandomState(self._seed)
+    def seed(self) -> Optional[int]:
+        return self._seed
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return {"n_samples": self._n_samples, "seed": self._seed}
+
+    @property
+    def requires_scores(self) -> bool:
+        """Whether the sampler draws negatives from the matcha scores, so it can only sample
+        once they are complete."""
+        return False
+
+    @property
+    def random(self) -> np.random.Generator:
+        return np.random.default_rng(self._seed)
 
     @abstractmethod
-    def sample(self, sources: List, targets: List) -> List[List[str]]:
+    def sample(self, sources: List, targets: List, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        """Samples negative targets for every (source, target) positive pair.
+
+        Args:
+            sources (List): The source entity id of every positive pair.
+            targets (List): The target entity id of every positive pair.
+            scores (MatchaScores, optional): The matcha scores index, for samplers that mine
+                negatives from the matcha candidates.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The source and target ids of the negative pairs.
+        """
         pass
@@ -1,13 +1,18 @@
 from abc import abstractmethod
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
 from matcha_dl.core.contracts.negative_sampler import INegativeSampler
+from matcha_dl.core.entities.candidates import RankingCandidates
 from matcha_dl.core.entities.dataset import MlpDataset
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.entities.vocab import EntityVocab
+from matcha_dl.impl.cache import StageCache, cache_key, read_key, write_key
 from matcha_dl.impl.dp.utils import read_table
+from matcha_dl.impl.profiler import Profiler
 
 PROCESSOR = "processor"
 
@@ -18,10 +23,11 @@ class IProcessor:
     """Abstract base class for a processor that parses all data inputs and returns a dataset as a pandas dataframe.
 
     Attributes:
-        matcha_scores (Dict): The matcha scores.
-        refs (DataFrame): The reference data.
+        matcha_scores (MatchaScores): The matcha scores index.
+        vocab (EntityVocab): The entity vocabulary shared by all the inputs.
+        refs (DataFrame): The reference data, with the entities as ids.
         sampler (INegativeSampler): The sampler.
-        candidates (AnchoredOntoMappings): The ranking candidates.
+        candidates (RankingCandidates): The ranking candidates.
         random (np.random.RandomState): The random state.
     """
 
@@ -33,30 +39,48 @@ class IProcessor:
         Args:
             sampler (INegativeSampler, optional): The sampler. Defaults to None.
             seed (int, optional): The seed for the random state. Defaults to 42.
+            cache (StageCache, optional): The shared cache of processed datasets. Defaults to None.
+            scores_key (str, optional): The key of the matcha scores, used instead of hashing
+                the scores file. Defaults to None.
+            profiler (Profiler, optional): The profiler of the run. Defaults to None.
         """
 
         self._matcha_scores = None
+        self._vocab = EntityVocab()
         self._refs = None
         self._sampler = sampler
         self._cands = None
         self._seed = seed
         self._output_file = None
+        self._key = None
 
         self._logger = kwargs.get("logger")
         self._cache_ok = kwargs.get("cache_ok", True)
+        self._cache: Optional[StageCache] = kwargs.get("cache")
+        self._scores_key = kwargs.get("scores_key")
+        self._profiler: Profiler = kwargs.get("profiler") or Profiler(enabled=False)
 
     @property
-    def matcha_scores(self) -> Dict:
-        """Gets the matcha scores.
+    def matcha_scores(self) -> MatchaScores:
+        """Gets the matcha scores index.
 
         Returns:
-            Dict: The matcha scores.
+            MatchaScores: The matcha scores index.
         """
         return self._matcha_scores
 
+    @property
+    def vocab(self) -> EntityVocab:
+        """Gets the entity vocabulary.
+
+        Returns:
+            EntityVocab: The entity vocabulary.
+        """
+        return self._vocab
+
     @property
     def refs(self) -> DataFrame:
-        """Gets the reference data.
+        """Gets the reference data, with the entities as ids.
 
         Returns:
             DataFrame: The reference data.
@@ -73,14 +97,23 @@ class IProcessor:
         return self._sampler
 
     @property
-    def candidates(self) -> DataFrame:
+    def candidates(self) -> RankingCandidates:
         """Gets the ranking candidates.
 
         Returns:
-            DataFrame: The ranking candidates.
+            RankingCandidates: The ranking candidates.
         """
         return self._cands
 
+    @property
+    def profiler(self) -> Profiler:
+        """Gets the profiler of the run.
+
+        Returns:
+            Profiler: The profiler.
+        """
+        return self._profiler
+
     @property
     def random(self) -> np.random.RandomState:
         """Gets the random state.
@@ -102,21 +135,48 @@ class IProcessor:
     @property
     def has_cache(self) -> bool:
         """
-        Check if the output file exists.
+        Check if a saved dataset computed from the current inputs exists at the output file.
 
         Returns:
-            bool: True if the output file exists, False otherwise.
+            bool: True if the saved dataset is up to date, False otherwise.
         """
         if self._cache_ok and self.output_file is not None:
-            return self.output_file.is_file()
+            return MlpDataset.exists(self.output_file) and read_key(self.output_file) == self._key
         return False
 
+    def cache_key(
+        self, scores_file: str, ref_file: Optional[str] = None, cands_file: Optional[str] = None
+    ) -> str:
+        """Gets the content-addressed key of the processing inputs.
+
+        Args:
+            scores_file (str): The scores file.
+            ref_file (str, optional): The reference file. Defaults to None.
+            cands_file (str, optional): The candidates file. Defaults to None.
+
+        Returns:
+            str: The key.
+        """
+
+        return cache_key(
+            None if self._scores_key else scores_file,
+            ref_file,
+            cands_file,
+            scores_key=self._scores_key,
+            processor=type(self).__name__,
+            sampler=type(self.sampler).__name__ if self.sampler else None,
+            sampler_params=self.sampler.params if self.sampler else None,
+            seed=self._seed,
+        )
+
     def process(
         self,
         scores_file: str,
         ref_file: Optional[str] = None,
         cands_file: Optional[str] = None,
         output_file: Optional[str] = None,
+        matcha_scores: Optional[MatchaScores] = None,
+        running: Optional[Callable[[], bool]] = None,
     ) -> MlpDataset:
         """Processes the data.
 
@@ -124,56 +184,227 @@ class IProcessor:
             scores_file (str): The scores file.
             ref_file (str, optional): The reference file. Defaults to None.
             cands_file (str, optional): The candidates file. Defaults to None.
-            output_file (str, optional): The output file. Defaults to None.
+            output_file (str, optional): The output file. A ".csv" file is written as a CSV
+                export, any other path as a binary cache directory. Defaults to None.
+            matcha_scores (MatchaScores, optional): The already loaded index of the scores
+                file, shared across processors instead of reading the file again. The entities
+                are interned into its vocabulary. Defaults to None.
+            running (Callable[[], bool], optional): Tells whether Matcha is still writing the
+                scores file. If given, the scores file is read while it is written, which
+                requires the processor scores_key. Defaults to None.
 
         Returns:
             MlpDataset: The processed data.
         """
 
-        self._output_file = Path(output_file) if output_file else None
+        if running is not None and self._scores_key is None:
+            raise ValueError("Streaming the scores file requires the key of the matcha scores")
 
-        if ref_file is not None:
-            self._refs = read_table(ref_file)
+        self._output_file = Path(output_file) if output_file else None
+        self._key = self.cache_key(scores_file, ref_file, cands_file)
 
-            # if refs exist sampler must not be None
+        # Entities are interned once, strings are only resolved when alignments are written
 
-            if self.sampler is None:
-                raise ValueError("If ref file is provided, sampler must be provided")
+        self._vocab = matcha_scores.vocab if matcha_scores is not None else EntityVocab()
 
-        if cands_file is not None:
-            self._cands = read_table(cands_file)
+        self._load_inputs(ref_file, cands_file)
 
-        if self.has_cache:
+        if self.has_cache or self._restore_cache():
             self.log(f"Cache found. Loading cached dataset from {self.output_file}")
-            return MlpDataset.load(self.output_file, ref=self.refs, candidates=self.candidates)
+            return MlpDataset.load(
+                self.output_file, ref=self.refs, candidates=self.candidates, vocab=self.vocab
+            )
 
         else:
             self.log("Processing dataset", level="debug")
 
             # Load scores
-            self._matcha_scores = self._matcha_scores_to_dict(scores_file)
+            if matcha_scores is not None:
+                self._matcha_scores = matcha_scores
+
+            else:
+                with self.profiler.stage("score_loading") as stage:
+                    self._matcha_scores = self._load_matcha_scores(scores_file, running=running)
+                    stage["rows"] = len(self._matcha_scores)
 
             dataset = self._process()
 
-            if output_file is not None:
-                self.log(f"Saving dataset to {output_file}", level="debug")
-                dataset.save(self.output_file)
+            self._save(dataset)
 
             return dataset
 
+    def update(
+        self,
+        previous: MlpDataset,
+        sources: np.ndarray,
+        scores_file: str,
+        ref_file: Optional[str] = None,
+        cands_file: Optional[str] = None,
+        output_file: Optional[str] = None,
+        matcha_scores: Optional[MatchaScores] = None,
+    ) -> MlpDataset:
+        """Updates a dataset processed from previous inputs, rebuilding only the rows of the
+        affected sources.
+
+        The affected sources are the given sources, whose matcha scores changed, the sources
+        of the references added or removed since the previous dataset and, for local
+        alignment, the sources whose candidates changed. The rows of the other sources are
+        kept as they were, features and sampled negatives included.
+
+        Args:
+            previous (MlpDataset): The previous dataset.
+            sources (np.ndarray): The ids of the sources whose matcha scores changed, see
+                `MatchaScores.diff`.
+            scores_file (str): The scores file.
+            ref_file (str, optional): The reference file. Defaults to None.
+            cands_file (str, optional): The candidates file. Defaults to None.
+            output_file (str, optional): The output file, see `process`. Defaults to None.
+            matcha_scores (MatchaScores, optional): The already loaded index of the scores
+                file, over the vocabulary of the previous dataset. Defaults to None.
+
+        Returns:
+            MlpDataset: The updated data.
+        """
+
+        if matcha_scores is not None and matcha_scores.vocab is not previous.vocab:
+            raise ValueError("The matcha scores must share the vocabulary of the previous dataset")
+
+        self._output_file = Path(output_file) if output_file else None
+        self._key = self.cache_key(scores_file, ref_file, cands_file)
+        self._vocab = previous.vocab
+
+        self._load_inputs(ref_file, cands_file)
+
+        if matcha_scores is not None:
+            self._matcha_scores = matcha_scores
+
+        else:
+            with self.profiler.stage("score_loading") as stage:
+                self._matcha_scores = self._load_matcha_scores(scores_file)
+                stage["rows"] = len(self._matcha_scores)
+
+        df = previous.dataframe
+        n_entities = len(self.vocab)
+
+        def changed_sources(old: np.ndarray, new: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+            old_keys = df["SrcEntity"].to_numpy()[old].astype(np.int64) * n_entities
+            old_keys += df["TgtEntity"].to_numpy()[old]
+            new_keys = np.asarray(new[0], dtype=np.int64) * n_entities + np.asarray(new[1])
+
+            return np.setxor1d(old_keys, new_keys) // n_entities
+
+        # The positive training rows of the previous dataset are its references
+
+        labels = df["Labels"].to_numpy()
+        positives = df["train"].to_numpy(dtype=bool) & (labels == 1)
+
+        refs = (
+            (self.refs["SrcEntity"].to_numpy(), self.refs["TgtEntity"].to_numpy())
+            if self.refs is not None
+            else (np.array([], dtype=np.int32), np.array([], dtype=np.int32))
+        )
+
+        ref_sources = changed_sources(positives, refs)
+        affected = np.union1d(sources, ref_sources)
+
+        if self.candidates is not None:
+            inference = df["inference"].to_numpy(dtype=bool)
+            affected = np.union1d(affected, changed_sources(inference, self.candidates.pairs()))
+
+        keep = ~np.isin(df["SrcEntity"].to_numpy(), affected)
+
+        self.log(
+            f"Updating dataset, {len(sources)} sources with changed matcha scores, "
+            f"{len(ref_sources)} sources with changed references: rebuilding the rows of "
+            f"{len(affected)} sources, keeping {keep.sum()} of {len(df)} rows"
+        )
+
+        rebuilt = self._process(sources=affected)
+
+        columns = ["SrcEntity", "TgtEntity", "Labels", "train", "inference"]
+
+        dataset = MlpDataset(
+            pd.concat(
+                [df.loc[keep, columns], rebuilt.dataframe[columns]], ignore_index=True
+            ).astype({"SrcEntity": np.int32, "TgtEntity": np.int32}),
+            features=np.concatenate([previous.features[keep], rebuilt.features]),
+            ref=self.refs,
+            candidates=self.candidates,
+            vocab=self.vocab,
+        )
+
+        self._save(dataset)
+
+        return dataset
+
+    def _load_inputs(self, ref_file: Optional[str] = None, cands_file: Optional[str] = None):
+        """Reads the reference and candidates files, interning their entities into the
+        processor vocabulary."""
+
+        if ref_file is not None:
+            refs = read_table(ref_file)
+            self._refs = refs.assign(
+                SrcEntity=self.vocab.add(refs["SrcEntity"]),
+                TgtEntity=self.vocab.add(refs["TgtEntity"]),
+            )
+
+            # if refs exist sampler must not be None
+
+            if self.sampler is None:
+                raise ValueError("If ref file is provided, sampler must be provided")
+
+        if cands_file is not None:
+            self._cands = RankingCandidates.from_frame(read_table(cands_file), vocab=self.vocab)
+
+    def _save(self, dataset: MlpDataset) -> None:
+        """Saves the dataset to the output file, with the key of its inputs."""
+
+        if self.output_file is not None:
+            self.log(f"Saving dataset to {self.output_file}", level="debug")
+            dataset.save(self.output_file)
+            write_key(self.output_file, self._key)
+
+            if self._cache is not None:
+                self._cache.put(PROCESSOR, self._key, self.output_file)
+
+    def _restore_cache(self) -> bool:
+        """Restores the dataset from the shared cache into the output file.
+
+        Returns:
+            bool: True if the dataset was restored, False otherwise.
+        """
+        if not self._cache_ok or self._cache is None or self.output_file is None:
+            return False
+
+        return self._cache.restore(PROCESSOR, self._key, self.output_file)
+
     @abstractmethod
-    def _process(self):
+    def _process(self, sources: Optional[np.ndarray] = None) -> MlpDataset:
+        """Processes the data.
+
+        Args:
+            sources (np.ndarray, optional): The source ids the rows are built for.
+                Defaults to None, all the sources.
+
+        Returns:
+            MlpDataset: The processed data.
+        """
         pass
 
     @abstractmethod
-    def _matcha_scores_to_dict(self, csv_file: str) -> Dict:
-        """Reads matcha scores file and parses it into a dict.
+    def _load_matcha_scores(
+        self, csv_file: str, running: Optional[Callable[[], bool]] = None
+    ) -> MatchaScores:
+        """Reads matcha scores file and parses it into an index, interning the entities into
+        the processor vocabulary.
 
         Args:
             csv_file (str): The CSV file.
+            running (Callable[[], bool], optional): Tells whether Matcha is still writing the
+                CSV file. Defaults to None.
 
         Returns:
-            Dict: The dictionary of matcha scores.
+            MatchaScores: The matcha scores index.
         """
         pass
 
@@ -4,13 +4,26 @@ STOPPER = "stopper"
 
 
 class IStopper:
+    """Abstract base class for a stopper that decides when training stops from the epoch losses.
+
+    Attributes:
+        early_stop (bool): Whether training should stop.
+        improved (bool): Whether the last validation loss is the best so far, the trainer keeps
+            the model of the best epoch.
+        best_loss (float): The best validation loss so far.
+    """
+
+    early_stop: bool = False
+    improved: bool = False
+    best_loss: float = float("inf")
+
     @abstractmethod
-    def __init__(self, tolerance: int, min_delta: int):
+    def __init__(self, tolerance: int, min_delta: float):
         """
 
         Args:
-            tolerance (int): The number of times the validation loss can be greater than the training loss before stopping.
-            min_delta (int): The minimum difference between validation loss and training loss to consider as improvement.
+            tolerance (int): The number of epochs without improvement of the validation loss before stopping.
+            min_delta (float): The minimum decrease of the validation loss to consider as improvement.
         """
         pass
 
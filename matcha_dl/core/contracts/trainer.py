@@ -1,20 +1,24 @@
+import copy
 from abc import abstractmethod
 
 import torch as th
-from deeponto.align.mapping import EntityMapping as DeepOntoEntityMapping
 from torch.nn import Module as TorchModule
+from torch.nn.parallel import DistributedDataParallel
 from torch.optim import Optimizer as TorchOptimizer
 
 from matcha_dl.core.contracts.loss import ILoss
 from matcha_dl.core.contracts.stopper import IStopper
 from matcha_dl.core.entities.dataset import MlpDataset
-from matcha_dl.impl.dp.utils import fill_anchored_scores
-
-EntityMapping = DeepOntoEntityMapping
+from matcha_dl.impl.checkpoint import CheckpointManager
+from matcha_dl.impl.dp.alignment import alignment_delta, extract_alignment, top_k_per_group
+from matcha_dl.impl.dp.utils import read_table
+from matcha_dl.impl.export import export_model
+from matcha_dl.impl.inference import EXPORT_FILES, MODEL_FILE
+from matcha_dl.impl.profiler import Profiler
 
 import random
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Type, Union
 
 import numpy as np
 import pandas as pd
@@ -25,6 +29,37 @@ Optimizer = TorchOptimizer
 TRAINER = "trainer"
 
 
+class Predictions(NamedTuple):
+    """A chunk of scored inference pairs.
+
+    Attributes:
+        index (np.ndarray): The positions of the pairs in the inference set.
+        sources (np.ndarray): The source entity ids.
+        targets (np.ndarray): The target entity ids.
+        scores (np.ndarray): The scores.
+    """
+
+    index: np.ndarray
+    sources: np.ndarray
+    targets: np.ndarray
+    scores: np.ndarray
+
+    def take(self, rows: np.ndarray) -> "Predictions":
+        """Selects a subset of the pairs."""
+        return type(self)(*(array[rows] for array in self))
+
+    @classmethod
+    def concat(cls, chunks: Iterable["Predictions"]) -> "Predictions":
+        """Concatenates a stream of chunks."""
+        chunks = list(chunks)
+
+        if not chunks:
+            empty = np.array([], dtype=np.int32)
+            return cls(np.array([], dtype=np.int64), empty, empty, np.array([], dtype=np.float32))
+
+        return cls(*(np.concatenate(arrays) for arrays in zip(*chunks)))
+
+
 def set_seed(seed_val: Optional[int] = 888):
     """Set random seed for reproducible results"""
     random.seed(seed_val)
@@ -51,6 +86,7 @@ class ITrainer:
         output_dir: Optional[Path] = None,
         seed: Optional[int] = 42,
         use_last_checkpoint: Optional[bool] = False,
+        checkpoint_params: Optional[Dict[str, Any]] = {},
         **kwargs,
     ):
 
@@ -58,6 +94,7 @@ class ITrainer:
 
         self._dataset = dataset
         self._device = device
+        self._model_params = copy.deepcopy(model_params)
         self._model = model(**model_params).to(self.device)
         self._optimizer = optimizer(self._model.parameters(), **optimizer_params)
         self._loss = loss(device=self.device, **loss_params)
@@ -68,14 +105,22 @@ class ITrainer:
 
         self._epoch = 1
 
+        self._checkpoint_manager = CheckpointManager(self.checkpoints_dir, **checkpoint_params)
+
+        # The rank of the process among the data-parallel training processes
+
+        self._rank = 0
+        self._world_size = 1
+
         # Load Kwargs
 
         self._logger = kwargs.get("logger")
+        self._profiler: Profiler = kwargs.get("profiler") or Profiler(enabled=False)
 
         # Load checkpoint if exists
 
         if use_last_checkpoint:
-            if self.checkpoints_dir.is_dir():
+            if self.checkpoint_manager.last is not None:
                 self.load_checkpoint()
                 self.log(f"Loaded checkpoint {self._get_last_checkpoint()}")
             else:
@@ -91,6 +136,18 @@ class ITrainer:
     def epoch(self) -> int:
         return self._epoch
 
+    @property
+    def profiler(self) -> Profiler:
+        return self._profiler
+
+    @property
+    def world_size(self) -> int:
+        return self._world_size
+
+    @property
+    def is_main(self) -> bool:
+        return self._rank == 0
+
     @property
     def device(self) -> th.device:
         return th.device(self._device if th.cuda.is_available() else "cpu")
@@ -101,6 +158,8 @@ class ITrainer:
 
     @property
     def model(self) -> Module:
+        if isinstance(self._model, DistributedDataParallel):
+            return self._model.module
         return self._model
 
     @property
@@ -135,12 +194,26 @@ class ITrainer:
     def alignment_dir(self) -> Path:
         return (self._output_dir / "alignment").resolve()
 
+    @property
+    def alignment_file(self) -> Path:
+        """Gets the alignment file, the local alignment if candidates were provided or the
+        global alignment otherwise."""
+        kind = "local" if self.dataset.candidates is not None else "global"
+        return self.alignment_dir / f"src2tgt.maps_{kind}.tsv"
+
+    @property
+    def checkpoint_manager(self) -> CheckpointManager:
+        return self._checkpoint_manager
+
     @property
     def checkpoints(self) -> List[str]:
-        return [x.name for x in self.checkpoints_dir.glob("**/*") if x.is_file()]
+        manager = self.checkpoint_manager
+        return [manager.path(epoch).name for epoch in manager.checkpoints]
 
     @abstractmethod
-    def train(self, epochs: Optional[int] = 100, batch_size: Optional[int] = None) -> None:
+    def train(
+        self, epochs: Optional[int] = 100, batch_size: Optional[int] = None, **kwargs
+    ) -> None:
         pass
 
     @abstractmethod
@@ -148,83 +221,219 @@ class ITrainer:
         pass
 
     @abstractmethod
-    def predict(self, threshold: Optional[float] = 0.7, **kwargs) -> List[EntityMapping]:
+    def predict(
+        self, threshold: Optional[float] = 0.7, chunk_size: Optional[int] = 100000, **kwargs
+    ) -> Iterator[Predictions]:
+        """Scores the inference set in chunks.
+
+        Args:
+            threshold (float, optional): The minimum score of the yielded pairs. Defaults to 0.7.
+            chunk_size (int, optional): The number of pairs scored at once. Defaults to 100000.
+
+        Yields:
+            Predictions: The pairs of every chunk scored at or above the threshold.
+        """
         pass
 
-    def save_alignment(self, preds: List[EntityMapping]):
-
-        if self.dataset.candidates is not None:
-            return self._save_local_alignment(preds)
+    def save_alignment(
+        self,
+        preds: Iterable[Predictions],
+        strategy: Optional[str] = "best",
+        top_k: Optional[int] = 1,
+        **kwargs,
+    ):
+        """Writes the alignment, a ranking of the candidates if candidates were provided or a
+        global alignment otherwise.
 
-        else:
-            return self._save_global_alignment(preds)
+        Args:
+            preds (Iterable[Predictions]): The stream of predictions.
+            strategy (str, optional): The global alignment strategy, "best", "top_k" or
+                "one_to_one". Defaults to "best".
+            top_k (int, optional): The number of targets per source of the "top_k" strategy.
+                Defaults to 1.
 
-    def _save_global_alignment(self, preds: List[EntityMapping]):
+        Returns:
+            str: The path to the alignment file.
+        """
 
-        # Get the best mapping for each unique source entity
+        with self.profiler.stage("alignment_writing"):
+            if self.dataset.candidates is not None:
+                return self._save_local_alignment(preds)
 
-        all_sources = {}
-        for ent_map in preds:
-            if ent_map.head not in all_sources or ent_map.score > all_sources[ent_map.head].score:
-                all_sources[ent_map.head] = ent_map
+            else:
+                return self._save_global_alignment(preds, strategy=strategy, top_k=top_k)
 
-        # Extract the mappings as tuples
+    def save_alignment_delta(self, previous: pd.DataFrame) -> str:
+        """Writes the delta of the alignment file with a previous alignment, see
+        `alignment_delta`, next to the alignment file.
 
-        global_alignment = EntityMapping.as_tuples(list(all_sources.values()), with_score=True)
+        Args:
+            previous (pd.DataFrame): The previous alignment.
 
-        # Save the global alignment
+        Returns:
+            str: The path to the delta file.
+        """
 
-        global_dir = str(self.alignment_dir) + f"/{'src2tgt.maps'}_global.tsv"
+        delta_file = self.alignment_file.with_name(self.alignment_file.stem + "_delta.tsv")
 
-        pd.DataFrame(global_alignment, columns=["SrcEntity", "TgtEntity", "Score"]).to_csv(
-            global_dir, sep="\t", index=False
+        alignment_delta(previous, read_table(str(self.alignment_file))).to_csv(
+            delta_file, sep="\t", index=False
         )
 
-    def _save_local_alignment(self, preds: List[EntityMapping]):
+        return str(delta_file)
+
+    def _save_global_alignment(
+        self,
+        preds: Iterable[Predictions],
+        strategy: Optional[str] = "best",
+        top_k: Optional[int] = 1,
+    ):
+
+        # Reduce every chunk to its best targets per source as it arrives, a one-to-one
+        # alignment needs all the pairs
+
+        if strategy != "one_to_one":
+            k = top_k if strategy == "top_k" else 1
+
+            preds = (
+                chunk.take(top_k_per_group(pd.factorize(chunk.sources)[0], chunk.scores, k))
+                for chunk in preds
+            )
+
+        preds = Predictions.concat(preds)
 
-        ranking_results = fill_anchored_scores(self.dataset.candidates.values, preds)
+        sources, _ = pd.factorize(preds.sources)
+        targets, _ = pd.factorize(preds.targets)
 
-        local_dir = str(self.alignment_dir) + f"/{'src2tgt.maps'}_local.tsv"
+        rows = extract_alignment(sources, targets, preds.scores, strategy=strategy, top_k=top_k)
 
-        pd.DataFrame(ranking_results, columns=["SrcEntity", "TgtEntity", "TgtCandidates"]).to_csv(
-            local_dir, sep="\t", index=False
+        # Save the global alignment, resolving the entity ids
+
+        global_dir = str(self.alignment_file)
+
+        pd.DataFrame(
+            {
+                "SrcEntity": self.dataset.vocab.decode(preds.sources[rows]),
+                "TgtEntity": self.dataset.vocab.decode(preds.targets[rows]),
+                "Score": preds.scores[rows],
+            }
+        ).to_csv(global_dir, sep="\t", index=False)
+
+        return global_dir
+
+    def _save_local_alignment(self, preds: Iterable[Predictions]):
+
+        preds = Predictions.concat(preds)
+
+        # Candidates without a prediction above the threshold are scored 0.0
+
+        scores = self.dataset.candidates.scores(preds.sources, preds.targets, preds.scores)
+
+        local_dir = str(self.alignment_file)
+
+        return self.dataset.candidates.write_ranking(local_dir, scores)
+
+    def load_checkpoint(self, checkpoint: Optional[Union[int, str]] = "last"):
+        """Loads the model and optimizer state of a checkpoint, training resumes at the epoch
+        following it.
+
+        Args:
+            checkpoint (Union[int, str], optional): The epoch, "last" or a checkpoint file
+                name. Defaults to "last".
+        """
+
+        checkpoint = self.checkpoint_manager.load(checkpoint, map_location=self.device)
+
+        self.model.load_state_dict(checkpoint["model_state_dict"])
+
+        # The state of another optimizer, such as L-BFGS, does not load into this one
+
+        optimizer = type(self._optimizer).__name__
+
+        if checkpoint.get("optimizer", optimizer) == optimizer:
+            self._optimizer.load_state_dict(checkpoint["optimizer_state_dict"])
+        else:
+            self.log(
+                f"Checkpoint optimizer {checkpoint['optimizer']} is not {optimizer}, "
+                f"its state is not loaded",
+                level="warning",
+            )
+
+        self._epoch = checkpoint["epoch"] + 1
+
+    def save_checkpoint(self, metric: Optional[float] = None):
+        """Saves the model and optimizer state of the current epoch, see `CheckpointManager`.
+
+        Args:
+            metric (float, optional): The metric ranking the best checkpoints, lower is
+                better, such as the validation loss. Defaults to None.
+        """
+
+        # Data-parallel replicas are equal, only the first process writes
+
+        if not self.is_main:
+            return
+
+        self.checkpoint_manager.save(
+            self.epoch,
+            {
+                "model_state_dict": self.model.state_dict(),
+                "optimizer": type(self.optimizer).__name__,
+                "optimizer_state_dict": self.optimizer.state_dict(),
+            },
+            metric=metric,
         )
 
-        return local_dir
+    def save_model(self, file_path: Optional[Path] = None) -> str:
+        """Saves the model on its own, to be loaded for inference without the trainer.
 
-    def load_checkpoint(self, checkpoint: Optional[str] = "last"):
+        The file holds the model class name, its parameters and its weights, so it loads with
+        `torch.load(weights_only=True)`. Exports of a previous model next to it are removed.
 
-        if checkpoint == "last":
-            checkpoint = "{}.pt".format(self._get_last_checkpoint())
+        Args:
+            file_path (Path, optional): The path to the model file. Defaults to model.pt in
+                the output directory.
 
-        checkpoint = th.load((self.checkpoints_dir / checkpoint).resolve())
+        Returns:
+            str: The path to the model file.
+        """
 
-        self._model.load_state_dict(checkpoint["model_state_dict"])
-        self._optimizer.load_state_dict(checkpoint["optimizer_state_dict"])
-        self._epoch = checkpoint["epoch"]
-        self._loss = checkpoint["loss"]
+        file_path = Path(file_path) if file_path is not None else self._output_dir / MODEL_FILE
 
-    def save_checkpoint(self):
+        # Exports of a previous model would otherwise be served instead of the new model
 
-        checkpoint = str(self._get_last_checkpoint() + 1)
+        for export_file in EXPORT_FILES:
+            (file_path.parent / export_file).unlink(missing_ok=True)
 
         th.save(
             {
-                "epoch": self.epoch,
+                "model": type(self.model).__name__,
+                "model_params": self._model_params,
                 "model_state_dict": self.model.state_dict(),
-                "optimizer_state_dict": self.optimizer.state_dict(),
-                "loss": self.loss,
             },
-            (self.checkpoints_dir / "{}.pt".format(checkpoint)).resolve(),
+            file_path,
         )
 
-    def _get_last_checkpoint(self) -> int:
-        try:
-            res = int(sorted(self.checkpoints)[-1].split(".")[0])
-        except IndexError:
-            res = 0
+        return str(file_path)
+
+    def export_model(
+        self, formats: Optional[Iterable[str]] = ("torchscript", "numpy")
+    ) -> Dict[str, str]:
+        """Exports the model for lightweight inference to the output directory, see
+        `export_model`.
 
-        return res
+        Args:
+            formats (Iterable[str], optional): The export formats.
+                Defaults to ("torchscript", "numpy").
+
+        Returns:
+            Dict[str, str]: The path of every written file, by format.
+        """
+
+        return export_model(self.model, self._output_dir, formats=formats)
+
+    def _get_last_checkpoint(self) -> int:
+        return self.checkpoint_manager.last or 0
 
     def log(self, msg: str, level: Optional[str] = "info"):
         if self._logger is not None:
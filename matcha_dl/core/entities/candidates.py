@@ -0,0 +1,163 @@
+import csv
+from ast import literal_eval
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from matcha_dl.core.entities.vocab import EntityVocab
+
+DataFrame = pd.DataFrame
+
+
+class RankingCandidates:
+    """Ranking candidates parsed once into flat arrays.
+
+    Every row of the candidates file holds a (SrcEntity, TgtEntity) reference mapping and its
+    list of target candidates. Entities are interned into the ids of an entity vocabulary and
+    the candidates of all rows are stored flat, the candidates of row i being
+    `target_ids[indptr[i]:indptr[i + 1]]`.
+
+    Attributes:
+        vocab (EntityVocab): The entity vocabulary.
+        sources (np.ndarray): The source id of every row.
+        references (np.ndarray): The reference target id of every row.
+        target_ids (np.ndarray): The flat target ids of the candidates.
+        indptr (np.ndarray): The offsets of the candidates of every row.
+    """
+
+    def __init__(
+        self,
+        vocab: EntityVocab,
+        sources: np.ndarray,
+        references: np.ndarray,
+        target_ids: np.ndarray,
+        indptr: np.ndarray,
+    ) -> None:
+
+        self._vocab = vocab
+        self._sources = sources
+        self._references = references
+        self._target_ids = target_ids
+        self._indptr = indptr
+
+    @property
+    def vocab(self) -> EntityVocab:
+        return self._vocab
+
+    @property
+    def sources(self) -> np.ndarray:
+        return self._sources
+
+    @property
+    def references(self) -> np.ndarray:
+        return self._references
+
+    @property
+    def target_ids(self) -> np.ndarray:
+        return self._target_ids
+
+    @property
+    def indptr(self) -> np.ndarray:
+        return self._indptr
+
+    def __len__(self) -> int:
+        return len(self._sources)
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Gets the flat (source, candidate) pairs of all rows, in row order.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The source and target ids of every pair.
+        """
+
+        return np.repeat(self._sources, np.diff(self._indptr)), self._target_ids
+
+    def scores(self, sources: np.ndarray, targets: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """Looks up the scores of all the flat candidates among scored pairs.
+
+        Args:
+            sources (np.ndarray): The source id of every scored pair.
+            targets (np.ndarray): The target id of every scored pair.
+            scores (np.ndarray): The score of every scored pair.
+
+        Returns:
+            np.ndarray: The score of every flat candidate, 0.0 for candidates without a score.
+        """
+
+        n_entities = len(self._vocab)
+
+        source_ids, _ = self.pairs()
+        keys = source_ids.astype(np.int64) * n_entities + self._target_ids
+
+        pred_keys = np.asarray(sources, dtype=np.int64) * n_entities + np.asarray(targets)
+        pred_scores = np.asarray(scores)
+
+        order = np.argsort(pred_keys, kind="stable")
+        pred_keys, pred_scores = pred_keys[order], pred_scores[order]
+
+        pos = np.searchsorted(pred_keys, keys, side="right") - 1
+        hit = (pos >= 0) & (pred_keys[np.maximum(pos, 0)] == keys) if len(pred_keys) else pos >= 0
+
+        filled = np.zeros(len(keys), dtype=np.float64)
+        filled[hit] = pred_scores[pos[hit]]
+
+        return filled
+
+    def write_ranking(self, file_path: Union[str, Path], scores: np.ndarray) -> str:
+        """Streams the ranking of every row to a tsv file, resolving the entity ids.
+
+        Args:
+            file_path (Union[str, Path]): The path to the tsv file.
+            scores (np.ndarray): The score of every flat candidate.
+
+        Returns:
+            str: The path to the tsv file.
+        """
+
+        entities = self._vocab.entities.to_numpy()
+
+        with open(file_path, "w", newline="") as f:
+            writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+            writer.writerow(["SrcEntity", "TgtEntity", "TgtCandidates"])
+
+            for i, (source, reference) in enumerate(zip(self._sources, self._references)):
+                start, end = self._indptr[i], self._indptr[i + 1]
+
+                cands = entities[self._target_ids[start:end]].tolist()
+                cand_scores = scores[start:end].tolist()
+
+                writer.writerow(
+                    [entities[source], entities[reference], str(list(zip(cands, cand_scores)))]
+                )
+
+        return str(file_path)
+
+    @classmethod
+    def from_frame(cls, df: DataFrame, vocab: Optional[EntityVocab] = None) -> "RankingCandidates":
+        """Parses the candidates of a (SrcEntity, TgtEntity, TgtCandidates) dataframe once.
+
+        Args:
+            df (DataFrame): The candidates.
+            vocab (EntityVocab, optional): The vocabulary the entities are interned into.
+                Defaults to a new vocabulary.
+
+        Returns:
+            RankingCandidates: The parsed candidates.
+        """
+
+        vocab = vocab if vocab is not None else EntityVocab()
+
+        cands = [literal_eval(target_cands) for target_cands in df["TgtCandidates"]]
+
+        indptr = np.zeros(len(cands) + 1, dtype=np.int64)
+        np.cumsum([len(target_cands) for target_cands in cands], out=indptr[1:])
+
+        return cls(
+            vocab=vocab,
+            sources=vocab.add(df["SrcEntity"]),
+            references=vocab.add(df["TgtEntity"]),
+            target_ids=vocab.add([cand for target_cands in cands for cand in target_cands]),
+            indptr=indptr,
+        )
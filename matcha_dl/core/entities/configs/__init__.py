@@ -1 +1,5 @@
 from .config import ConfigModel
+from .manifest import ManifestModel, PairModel
+from .sweep import SweepModel
+
+__all__ = ["ConfigModel", "ManifestModel", "PairModel", "SweepModel"]
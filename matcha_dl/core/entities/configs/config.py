@@ -1,25 +1,65 @@
 import logging
-from typing import Optional, Type, Union
+from typing import Any, Dict, List, Optional, Type, Union
 
 import torch.optim as optim
-from pydantic import BaseModel, Field, field_validator
+from pydantic import AliasChoices, BaseModel, Field, field_validator, model_validator
 
 from matcha_dl import config, read_yaml
 from matcha_dl.core.contracts.loss import ILoss
 from matcha_dl.core.contracts.model import IModel
-from matcha_dl.impl import losses, models
+from matcha_dl.core.contracts.negative_sampler import INegativeSampler
+from matcha_dl.core.contracts.stopper import IStopper
+from matcha_dl.core.values import MATCHA_ENGINES
+from matcha_dl.impl import losses, models, negative_sampler, stoppers
+from matcha_dl.impl.dp.alignment import ALIGNMENT_STRATEGIES
+from matcha_dl.impl.export import EXPORT_FORMATS
 
 
 class MatchaParams(BaseModel):
     max_heap: str = Field(config["matcha_params"]["max_heap"])
     cardinality: int = Field(config["matcha_params"]["cardinality"])
     threshold: float = Field(config["matcha_params"]["threshold"])
+    engine: str = Field(config["matcha_params"]["engine"])
+
+    @field_validator("engine")
+    def parse_engine(engine: str) -> str:
+        if engine in MATCHA_ENGINES:
+            return engine
+        else:
+            raise ValueError(f"Matcha engine {engine} not in {MATCHA_ENGINES}")
 
 
 class TrainingParams(BaseModel):
     epochs: int = Field(config["training_params"]["epochs"])
     batch_size: Optional[int] = Field(config["training_params"]["batch_size"])
     save_interval: int = Field(config["training_params"]["save_interval"])
+    mode: str = Field(config["training_params"]["mode"])
+    lr_scaling: Optional[str] = Field(config["training_params"]["lr_scaling"])
+    base_batch_size: int = Field(config["training_params"]["base_batch_size"])
+    workers: int = Field(config["training_params"]["workers"])
+    validation_split: float = Field(config["training_params"]["validation_split"])
+
+
+class CheckpointParams(BaseModel):
+    keep_last: Optional[int] = Field(config["checkpoint_params"]["keep_last"])
+    keep_best: int = Field(config["checkpoint_params"]["keep_best"])
+    async_writes: bool = Field(config["checkpoint_params"]["async_writes"])
+
+
+class IncrementalParams(BaseModel):
+    epochs: int = Field(config["incremental_params"]["epochs"])
+
+
+class AlignmentParams(BaseModel):
+    strategy: str = Field(config["alignment_params"]["strategy"])
+    top_k: int = Field(config["alignment_params"]["top_k"])
+
+    @field_validator("strategy")
+    def parse_strategy(strategy: str) -> str:
+        if strategy in ALIGNMENT_STRATEGIES:
+            return strategy
+        else:
+            raise ValueError(f"Alignment strategy {strategy} not in {ALIGNMENT_STRATEGIES}")
 
 
 class ModelParams(BaseModel):
@@ -34,6 +74,40 @@ class ModelParams(BaseModel):
             raise ValueError(f"Model {model_name} not recognized as matcha-dl model")
 
 
+class SamplerParams(BaseModel):
+    sampler: Type[INegativeSampler] = Field(
+        config["negative_sampler"]["name"],
+        validate_default=True,
+        validation_alias=AliasChoices("sampler", "name"),
+    )
+    params: dict = Field(config["negative_sampler"]["params"])
+
+    @field_validator("sampler", mode="before")
+    def parse_sampler(sampler_name: str) -> INegativeSampler:
+        if hasattr(negative_sampler, sampler_name):
+            return getattr(negative_sampler, sampler_name)
+        else:
+            raise ValueError(f"Sampler {sampler_name} not recognized as matcha-dl negative sampler")
+
+
+class StopperParams(BaseModel):
+    stopper: Optional[Type[IStopper]] = Field(
+        config["early_stopping"]["name"],
+        validate_default=True,
+        validation_alias=AliasChoices("stopper", "name"),
+    )
+    params: dict = Field(config["early_stopping"]["params"])
+
+    @field_validator("stopper", mode="before")
+    def parse_stopper(stopper_name: Optional[str]) -> Optional[IStopper]:
+        if stopper_name is None:
+            return None
+        elif hasattr(stoppers, stopper_name):
+            return getattr(stoppers, stopper_name)
+        else:
+            raise ValueError(f"Stopper {stopper_name} not recognized as matcha-dl stopper")
+
+
 class LossParams(BaseModel):
     loss: Type[ILoss] = Field(config["loss"]["name"], validate_default=True)
     params: dict = Field(config["loss"]["params"])
@@ -47,7 +121,11 @@ class LossParams(BaseModel):
 
 
 class OptimizerParams(BaseModel):
-    optimizer: Type[optim.Optimizer] = Field(config["optimizer"]["name"], validate_default=True)
+    optimizer: Type[optim.Optimizer] = Field(
+        config["optimizer"]["name"],
+        validate_default=True,
+        validation_alias=AliasChoices("optimizer", "name"),
+    )
     params: dict = Field(config["optimizer"]["params"])
 
     @field_validator("optimizer", mode="before")
@@ -65,16 +143,47 @@ class ConfigModel(BaseModel):
     logging_level: int = Field(config["logging_level"], validate_default=True)
     use_last_checkpoint: bool = Field(config["use_last_checkpoint"])
     threshold: float = Field(config["threshold"])
+    inference_chunk_size: int = Field(config["inference_chunk_size"])
+    stream_scores: bool = Field(config["stream_scores"])
+    run_report_tensorboard: bool = Field(config["run_report_tensorboard"])
+    export_formats: List[str] = Field(config["export_formats"])
+    cache_dir: Optional[str] = Field(config["cache_dir"])
+    cache_size: float = Field(config["cache_size"])
     matcha_params: MatchaParams = MatchaParams()
+    negative_sampler: SamplerParams = SamplerParams()
     training_params: TrainingParams = TrainingParams()
+    checkpoint_params: CheckpointParams = CheckpointParams()
+    incremental_params: IncrementalParams = IncrementalParams()
+    early_stopping: StopperParams = StopperParams()
+    alignment_params: AlignmentParams = AlignmentParams()
     model: ModelParams = ModelParams()
     loss: LossParams = LossParams()
     optimizer: OptimizerParams = OptimizerParams()
 
+    @model_validator(mode="after")
+    def resolve_optimizer(self) -> "ConfigModel":
+
+        # The lbfgs training mode trains with L-BFGS whatever the optimizer, resolved here so
+        # the trainer is built with it and loads its checkpoints into it
+
+        if self.training_params.mode == "lbfgs" and self.optimizer.optimizer is not optim.LBFGS:
+            self.optimizer = OptimizerParams(
+                optimizer="LBFGS", params={"line_search_fn": "strong_wolfe"}
+            )
+
+        return self
+
     @field_validator("logging_level", mode="before")
     def parse_logging_level(logging_level: str) -> int:
         return getattr(logging, logging_level.upper())
 
+    @field_validator("export_formats")
+    def parse_export_formats(export_formats: List[str]) -> List[str]:
+        for export_format in export_formats:
+            if export_format not in EXPORT_FORMATS:
+                raise ValueError(f"Export format {export_format} not in {EXPORT_FORMATS}")
+        return export_formats
+
     @field_validator("device", mode="before")
     def parse_device(cls, device: Optional[int]) -> Union[int, str]:
         if device is not None:
@@ -84,10 +193,17 @@ class ConfigModel(BaseModel):
 
     @classmethod
     def load_config(cls, file_path: str) -> "ConfigModel":
-        yaml_config = read_yaml(file_path)
+        return cls.from_dict(read_yaml(file_path))
+
+    @classmethod
+    def from_dict(cls, yaml_config: Dict[str, Any]) -> "ConfigModel":
+        yaml_config = yaml_config or {}
 
         matcha_params = MatchaParams(**yaml_config.get("matcha_params", {}))
+        sampler_params = SamplerParams(**yaml_config.get("negative_sampler", {}))
         training_params = TrainingParams(**yaml_config.get("training_params", {}))
+        stopper_params = StopperParams(**(yaml_config.get("early_stopping") or {}))
+        alignment_params = AlignmentParams(**yaml_config.get("alignment_params", {}))
         model_params = ModelParams(**yaml_config.get("model", {}))
         loss_params = LossParams(**yaml_config.get("loss", {}))
         optimizer_params = OptimizerParams(**yaml_config.get("optimizer", {}))
@@ -98,14 +214,27 @@ class ConfigModel(BaseModel):
             for k, v in yaml_config.items()
             if v is not None
             and k in cls.model_fields
-            and k not in ["matcha_params", "training_params", "model", "loss", "optimizer"]
+            and k
+            not in [
+                "matcha_params",
+                "negative_sampler",
+                "training_params",
+                "early_stopping",
+                "alignment_params",
+                "model",
+                "loss",
+                "optimizer",
+            ]
         }
 
         return cls(
             matcha_params=matcha_params,
+            negative_sampler=sampler_params,
             training_params=training_params,
+            early_stopping=stopper_params,
+            alignment_params=alignment_params,
             model=model_params,
             loss=loss_params,
-            optimize=optimizer_params,
+            optimizer=optimizer_params,
             **filtered_config,
         )
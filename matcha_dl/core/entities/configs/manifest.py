@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+from matcha_dl import read_yaml
+
+
+class PairModel(BaseModel):
+    name: Optional[str] = None
+    source_ontology_file: str
+    target_ontology_file: str
+    output_dir: str
+    reference_file: Optional[str] = None
+    candidates_file: Optional[str] = None
+    config_file: Optional[str] = None
+
+
+class ManifestModel(BaseModel):
+    config_file: Optional[str] = None
+    workers: Optional[int] = None
+    memory_budget: Optional[str] = None
+    pairs: List[PairModel] = Field(default_factory=list)
+
+    @classmethod
+    def load_manifest(cls, file_path: str) -> "ManifestModel":
+        """Loads a batch manifest, a yaml file with the list of ontology pairs to align.
+
+        Relative paths are resolved against the manifest directory, pairs without a
+        configuration file use the manifest one and pairs without a name are named after their
+        output directory.
+        """
+
+        manifest_dir = Path(file_path).resolve().parent
+        yaml_manifest = read_yaml(file_path)
+
+        def resolve(path: Optional[str]) -> Optional[str]:
+            return str((manifest_dir / path).resolve()) if path is not None else None
+
+        config_file = resolve(yaml_manifest.get("config_file"))
+
+        pairs = []
+        for pair in yaml_manifest.get("pairs", []):
+            pair = PairModel(**pair)
+
+            pairs.append(
+                pair.model_copy(
+                    update={
+                        "name": pair.name or Path(pair.output_dir).name,
+                        "source_ontology_file": resolve(pair.source_ontology_file),
+                        "target_ontology_file": resolve(pair.target_ontology_file),
+                        "output_dir": resolve(pair.output_dir),
+                        "reference_file": resolve(pair.reference_file),
+                        "candidates_file": resolve(pair.candidates_file),
+                        "config_file": resolve(pair.config_file) or config_file,
+                    }
+                )
+            )
+
+        return cls(
+            config_file=config_file,
+            workers=yaml_manifest.get("workers"),
+            memory_budget=yaml_manifest.get("memory_budget"),
+            pairs=pairs,
+        )
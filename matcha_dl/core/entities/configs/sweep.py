@@ -0,0 +1,95 @@
+import copy
+import itertools
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from matcha_dl import read_yaml
+from matcha_dl.impl.dp.metrics import VALIDATION_METRICS
+
+
+class SweepModel(BaseModel):
+    config_file: Optional[str] = None
+    workers: Optional[int] = None
+    metric: str = "mrr"
+    validation_split: float = 0.2
+    parameters: Dict[str, List[Any]] = Field(default_factory=dict)
+
+    @field_validator("metric")
+    @classmethod
+    def check_metric(cls, v):
+        if v not in VALIDATION_METRICS:
+            raise ValueError(
+                f"Metric {v} not recognized, expected one of {list(VALIDATION_METRICS)}"
+            )
+        return v
+
+    @field_validator("parameters")
+    @classmethod
+    def check_parameters(cls, v):
+        for path, values in v.items():
+            if path.split(".")[0] == "matcha_params":
+                raise ValueError(f"{path} can not be swept, the matcha scores are computed once")
+            if not values:
+                raise ValueError(f"{path} has no values to sweep")
+        return v
+
+    def trials(self) -> List[Dict[str, Any]]:
+        """Gets the grid of trials, every combination of the swept parameter values.
+
+        Returns:
+            List[Dict[str, Any]]: The parameter values of every trial, by dotted path.
+        """
+
+        paths = list(self.parameters)
+
+        return [
+            dict(zip(paths, values))
+            for values in itertools.product(*(self.parameters[path] for path in paths))
+        ]
+
+    @staticmethod
+    def apply(yaml_config: Dict[str, Any], trial: Dict[str, Any]) -> Dict[str, Any]:
+        """Sets the parameter values of a trial on a copy of a yaml configuration.
+
+        Args:
+            yaml_config (Dict[str, Any]): The yaml configuration.
+            trial (Dict[str, Any]): The parameter values, by dotted path such as
+                "optimizer.params.lr".
+
+        Returns:
+            Dict[str, Any]: The configuration of the trial.
+        """
+
+        yaml_config = copy.deepcopy(yaml_config or {})
+
+        for path, value in trial.items():
+            *parents, key = path.split(".")
+
+            section = yaml_config
+            for parent in parents:
+                if not isinstance(section.get(parent), dict):
+                    section[parent] = {}
+                section = section[parent]
+
+            section[key] = copy.deepcopy(value)
+
+        return yaml_config
+
+    @classmethod
+    def load_sweep(cls, file_path: str) -> "SweepModel":
+        """Loads a sweep file, a yaml file with the values of the parameters to sweep.
+
+        A relative configuration file path is resolved against the sweep file directory.
+        """
+
+        sweep_dir = Path(file_path).resolve().parent
+        yaml_sweep = read_yaml(file_path) or {}
+
+        config_file = yaml_sweep.get("config_file")
+
+        if config_file is not None:
+            yaml_sweep["config_file"] = str((sweep_dir / config_file).resolve())
+
+        return cls(**yaml_sweep)
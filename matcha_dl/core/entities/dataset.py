@@ -1,54 +1,261 @@
+import os
+import shutil
 from ast import literal_eval
-from typing import Optional
+from pathlib import Path
+from typing import Optional, Union
 
 import numpy as np
 import pandas as pd
 
+from matcha_dl.core.entities.candidates import RankingCandidates
+from matcha_dl.core.entities.vocab import EntityVocab
+
 DataFrame = pd.DataFrame
 
+CSV_SUFFIX = ".csv"
+ENTITIES_FILE = "entities.txt"
+
 
 class MlpDataset:
 
     def __init__(
         self,
         dataframe: DataFrame,
+        features: Optional[np.ndarray] = None,
         ref: Optional[DataFrame] = None,
-        candidates: Optional[DataFrame] = None,
+        candidates: Optional[RankingCandidates] = None,
+        vocab: Optional[EntityVocab] = None,
     ) -> None:
+        """
+
+        Args:
+            dataframe (DataFrame): The (SrcEntity, TgtEntity, Labels, train, inference) table,
+                with the entities as int32 ids of the vocabulary.
+            features (np.ndarray, optional): The (rows, matchers) float32 feature matrix aligned
+                with the dataframe rows. Defaults to the "Features" column of the dataframe.
+            ref (DataFrame, optional): The reference data, with the entities as ids.
+                Defaults to None.
+            candidates (RankingCandidates, optional): The ranking candidates. Defaults to None.
+            vocab (EntityVocab, optional): The entity vocabulary. Defaults to the vocabulary of
+                the candidates, or a vocabulary interning the entities of the dataframe if they
+                are not ids.
+        """
+
+        if features is None:
+            features = np.array(dataframe["Features"].values.tolist())
+            dataframe = dataframe.drop(columns="Features")
+
+        if vocab is None:
+            vocab = candidates.vocab if candidates is not None else EntityVocab()
+
+        if not pd.api.types.is_integer_dtype(dataframe["SrcEntity"]):
+            dataframe = dataframe.assign(
+                SrcEntity=vocab.add(dataframe["SrcEntity"]),
+                TgtEntity=vocab.add(dataframe["TgtEntity"]),
+            )
 
         self._ref = ref
         self._df = dataframe
+        self._features = np.ascontiguousarray(features, dtype=np.float32)
         self._candidates = candidates
+        self._vocab = vocab
 
     @property
     def reference(self) -> DataFrame:
         return self._ref
 
     @property
-    def candidates(self) -> DataFrame:
+    def candidates(self) -> RankingCandidates:
         return self._candidates
 
+    @property
+    def vocab(self) -> EntityVocab:
+        return self._vocab
+
     @property
     def dataframe(self) -> DataFrame:
         return self._df
 
+    @property
+    def features(self) -> np.ndarray:
+        return self._features
+
     def x(self, kind: Optional[str] = "train") -> np.ndarray:
-        return np.array(self.dataframe[self._df[kind]]["Features"].values.tolist())
+        return self._features[self._df[kind].to_numpy(dtype=bool)]
 
     def y(self, kind="train") -> np.ndarray:
         return self.dataframe[self.dataframe[kind]]["Labels"].values
 
-    def save(self, save_path: str) -> str:
-        self.dataframe.to_csv(save_path, index=False)
+    def split_validation(self, fraction: float, seed: Optional[int] = 42) -> None:
+        """Holds out the training rows of a random fraction of the reference sources.
+
+        The held-out rows move from the "train" kind to the "validation" kind. Rows are split
+        by source, so the positive and negative pairs of a source stay on the same side.
+        Splitting again first returns the held-out rows to training.
+
+        Args:
+            fraction (float): The fraction of the sources held out.
+            seed (int, optional): The seed of the split. Defaults to 42.
+        """
+
+        train = self._df["train"].to_numpy(dtype=bool)
+
+        if "validation" in self._df:
+            train = train | self._df["validation"].to_numpy(dtype=bool)
+
+        sources = self._df["SrcEntity"].to_numpy()[train]
+        unique = np.unique(sources)
+
+        held_out = np.random.default_rng(seed).choice(
+            unique, size=int(round(len(unique) * fraction)), replace=False
+        )
+
+        validation = np.zeros(len(self._df), dtype=bool)
+        validation[train] = np.isin(sources, held_out)
+
+        self._df = self._df.assign(train=train & ~validation, validation=validation)
+
+    def save(self, save_path: Union[str, Path]) -> str:
+        """Saves the dataset.
+
+        Paths with a ".csv" suffix are exported as CSV, any other path is written as a binary
+        cache directory holding .npy arrays that are memory-mapped on load.
+
+        Args:
+            save_path (Union[str, Path]): The path to save the dataset to.
+
+        Returns:
+            str: The path the dataset was saved to.
+        """
+
+        if Path(save_path).suffix == CSV_SUFFIX:
+            return self.to_csv(save_path)
+
+        save_path = Path(save_path)
+        tmp_path = save_path.with_name(save_path.name + ".tmp")
+
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        np.save(tmp_path / "src.npy", self.dataframe["SrcEntity"].to_numpy(dtype=np.int32))
+        np.save(tmp_path / "tgt.npy", self.dataframe["TgtEntity"].to_numpy(dtype=np.int32))
+        np.save(tmp_path / "labels.npy", self.dataframe["Labels"].to_numpy(dtype=np.float32))
+        np.save(tmp_path / "train.npy", self.dataframe["train"].to_numpy(dtype=bool))
+        np.save(tmp_path / "inference.npy", self.dataframe["inference"].to_numpy(dtype=bool))
+        np.save(tmp_path / "features.npy", self.features)
 
-        return save_path
+        self.vocab.save(tmp_path / ENTITIES_FILE)
+
+        if save_path.is_dir():
+            shutil.rmtree(save_path)
+        elif save_path.exists():
+            save_path.unlink()
+
+        os.replace(tmp_path, save_path)
+
+        return str(save_path)
+
+    def to_csv(self, save_path: Union[str, Path]) -> str:
+        """Exports the dataset as CSV, with the entity ids resolved and the features serialized
+        as lists.
+
+        Args:
+            save_path (Union[str, Path]): The path to the CSV file.
+
+        Returns:
+            str: The path to the CSV file.
+        """
+
+        self.dataframe.assign(
+            SrcEntity=self.vocab.decode(self.dataframe["SrcEntity"]),
+            TgtEntity=self.vocab.decode(self.dataframe["TgtEntity"]),
+            Features=self.features.tolist(),
+        ).to_csv(save_path, index=False)
+
+        return str(save_path)
+
+    @staticmethod
+    def exists(file_path: Union[str, Path]) -> bool:
+        """Checks if a saved dataset exists at the given path.
+
+        Args:
+            file_path (Union[str, Path]): The path of the saved dataset.
+
+        Returns:
+            bool: True if the dataset exists, False otherwise.
+        """
+
+        file_path = Path(file_path)
+
+        if file_path.suffix == CSV_SUFFIX:
+            return file_path.is_file()
+
+        return (file_path / ENTITIES_FILE).is_file()
 
     @classmethod
     def load(
-        cls, file_path: str, ref: Optional[DataFrame] = None, candidates: Optional[DataFrame] = None
+        cls,
+        file_path: Union[str, Path],
+        ref: Optional[DataFrame] = None,
+        candidates: Optional[RankingCandidates] = None,
+        vocab: Optional[EntityVocab] = None,
     ) -> "MlpDataset":
+        """Loads a saved dataset, either a binary cache directory or an exported CSV.
+
+        The features of a binary cache are memory-mapped, not copied.
+
+        Args:
+            file_path (Union[str, Path]): The path of the saved dataset.
+            ref (DataFrame, optional): The reference data. Defaults to None.
+            candidates (RankingCandidates, optional): The ranking candidates. Defaults to None.
+            vocab (EntityVocab, optional): The vocabulary the saved entities are interned into,
+                shared with the reference data and the candidates. Defaults to the vocabulary
+                of the candidates, or the saved vocabulary.
+
+        Returns:
+            MlpDataset: The dataset.
+        """
+
+        file_path = Path(file_path)
+
+        if vocab is None and candidates is not None:
+            vocab = candidates.vocab
+
+        if file_path.suffix == CSV_SUFFIX:
+            return cls(
+                dataframe=pd.read_csv(file_path, converters={"Features": literal_eval}),
+                ref=ref,
+                candidates=candidates,
+                vocab=vocab,
+            )
+
+        saved = EntityVocab.load(file_path / ENTITIES_FILE)
+
+        src = np.load(file_path / "src.npy")
+        tgt = np.load(file_path / "tgt.npy")
+
+        if vocab is None:
+            vocab = saved
+        else:
+            # Remap the saved ids into the shared vocabulary
+            ids = vocab.add(saved.entities)
+            src, tgt = ids[src], ids[tgt]
+
+        dataframe = pd.DataFrame(
+            {
+                "SrcEntity": src,
+                "TgtEntity": tgt,
+                "Labels": np.load(file_path / "labels.npy"),
+                "train": np.load(file_path / "train.npy"),
+                "inference": np.load(file_path / "inference.npy"),
+            }
+        )
+
         return cls(
-            dataframe=pd.read_csv(file_path, converters={"Features": literal_eval}),
+            dataframe=dataframe,
+            features=np.load(file_path / "features.npy", mmap_mode="r"),
             ref=ref,
             candidates=candidates,
+            vocab=vocab,
         )
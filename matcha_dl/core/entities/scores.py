@@ -0,0 +1,407 @@
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from matcha_dl.core.entities.vocab import EntityVocab
+from matcha_dl.core.values import MATCHERS, SOURCE_COLUMN, TARGET_COLUMN
+
+DataFrame = pd.DataFrame
+
+# `pd.read_csv` arguments of the matcha scores file
+CSV_KWARGS = dict(
+    usecols=[SOURCE_COLUMN, TARGET_COLUMN, *MATCHERS],
+    dtype={matcher: np.float32 for matcher in MATCHERS},
+)
+
+
+class MatchaScores:
+    """Columnar index over the matcha scores file.
+
+    Entities are interned into the ids of an entity vocabulary and the rows are sorted by
+    (source, target) id, so the candidates of a source are a contiguous slice of the arrays
+    delimited by `indptr`. The index is a CSR sparse (sources, targets) matrix with one feature
+    plane per matcher: `indptr` are its row offsets, `target_ids` its column indices and the
+    columns of `features` its data.
+
+    Attributes:
+        vocab (EntityVocab): The entity vocabulary.
+        source_ids (np.ndarray): The source id of every row.
+        target_ids (np.ndarray): The target id of every row.
+        features (np.ndarray): The (rows, matchers) float32 matrix of matcha scores.
+        indptr (np.ndarray): Row offsets of every source id.
+    """
+
+    def __init__(
+        self,
+        vocab: EntityVocab,
+        source_ids: np.ndarray,
+        target_ids: np.ndarray,
+        features: np.ndarray,
+    ) -> None:
+
+        order = np.lexsort((target_ids, source_ids))
+
+        self._vocab = vocab
+        self._source_ids = np.ascontiguousarray(source_ids[order], dtype=np.int32)
+        self._target_ids = np.ascontiguousarray(target_ids[order], dtype=np.int32)
+        self._features = np.ascontiguousarray(features[order], dtype=np.float32)
+
+        # Entities interned after the index was built have no scores
+        self._n_entities = len(vocab)
+
+        self._indptr = np.zeros(self._n_entities + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self._source_ids, minlength=self._n_entities), out=self._indptr[1:])
+
+        self._keys = self._encode(self._source_ids, self._target_ids)
+        self._ranking = None
+
+    @property
+    def vocab(self) -> EntityVocab:
+        return self._vocab
+
+    @property
+    def sources(self) -> np.ndarray:
+        """The ids of the sources with candidates, in id order."""
+        return np.flatnonzero(np.diff(self._indptr)).astype(np.int32)
+
+    @property
+    def source_ids(self) -> np.ndarray:
+        return self._source_ids
+
+    @property
+    def target_ids(self) -> np.ndarray:
+        return self._target_ids
+
+    @property
+    def features(self) -> np.ndarray:
+        return self._features
+
+    @property
+    def indptr(self) -> np.ndarray:
+        return self._indptr
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def __contains__(self, source: str) -> bool:
+        source_id = self._vocab.ids([source])[0]
+
+        if not 0 <= source_id < self._n_entities:
+            return False
+
+        return bool(self._indptr[source_id + 1] > self._indptr[source_id])
+
+    def _encode(self, source_ids: np.ndarray, target_ids: np.ndarray) -> np.ndarray:
+        return source_ids.astype(np.int64) * self._n_entities + target_ids
+
+    def _known(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids)
+        return ids[(ids >= 0) & (ids < self._n_entities)]
+
+    def matrix(self, matcher: Optional[str] = None):
+        """Gets a feature plane as a scipy CSR (sources, targets) matrix.
+
+        Args:
+            matcher (str, optional): The matcher of the plane. Defaults to None, the best score
+                over all matchers.
+
+        Returns:
+            scipy.sparse.csr_array: The matrix, indexed by entity ids.
+        """
+
+        from scipy.sparse import csr_array
+
+        if matcher is None:
+            data = self._features.max(axis=1)
+        else:
+            data = self._features[:, MATCHERS.index(matcher)]
+
+        return csr_array(
+            (data, self._target_ids, self._indptr),
+            shape=(self._n_entities, self._n_entities),
+            copy=False,
+        )
+
+    def rows(self, sources: np.ndarray) -> np.ndarray:
+        """Gets the row positions of all the candidates of the given sources.
+
+        Args:
+            sources (np.ndarray): The source ids. Unknown sources are ignored.
+
+        Returns:
+            np.ndarray: The row positions, grouped by source in the given order.
+        """
+
+        ids = self._known(sources)
+
+        starts = self._indptr[ids]
+        counts = self._indptr[ids + 1] - starts
+
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+
+        return offsets + np.arange(counts.sum(), dtype=np.int64)
+
+    def candidates(self, sources: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Gets the matcha candidates of the given sources.
+
+        Args:
+            sources (np.ndarray): The source ids.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The source and target ids of every candidate.
+        """
+
+        rows = self.rows(sources)
+
+        return self._source_ids[rows], self._target_ids[rows]
+
+    def top_candidates(self, sources: np.ndarray, k: int) -> np.ndarray:
+        """Gets the ids of the k best matcha candidates of the given sources.
+
+        Candidates are ranked by their best score over all matchers.
+
+        Args:
+            sources (np.ndarray): The source ids.
+            k (int): The number of candidates per source.
+
+        Returns:
+            np.ndarray: The (sources, k) target ids, padded with -1 for sources with fewer than
+                k candidates or unknown sources.
+        """
+
+        ids = np.asarray(sources, dtype=np.int64)
+
+        if len(self) == 0:
+            return np.full((len(ids), k), -1, dtype=self._target_ids.dtype)
+
+        if self._ranking is None:
+            self._ranking = np.lexsort((-self._features.max(axis=1), self._source_ids))
+
+        known = (ids >= 0) & (ids < self._n_entities)
+        ids = np.where(known, ids, 0)
+
+        starts = np.where(known, self._indptr[ids], 0)
+        counts = np.where(known, self._indptr[ids + 1] - starts, 0)
+
+        ranks = np.arange(k)
+        valid = ranks < counts[:, None]
+
+        pos = np.where(valid, starts[:, None] + ranks, 0)
+
+        return np.where(valid, self._target_ids[self._ranking[pos]], -1)
+
+    def lookup(self, sources: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Gets the matcha scores of a batch of (source, target) pairs.
+
+        Args:
+            sources (np.ndarray): The source id of every pair.
+            targets (np.ndarray): The target id of every pair.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The (pairs, matchers) scores, with zeros for pairs
+                without scores, and the boolean mask of the pairs found in the index.
+        """
+
+        source_ids = np.asarray(sources)
+        target_ids = np.asarray(targets)
+
+        found = (
+            (source_ids >= 0)
+            & (source_ids < self._n_entities)
+            & (target_ids >= 0)
+            & (target_ids < self._n_entities)
+        )
+
+        keys = self._encode(source_ids[found], target_ids[found])
+        pos = np.minimum(np.searchsorted(self._keys, keys), max(len(self._keys) - 1, 0))
+        hit = self._keys[pos] == keys if len(self._keys) else np.zeros(len(keys), dtype=bool)
+
+        found[found] = hit
+
+        features = np.zeros((len(found), len(MATCHERS)), dtype=np.float32)
+        features[found] = self._features[pos[hit]]
+
+        return features, found
+
+    def diff(self, other: "MatchaScores") -> np.ndarray:
+        """Gets the sources whose candidates or scores differ from another index over the same
+        vocabulary, such as the scores of a previous ontology version.
+
+        Args:
+            other (MatchaScores): The other index.
+
+        Returns:
+            np.ndarray: The ids of the sources with a candidate added, removed or rescored, in
+                id order.
+        """
+
+        if other.vocab is not self._vocab:
+            raise ValueError("Only indexes over the same vocabulary can be compared")
+
+        # Keys are unique within an index, the rows of a pair are matched by key
+
+        n_entities = len(self._vocab)
+
+        keys = self._source_ids.astype(np.int64) * n_entities + self._target_ids
+        other_keys = other.source_ids.astype(np.int64) * n_entities + other.target_ids
+
+        _, rows, other_rows = np.intersect1d(
+            keys, other_keys, assume_unique=True, return_indices=True
+        )
+
+        equal = (self._features[rows] == other.features[other_rows]).all(axis=1)
+
+        same = np.zeros(len(keys), dtype=bool)
+        same[rows[equal]] = True
+
+        other_same = np.zeros(len(other_keys), dtype=bool)
+        other_same[other_rows[equal]] = True
+
+        return np.union1d(self._source_ids[~same], other.source_ids[~other_same]).astype(np.int32)
+
+    def get(self, source: str, target: str, default: Optional[np.ndarray] = None):
+        """Gets the matcha scores of a single (source, target) pair.
+
+        Args:
+            source (str): The source entity.
+            target (str): The target entity.
+            default (np.ndarray, optional): Returned if the pair has no scores. Defaults to None.
+
+        Returns:
+            np.ndarray: The scores of the pair.
+        """
+
+        features, found = self.lookup(self._vocab.ids([source]), self._vocab.ids([target]))
+
+        return features[0] if found[0] else default
+
+    @classmethod
+    def from_frame(cls, df: DataFrame, vocab: Optional[EntityVocab] = None) -> "MatchaScores":
+        """Builds the index from a dataframe with the matcha scores file columns.
+
+        Duplicated pairs keep the last scores in the file.
+
+        Args:
+            df (DataFrame): The matcha scores.
+            vocab (EntityVocab, optional): The vocabulary the entities are interned into.
+                Defaults to a new vocabulary.
+
+        Returns:
+            MatchaScores: The index.
+        """
+
+        return cls.from_chunks([df], vocab=vocab)
+
+    @classmethod
+    def from_chunks(
+        cls, chunks: Iterable[DataFrame], vocab: Optional[EntityVocab] = None
+    ) -> "MatchaScores":
+        """Builds the index from chunks of rows with the matcha scores file columns.
+
+        Duplicated pairs keep the last scores in the file.
+
+        Args:
+            chunks (Iterable[DataFrame]): The chunks of matcha scores, in file order.
+            vocab (EntityVocab, optional): The vocabulary the entities are interned into.
+                Defaults to a new vocabulary.
+
+        Returns:
+            MatchaScores: The index.
+        """
+
+        builder = MatchaScoresBuilder(vocab=vocab)
+
+        for chunk in chunks:
+            builder.add(chunk)
+
+        return builder.build()
+
+    @classmethod
+    def from_csv(
+        cls,
+        csv_file: str,
+        vocab: Optional[EntityVocab] = None,
+    ) -> "MatchaScores":
+        """Reads the matcha scores file once and builds the index.
+
+        Args:
+            csv_file (str): The matcha scores file.
+            vocab (EntityVocab, optional): The vocabulary the entities are interned into.
+                Defaults to a new vocabulary.
+
+        Returns:
+            MatchaScores: The index.
+        """
+
+        return cls.from_frame(pd.read_csv(csv_file, **CSV_KWARGS), vocab=vocab)
+
+
+class MatchaScoresBuilder:
+    """Builds a MatchaScores index incrementally from chunks of the matcha scores file.
+
+    Entities are interned as chunks arrive, so parsing a scores file that is still being
+    written overlaps with its producer and only the final sort is left once it is complete.
+    """
+
+    def __init__(self, vocab: Optional[EntityVocab] = None) -> None:
+        """
+
+        Args:
+            vocab (EntityVocab, optional): The vocabulary the entities are interned into.
+                Defaults to a new vocabulary.
+        """
+
+        self._vocab = vocab if vocab is not None else EntityVocab()
+        self._source_ids = []
+        self._target_ids = []
+        self._features = []
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._source_ids)
+
+    def add(self, df: DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Adds a chunk of rows with the matcha scores file columns.
+
+        Args:
+            df (DataFrame): The chunk.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The source ids, target ids and
+                (rows, matchers) features of the chunk.
+        """
+
+        # Interned row by row, so the ids do not depend on how the file is chunked
+        ids = self._vocab.add(df[[SOURCE_COLUMN, TARGET_COLUMN]].to_numpy(dtype=object).ravel())
+
+        self._source_ids.append(ids[0::2])
+        self._target_ids.append(ids[1::2])
+        self._features.append(df[MATCHERS].to_numpy(dtype=np.float32))
+
+        return self._source_ids[-1], self._target_ids[-1], self._features[-1]
+
+    def build(self) -> MatchaScores:
+        """Builds the index from all the added chunks.
+
+        Duplicated pairs keep the last scores added.
+
+        Returns:
+            MatchaScores: The index.
+        """
+
+        source_ids = np.concatenate(self._source_ids or [np.zeros(0, dtype=np.int32)])
+        target_ids = np.concatenate(self._target_ids or [np.zeros(0, dtype=np.int32)])
+        features = np.concatenate(
+            self._features or [np.zeros((0, len(MATCHERS)), dtype=np.float32)]
+        )
+
+        keys = source_ids.astype(np.int64) * len(self._vocab) + target_ids
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = np.sort(len(keys) - 1 - last)
+
+        return MatchaScores(
+            vocab=self._vocab,
+            source_ids=source_ids[keep],
+            target_ids=target_ids[keep],
+            features=features[keep],
+        )
@@ -0,0 +1,116 @@
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+Index = pd.Index
+
+
+class EntityVocab:
+    """Interns entity IRIs into compact int32 ids.
+
+    Source and target entities share the vocabulary. Ids are assigned in order of first
+    appearance and never change, so tables keyed on ids stay valid as the vocabulary grows.
+    IRIs are only resolved back from ids when alignments are written.
+
+    Attributes:
+        entities (Index): The entities, position is the entity id.
+    """
+
+    def __init__(self, entities: Optional[Iterable[str]] = None) -> None:
+        """
+
+        Args:
+            entities (Iterable[str], optional): The unique entities, in id order.
+                Defaults to None.
+        """
+
+        self._entities = pd.Index([] if entities is None else entities, dtype=object)
+
+    @property
+    def entities(self) -> Index:
+        return self._entities
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def __contains__(self, entity: str) -> bool:
+        return entity in self._entities
+
+    def add(self, values: Iterable[str]) -> np.ndarray:
+        """Interns entities, appending the unseen ones in order of first appearance.
+
+        Args:
+            values (Iterable[str]): The entities.
+
+        Returns:
+            np.ndarray: The int32 id of every entity.
+        """
+
+        values = pd.Index(values, dtype=object)
+
+        ids = self._entities.get_indexer(values)
+        unseen = ids < 0
+
+        if unseen.any():
+            unseen_ids, unseen_values = pd.factorize(values[unseen])
+            ids[unseen] = unseen_ids + len(self._entities)
+            self._entities = self._entities.append(pd.Index(unseen_values, dtype=object))
+
+        return ids.astype(np.int32)
+
+    def ids(self, values: Iterable[str]) -> np.ndarray:
+        """Gets the ids of entities, without interning unseen ones.
+
+        Args:
+            values (Iterable[str]): The entities.
+
+        Returns:
+            np.ndarray: The int32 id of every entity, -1 for unknown entities.
+        """
+
+        return self._entities.get_indexer(pd.Index(values, dtype=object)).astype(np.int32)
+
+    def decode(self, ids: np.ndarray) -> np.ndarray:
+        """Resolves ids back to their entities.
+
+        Args:
+            ids (np.ndarray): The entity ids.
+
+        Returns:
+            np.ndarray: The entity of every id.
+        """
+
+        return self._entities.to_numpy()[np.asarray(ids, dtype=np.int64)]
+
+    def save(self, file_path: Union[str, Path]) -> str:
+        """Writes the entities one per line, in id order.
+
+        Args:
+            file_path (Union[str, Path]): The path to the text file.
+
+        Returns:
+            str: The path to the text file.
+        """
+
+        with open(file_path, "w") as f:
+            f.write("\n".join(self._entities))
+
+        return str(file_path)
+
+    @classmethod
+    def load(cls, file_path: Union[str, Path]) -> "EntityVocab":
+        """Reads the entities written by `save`.
+
+        Args:
+            file_path (Union[str, Path]): The path to the text file.
+
+        Returns:
+            EntityVocab: The vocabulary.
+        """
+
+        with open(file_path, "r") as f:
+            text = f.read()
+
+        return cls(text.split("\n") if text else [])
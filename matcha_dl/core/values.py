@@ -4,6 +4,21 @@ DEFAULT_REL = "<?rel>"
 DUP_STRATEGIES = ["average", "kept_new", "kept_old"]
 DEFAULT_DUP_STRATEGY = DUP_STRATEGIES[0]
 
+# MATCHA SCORES
+
+SOURCE_COLUMN = "Entity 1"
+TARGET_COLUMN = "Entity 2"
+MATCHERS = ["LM", "WM", "SM", "BKM", "LLMM"]
+
+# MATCHA
+
+MATCHA_ENGINES = ["subprocess", "worker"]
+
+# OUTPUT DIRECTORY
+
+MATCHA_SCORES_FILE = "matcha_scores.csv"
+PROCESSED_DATASET = "processed_dataset"
+
 # MODEL
 
 N_CLASSES = 1
@@ -2,6 +2,8 @@ from pathlib import Path
 from typing import Optional
 
 from matcha_dl.core.actions.alignment import AlignmentAction
+from matcha_dl.core.actions.batch import BatchAlignmentAction
+from matcha_dl.core.actions.sweep import SweepAction
 
 
 class AlignmentRunner:
@@ -17,6 +19,7 @@ class AlignmentRunner:
         reference_file: Optional[str] = None,
         candidates_file: Optional[str] = None,
         config_file: Optional[str] = None,
+        incremental: Optional[bool] = False,
     ):
         """
 
@@ -27,6 +30,8 @@ class AlignmentRunner:
             reference_file (str, optional): Path to the reference file. Defaults to None.
             candidates_file (str, optional): Path to the candidates file. Defaults to None.
             config_file (str, optional): Path to the configuration file. Defaults to None.
+            incremental (bool, optional): Update the previous alignment of the output
+                directory instead of recomputing it. Defaults to False.
         """
         self.source_ontology_file = source_ontology_file
         self.target_ontology_file = target_ontology_file
@@ -34,6 +39,7 @@ class AlignmentRunner:
         self.reference_file = reference_file
         self.candidates_file = candidates_file
         self.config_file = config_file
+        self.incremental = incremental
 
     def run_alignment(self) -> None:
 
@@ -42,8 +48,13 @@ class AlignmentRunner:
             target_file_path=str(Path(self.target_ontology_file).resolve()),
             output_dir_path=str(Path(self.output_dir).resolve()),
             configs_file_path=str(Path(self.config_file).resolve()) if self.config_file else None,
-            reference_file_path=str(Path(self.reference_file).resolve()) if self.reference_file else None,
-            candidates_file_path=str(Path(self.candidates_file).resolve()) if self.candidates_file else None,
+            reference_file_path=(
+                str(Path(self.reference_file).resolve()) if self.reference_file else None
+            ),
+            candidates_file_path=(
+                str(Path(self.candidates_file).resolve()) if self.candidates_file else None
+            ),
+            incremental=self.incremental,
         )
 
     def validate_files(self) -> None:
@@ -68,3 +79,123 @@ class AlignmentRunner:
 
         self.validate_files()
         self.run_alignment()
+
+
+class BatchAlignmentRunner:
+    """
+    Class to run the alignment of all the ontology pairs of a manifest.
+    """
+
+    def __init__(
+        self,
+        manifest_file: str,
+        workers: Optional[int] = None,
+        memory_budget: Optional[str] = None,
+        report_file: Optional[str] = None,
+    ):
+        """
+
+        Args:
+            manifest_file (str): Path to the manifest file.
+            workers (int, optional): Number of worker processes. Defaults to None.
+            memory_budget (str, optional): Memory available to Matcha JVMs, e.g. "128G".
+                Defaults to None.
+            report_file (str, optional): Path to the per-pair timings report. Defaults to None.
+        """
+        self.manifest_file = manifest_file
+        self.workers = workers
+        self.memory_budget = memory_budget
+        self.report_file = report_file
+
+    def validate_files(self) -> None:
+
+        if not Path(self.manifest_file).exists():
+            raise Exception(f"Manifest file {self.manifest_file} does not exist")
+
+    def run(self) -> list:
+
+        self.validate_files()
+
+        return BatchAlignmentAction.run(
+            manifest_file_path=str(Path(self.manifest_file).resolve()),
+            workers=self.workers,
+            memory_budget=self.memory_budget,
+            report_file_path=str(Path(self.report_file).resolve()) if self.report_file else None,
+        )
+
+
+class SweepRunner:
+    """
+    Class to run a hyperparameter sweep of the training of an ontology pair.
+    """
+
+    def __init__(
+        self,
+        source_ontology_file: str,
+        target_ontology_file: str,
+        output_dir: str,
+        reference_file: str,
+        sweep_file: str,
+        candidates_file: Optional[str] = None,
+        config_file: Optional[str] = None,
+        workers: Optional[int] = None,
+        report_file: Optional[str] = None,
+    ):
+        """
+
+        Args:
+            source_ontology_file (str): Path to the source ontology file.
+            target_ontology_file (str): Path to the target ontology file.
+            output_dir (str): Path to the output directory.
+            reference_file (str): Path to the reference file.
+            sweep_file (str): Path to the sweep file.
+            candidates_file (str, optional): Path to the candidates file. Defaults to None.
+            config_file (str, optional): Path to the configuration file, if the sweep file
+                has none. Defaults to None.
+            workers (int, optional): Number of worker processes. Defaults to None.
+            report_file (str, optional): Path to the ranked trials report. Defaults to None.
+        """
+        self.source_ontology_file = source_ontology_file
+        self.target_ontology_file = target_ontology_file
+        self.output_dir = output_dir
+        self.reference_file = reference_file
+        self.sweep_file = sweep_file
+        self.candidates_file = candidates_file
+        self.config_file = config_file
+        self.workers = workers
+        self.report_file = report_file
+
+    def validate_files(self) -> None:
+
+        if not Path(self.source_ontology_file).exists():
+            raise Exception(f"Source ontology file {self.source_ontology_file} does not exist")
+        if not Path(self.target_ontology_file).exists():
+            raise Exception(f"Target ontology file {self.target_ontology_file} does not exist")
+        if not Path(self.reference_file).exists():
+            raise Exception(f"Reference file {self.reference_file} does not exist")
+        if not Path(self.sweep_file).exists():
+            raise Exception(f"Sweep file {self.sweep_file} does not exist")
+        if self.candidates_file and not Path(self.candidates_file).exists():
+            raise Exception(f"Candidates file {self.candidates_file} does not exist")
+        if self.config_file and not Path(self.config_file).exists():
+            raise Exception(f"Configuration file {self.config_file} does not exist")
+        if not Path(self.output_dir).exists():
+            Path(self.output_dir).mkdir(parents=True)
+
+    def run(self) -> list:
+
+        self.validate_files()
+
+        return SweepAction.run(
+            source_file_path=str(Path(self.source_ontology_file).resolve()),
+            target_file_path=str(Path(self.target_ontology_file).resolve()),
+            output_dir_path=str(Path(self.output_dir).resolve()),
+            sweep_file_path=str(Path(self.sweep_file).resolve()),
+            reference_file_path=str(Path(self.reference_file).resolve()),
+            candidates_file_path=(
+                str(Path(self.candidates_file).resolve()) if self.candidates_file else None
+            ),
+            configs_file_path=str(Path(self.config_file).resolve()) if self.config_file else None,
+            workers=self.workers,
+            report_file_path=str(Path(self.report_file).resolve()) if self.report_file else None,
+        )
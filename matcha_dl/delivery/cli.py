@@ -1,7 +1,11 @@
 import argparse
+import logging
+import sys
 from pathlib import Path
 
 from matcha_dl.core.actions.alignment import AlignmentAction
+from matcha_dl.core.actions.batch import BatchAlignmentAction
+from matcha_dl.core.actions.sweep import SweepAction
 
 
 def run_alignment(args):
@@ -10,32 +14,269 @@ def run_alignment(args):
         target_file_path=str(Path(args.target_ontology_file).resolve()),
         output_dir_path=str(Path(args.output_dir).resolve()),
         configs_file_path=str(Path(args.config_file).resolve()) if args.config_file else None,
-        reference_file_path=str(Path(args.reference_file).resolve()) if args.reference_file else None,
-        candidates_file_path=str(Path(args.candidates_file).resolve()) if args.candidates_file else None,
+        reference_file_path=(
+            str(Path(args.reference_file).resolve()) if args.reference_file else None
+        ),
+        candidates_file_path=(
+            str(Path(args.candidates_file).resolve()) if args.candidates_file else None
+        ),
+        incremental=args.incremental,
     )
 
 
-def parse_arguments():
+def run_batch_alignment(args):
+    BatchAlignmentAction.run(
+        manifest_file_path=str(Path(args.manifest_file).resolve()),
+        workers=args.workers,
+        memory_budget=args.memory_budget,
+        report_file_path=str(Path(args.report_file).resolve()) if args.report_file else None,
+    )
+
+
+def run_sweep(args):
+    SweepAction.run(
+        source_file_path=str(Path(args.source_ontology_file).resolve()),
+        target_file_path=str(Path(args.target_ontology_file).resolve()),
+        output_dir_path=str(Path(args.output_dir).resolve()),
+        sweep_file_path=str(Path(args.sweep_file).resolve()),
+        reference_file_path=str(Path(args.reference_file).resolve()),
+        candidates_file_path=(
+            str(Path(args.candidates_file).resolve()) if args.candidates_file else None
+        ),
+        configs_file_path=str(Path(args.config_file).resolve()) if args.config_file else None,
+        workers=args.workers,
+        report_file_path=str(Path(args.report_file).resolve()) if args.report_file else None,
+    )
+
+
+def load_service(args, logger):
+    from matcha_dl.impl.service import RankingService
+
+    if args.output_dir:
+        service = RankingService.from_output_dir(args.output_dir, device=args.device, logger=logger)
+    else:
+        service = RankingService.load(
+            args.scores_file, model_file=args.model_file, device=args.device, logger=logger
+        )
+
+    logger.info(
+        f"Ranking with {'the trained model' if service.model is not None else 'matcha scores'}"
+        f" over {len(service.matcha_scores)} scored pairs"
+    )
+
+    return service
+
+
+def service_logger():
+    logging.basicConfig(stream=sys.stderr, format="%(levelname)s:%(name)s:%(message)s")
+
+    logger = logging.getLogger("matcha-dl")
+    logger.setLevel(logging.INFO)
+
+    return logger
+
+
+def run_ranking(args):
+    logger = service_logger()
+    service = load_service(args, logger)
+
+    if not args.candidates_file:
+        logger.info("Reading requests from stdin")
+        served = service.serve(sys.stdin, sys.stdout)
+        logger.info(f"Served {served} requests")
+        return
+
+    for cands_file in args.candidates_file:
+        output_file = args.ranking_file or str(Path(cands_file).with_suffix(".ranked.tsv"))
+        logger.info(f"Ranking written to {service.rank_file(cands_file, output_file)}")
+
+
+def run_server(args):
+    from matcha_dl.delivery.server import RankingServer
+
+    logger = service_logger()
+
+    RankingServer(
+        load_service(args, logger),
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_delay=args.max_delay_ms / 1000,
+        logger=logger,
+    ).run()
+
+
+def run_export(args):
+    from matcha_dl.impl.export import export_model
+    from matcha_dl.impl.inference import MODEL_FILE
+    from matcha_dl.impl.service import load_model
+
+    logger = service_logger()
+
+    model_file = args.model_file or str(Path(args.output_dir) / MODEL_FILE)
+    export_dir = args.export_dir or str(Path(model_file).parent)
+
+    exported = export_model(load_model(model_file), export_dir, formats=args.formats)
+    logger.info(f"Model exported to {', '.join(exported.values())}")
+
+
+def add_service_arguments(parser):
+    parser.add_argument(
+        "--output_dir",
+        "-o",
+        type=str,
+        required=False,
+        help="Please provide the output directory of a previous alignment, holding its matcha "
+        "scores and model",
+    )
+    parser.add_argument(
+        "--scores_file",
+        type=str,
+        required=False,
+        help="Please provide the path to the matcha scores file",
+    )
+    parser.add_argument(
+        "--model_file",
+        type=str,
+        required=False,
+        help="Please provide the path to the model file, if None candidates are ranked by their "
+        "best matcha score",
+    )
+    parser.add_argument(
+        "--device",
+        type=str,
+        default="cpu",
+        help="Device of the model",
+    )
+
+
+def check_service_arguments(parser, args):
+    if not (args.output_dir or args.scores_file):
+        parser.error("one of the arguments --output_dir --scores_file is required")
+
+
+def parse_rank_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="matchadl rank",
+        description="Rank candidate files, or tsv requests read from stdin, with a trained model",
+    )
+    add_service_arguments(parser)
+    parser.add_argument(
+        "--candidates_file",
+        "-c",
+        type=str,
+        nargs="+",
+        required=False,
+        help="Please provide the paths to the candidates files, if None requests are read from "
+        "stdin",
+    )
+    parser.add_argument(
+        "--ranking_file",
+        type=str,
+        required=False,
+        help="Please provide the path to the ranking file of a single candidates file",
+    )
+    args = parser.parse_args(argv)
+
+    check_service_arguments(parser, args)
+
+    if args.ranking_file and args.candidates_file and len(args.candidates_file) > 1:
+        parser.error("--ranking_file requires a single --candidates_file")
+
+    return args
+
+
+def parse_serve_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="matchadl serve",
+        description="Serve candidate rankings over local HTTP, batching concurrent requests",
+    )
+    add_service_arguments(parser)
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind")
+    parser.add_argument(
+        "--max_batch_size",
+        type=int,
+        default=64,
+        help="Maximum number of requests scored in one forward pass",
+    )
+    parser.add_argument(
+        "--max_delay_ms",
+        type=float,
+        default=2.0,
+        help="Milliseconds a batch waits for more requests",
+    )
+    args = parser.parse_args(argv)
+
+    check_service_arguments(parser, args)
+
+    return args
+
+
+def parse_export_arguments(argv):
+    from matcha_dl.impl.export import EXPORT_FORMATS
+
+    parser = argparse.ArgumentParser(
+        prog="matchadl export",
+        description="Export a trained model for inference without the trainer",
+    )
+    parser.add_argument(
+        "--output_dir",
+        "-o",
+        type=str,
+        required=False,
+        help="Please provide the output directory of a previous alignment, holding its model",
+    )
+    parser.add_argument(
+        "--model_file",
+        type=str,
+        required=False,
+        help="Please provide the path to the model file",
+    )
+    parser.add_argument(
+        "--export_dir",
+        type=str,
+        required=False,
+        help="Please provide the directory the model is exported to, defaults to the model "
+        "directory",
+    )
+    parser.add_argument(
+        "--formats",
+        type=str,
+        nargs="+",
+        choices=EXPORT_FORMATS,
+        default=["torchscript", "numpy"],
+        help="Export formats, onnx requires the onnx package",
+    )
+    args = parser.parse_args(argv)
+
+    if not (args.output_dir or args.model_file):
+        parser.error("one of the arguments --output_dir --model_file is required")
+
+    return args
+
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser(description="Compute the alignment between two ontologies")
     parser.add_argument(
         "--source_ontology_file",
         "-s",
         type=str,
-        required=True,
+        required=False,
         help="Please provide the path to the source ontology file",
     )
     parser.add_argument(
         "--target_ontology_file",
         "-t",
         type=str,
-        required=True,
+        required=False,
         help="Please provide the path to the target ontology file",
     )
     parser.add_argument(
         "--output_dir",
         "-o",
         type=str,
-        required=True,
+        required=False,
         help="Please provide the path to the output directory",
     )
     parser.add_argument(
@@ -59,11 +300,88 @@ def parse_arguments():
         required=False,
         help="Please provide the path to the yaml configuration file",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--manifest_file",
+        "-m",
+        type=str,
+        required=False,
+        help="Please provide the path to a yaml manifest of ontology pairs to align in batch",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        required=False,
+        help="Number of worker processes of the batch alignment or of the sweep",
+    )
+    parser.add_argument(
+        "--memory_budget",
+        type=str,
+        required=False,
+        help="Memory available to concurrent Matcha JVMs in batch alignment, e.g. 128G",
+    )
+    parser.add_argument(
+        "--report_file",
+        type=str,
+        required=False,
+        help="Please provide the path to the tsv report of the batch alignment or of the sweep",
+    )
+    parser.add_argument(
+        "--sweep_file",
+        type=str,
+        required=False,
+        help="Please provide the path to a yaml file of training hyperparameters to sweep",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Update the previous alignment of the output directory, rebuilding the dataset "
+        "rows of the changed sources and fine-tuning the model of the last checkpoint",
+    )
+    args = parser.parse_args(argv)
+
+    if args.manifest_file is None and not (
+        args.source_ontology_file and args.target_ontology_file and args.output_dir
+    ):
+        parser.error(
+            "the following arguments are required: --source_ontology_file, "
+            "--target_ontology_file, --output_dir (or --manifest_file)"
+        )
+
+    if args.sweep_file is not None and args.reference_file is None:
+        parser.error("--sweep_file requires --reference_file")
+
+    if args.incremental and (args.manifest_file or args.sweep_file):
+        parser.error("--incremental cannot be used with --manifest_file or --sweep_file")
+
+    return args
+
 
+COMMANDS = {
+    "rank": (parse_rank_arguments, run_ranking),
+    "serve": (parse_serve_arguments, run_server),
+    "export": (parse_export_arguments, run_export),
+}
 
-def main():
-    args = parse_arguments()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    # Subcommands, the alignment keeps its flags without a subcommand
+
+    if argv and argv[0] in COMMANDS:
+        parse, run = COMMANDS[argv[0]]
+        run(parse(argv[1:]))
+        return
+
+    args = parse_arguments(argv)
+
+    if args.manifest_file:
+        if not Path(args.manifest_file).exists():
+            raise Exception(f"Manifest file {args.manifest_file} does not exist")
+
+        run_batch_alignment(args)
+        return
 
     if not Path(args.source_ontology_file).exists():
         raise Exception(f"Source ontology file {args.source_ontology_file} does not exist")
@@ -81,6 +399,13 @@ def main():
         if not config_file.exists():
             raise Exception(f"Configuration file {args.config_file} does not exist")
 
+    if args.sweep_file:
+        if not Path(args.sweep_file).exists():
+            raise Exception(f"Sweep file {args.sweep_file} does not exist")
+
+        run_sweep(args)
+        return
+
     run_alignment(args)
 
 
@@ -0,0 +1,434 @@
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from matcha_dl.impl.service import RankingService
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+MAX_BODY_SIZE = 1 << 24
+
+
+class ServingMetrics:
+    """Latency and batch size metrics over a window of the last requests and batches."""
+
+    def __init__(self, window: Optional[int] = 10000) -> None:
+        """
+
+        Args:
+            window (int, optional): The number of requests and batches kept. Defaults to 10000.
+        """
+
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+
+        self._requests = 0
+        self._batches = 0
+
+    def add_request(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._requests += 1
+
+    def add_batch(self, size: int) -> None:
+        self._batch_sizes.append(size)
+        self._batches += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Gets the metrics.
+
+        Returns:
+            Dict[str, Any]: The request and batch counts, the p50/p99 latencies in ms and the
+                mean/p50/max batch sizes of the window.
+        """
+
+        latencies = np.asarray(self._latencies) * 1000
+        sizes = np.asarray(self._batch_sizes)
+
+        def percentile(values: np.ndarray, q: float) -> Optional[float]:
+            return float(np.percentile(values, q)) if len(values) else None
+
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "latency_p50_ms": percentile(latencies, 50),
+            "latency_p99_ms": percentile(latencies, 99),
+            "batch_size_mean": float(sizes.mean()) if len(sizes) else None,
+            "batch_size_p50": percentile(sizes, 50),
+            "batch_size_max": int(sizes.max()) if len(sizes) else None,
+        }
+
+
+class MicroBatcher:
+    """Coalesces concurrent ranking requests into micro-batches scored in one forward pass.
+
+    A batch waits max_delay seconds after its first request, unless max_batch_size requests
+    are already queued, and takes up to max_batch_size queued requests. Batches are scored one
+    at a time in a worker thread, so the event loop keeps accepting requests while a batch is
+    scored, and they queue up for the next batch.
+    """
+
+    def __init__(
+        self,
+        service: RankingService,
+        max_batch_size: Optional[int] = 64,
+        max_delay: Optional[float] = 0.002,
+        metrics: Optional[ServingMetrics] = None,
+    ) -> None:
+        """
+
+        Args:
+            service (RankingService): The ranking service.
+            max_batch_size (int, optional): The maximum number of requests per batch.
+                Defaults to 64.
+            max_delay (float, optional): The seconds a batch waits for more requests.
+                Defaults to 0.002.
+            metrics (ServingMetrics, optional): The metrics. Defaults to new metrics.
+        """
+
+        self._service = service
+        self._max_batch_size = max_batch_size
+        self._max_delay = max_delay
+        self._metrics = metrics or ServingMetrics()
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def metrics(self) -> ServingMetrics:
+        return self._metrics
+
+    def start(self) -> None:
+        """Starts batching on the running event loop, a stopped batcher can start again."""
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops batching, pending requests are cancelled."""
+
+        if self._task is not None:
+            self._task.cancel()
+
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+            self._task = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def rank(self, source: str, candidates: Sequence[str]) -> List[Tuple[str, float]]:
+        """Ranks the candidate targets of a source entity in the next batch.
+
+        Args:
+            source (str): The source entity.
+            candidates (Sequence[str]): The candidate target entities.
+
+        Returns:
+            List[Tuple[str, float]]: The candidates and their scores, by descending score.
+        """
+
+        start_time = time.perf_counter()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((source, candidates, future))
+
+        ranking = await future
+
+        self._metrics.add_request(time.perf_counter() - start_time)
+
+        return ranking
+
+    async def _run(self) -> None:
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+
+            if self._max_delay > 0 and self._queue.qsize() < self._max_batch_size - 1:
+                await asyncio.sleep(self._max_delay)
+
+            while len(batch) < self._max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Requests cancelled while waiting, such as closed connections, are not scored
+
+            batch = [request for request in batch if not request[2].done()]
+
+            if not batch:
+                continue
+
+            sources, candidates, futures = zip(*batch)
+
+            try:
+                rankings = await loop.run_in_executor(
+                    self._executor, self._service.rank_many, sources, candidates
+                )
+
+            except Exception:
+
+                # Requests are retried one by one, so a failing request only fails itself
+
+                for request in batch:
+                    await self._rank_one(loop, *request)
+                continue
+
+            self._metrics.add_batch(len(batch))
+
+            for future, ranking in zip(futures, rankings):
+                if not future.done():
+                    future.set_result(ranking)
+
+    async def _rank_one(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        source: str,
+        candidates: Sequence[str],
+        future: asyncio.Future,
+    ) -> None:
+
+        try:
+            ranking = await loop.run_in_executor(
+                self._executor, self._service.rank, source, candidates
+            )
+
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        self._metrics.add_batch(1)
+
+        if not future.done():
+            future.set_result(ranking)
+
+
+class RankingServer:
+    """A local HTTP/1.1 server ranking candidates with a ranking service.
+
+    Concurrent requests are coalesced into micro-batches. Endpoints:
+
+    - POST /rank: ranks `{"source": str, "candidates": [str]}`, or a list of them, and answers
+      `{"source": str, "ranking": [[str, float]]}`, or a list of them.
+    - GET /metrics: the serving metrics, see `ServingMetrics.snapshot`.
+    - GET /health: `{"status": "ok"}`.
+    """
+
+    def __init__(
+        self,
+        service: RankingService,
+        host: Optional[str] = "127.0.0.1",
+        port: Optional[int] = 8080,
+        max_batch_size: Optional[int] = 64,
+        max_delay: Optional[float] = 0.002,
+        **kwargs,
+    ) -> None:
+        """
+
+        Args:
+            service (RankingService): The ranking service.
+            host (str, optional): The host to bind. Defaults to "127.0.0.1".
+            port (int, optional): The port to bind, 0 picks a free port. Defaults to 8080.
+            max_batch_size (int, optional): The maximum number of requests per batch.
+                Defaults to 64.
+            max_delay (float, optional): The seconds a batch waits for more requests.
+                Defaults to 0.002.
+        """
+
+        self._service = service
+        self._host = host
+        self._port = port
+
+        self._batcher = MicroBatcher(service, max_batch_size=max_batch_size, max_delay=max_delay)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        # Load Kwargs
+
+        self._logger = kwargs.get("logger")
+
+    @property
+    def metrics(self) -> ServingMetrics:
+        return self._batcher.metrics
+
+    @property
+    def port(self) -> int:
+        """Gets the bound port, once started."""
+        if self._server is not None:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    async def start(self) -> None:
+        """Starts serving on the running event loop."""
+
+        self._batcher.start()
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+
+        self.log(f"Serving rankings on http://{self._host}:{self.port}")
+
+    async def stop(self) -> None:
+        """Stops serving."""
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        await self._batcher.stop()
+
+    async def serve_forever(self) -> None:
+
+        await self.start()
+
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def run(self) -> None:
+        """Serves until interrupted."""
+
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            self.log("Server stopped")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answers the requests of a connection, kept alive until the client closes it."""
+
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path, version = (request_line.split(" ") + ["", ""])[:3]
+
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                length = headers.get("content-length", "0")
+
+                if not length.isdigit() or int(length) > MAX_BODY_SIZE:
+                    await self._respond(writer, 400, {"error": "Invalid Content-Length"}, False)
+                    break
+
+                body = await reader.readexactly(int(length))
+
+                keep_alive = (
+                    version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                )
+
+                status, payload = await self._route(method, path, body)
+                await self._respond(writer, status, payload, keep_alive)
+
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+
+        path = path.split("?", 1)[0]
+
+        if path == "/health":
+            return 200, {"status": "ok"}
+
+        if path == "/metrics":
+            return 200, self.metrics.snapshot()
+
+        if path != "/rank":
+            return 404, {"error": f"{path} not found"}
+
+        if method != "POST":
+            return 405, {"error": "/rank expects POST"}
+
+        try:
+            payload = json.loads(body)
+            requests = payload if isinstance(payload, list) else [payload]
+            queries = [self._parse_query(query) for query in requests]
+
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": f"Malformed request: {e}"}
+
+        try:
+            rankings = await asyncio.gather(
+                *(self._batcher.rank(source, candidates) for source, candidates in queries)
+            )
+
+        except Exception as e:
+            self.log(f"Ranking failed: {type(e).__name__}: {e}", level="error")
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+        answers = [
+            {"source": source, "ranking": ranking}
+            for (source, _), ranking in zip(queries, rankings)
+        ]
+
+        return 200, answers if isinstance(payload, list) else answers[0]
+
+    @staticmethod
+    def _parse_query(query: Any) -> Tuple[str, List[str]]:
+        """Checks a `{"source": str, "candidates": [str]}` query."""
+
+        if not isinstance(query, dict):
+            raise TypeError("a query must be an object")
+
+        source, candidates = query["source"], query["candidates"]
+
+        if not isinstance(source, str):
+            raise TypeError("source must be a string")
+
+        if not isinstance(candidates, list) or not all(isinstance(c, str) for c in candidates):
+            raise TypeError("candidates must be a list of strings")
+
+        return source, candidates
+
+    @staticmethod
+    async def _respond(
+        writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool
+    ) -> None:
+
+        body = json.dumps(payload).encode()
+
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+    def log(self, msg: str, level: Optional[str] = "info"):
+        if self._logger is not None:
+            getattr(self._logger, level)(msg)
+
+        else:
+            print(msg)
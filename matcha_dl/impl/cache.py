@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional, Union
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "matcha_dl"
+KEY_SUFFIX = ".key"
+
+_CHUNK_SIZE = 1 << 20
+
+
+@lru_cache(maxsize=None)
+def _file_digest(file_path: str, size: int, mtime_ns: int) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_digest(file_path: Union[str, Path]) -> str:
+    """Hashes the content of a file, memoized on its path, size and modification time."""
+    stat = os.stat(file_path)
+    return _file_digest(str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns)
+
+
+def cache_key(*files: Optional[Union[str, Path]], **params: Any) -> str:
+    """Builds a content-addressed key from the content of input files and parameters.
+
+    Args:
+        *files (Optional[Union[str, Path]]): The input files. None marks a missing input.
+        **params (Any): JSON serializable parameters.
+
+    Returns:
+        str: The key.
+    """
+    h = hashlib.sha256()
+    for file_path in files:
+        h.update((file_digest(file_path) if file_path is not None else "-").encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def read_key(path: Union[str, Path]) -> Optional[str]:
+    """Reads the key a stage output was written with, if any."""
+    key_file = Path(str(path) + KEY_SUFFIX)
+    return key_file.read_text().strip() if key_file.is_file() else None
+
+
+def write_key(path: Union[str, Path], key: str) -> None:
+    """Records the key a stage output was written with next to it."""
+    Path(str(path) + KEY_SUFFIX).write_text(key)
+
+
+def _size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.glob("**/*") if f.is_file())
+
+
+def _copy(src: Path, dst: Path) -> None:
+    tmp = dst.with_name(dst.name + ".tmp")
+
+    if tmp.is_dir():
+        shutil.rmtree(tmp)
+    elif tmp.exists():
+        tmp.unlink()
+
+    if src.is_dir():
+        shutil.copytree(src, tmp)
+    else:
+        shutil.copyfile(src, tmp)
+
+    if dst.is_dir():
+        shutil.rmtree(dst)
+
+    os.replace(tmp, dst)
+
+
+class StageCache:
+    """Shared cache of pipeline stage outputs, addressed by the key of their inputs.
+
+    Entries are stored as `<cache_dir>/<stage>/<key>/<artifact>` and the least recently used
+    ones are evicted once the cache grows over `max_size` GB.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size: Optional[float] = 50, **kwargs):
+        """
+
+        Args:
+            cache_dir (str, optional): The cache directory. Defaults to ~/.cache/matcha_dl.
+            max_size (float, optional): The maximum size of the cache in GB. A size of 0
+                disables the cache. Defaults to 50.
+        """
+
+        self._cache_dir = Path(cache_dir).expanduser() if cache_dir else DEFAULT_CACHE_DIR
+        self._max_size = max_size
+
+        self._logger = kwargs.get("logger")
+
+    @property
+    def cache_dir(self) -> Path:
+        return self._cache_dir
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_size is None or self._max_size > 0
+
+    def entry(self, stage: str, key: str) -> Path:
+        return self._cache_dir / stage / key
+
+    def get(self, stage: str, key: str, name: str) -> Optional[Path]:
+        """Gets a cached artifact and marks it as recently used.
+
+        Args:
+            stage (str): The pipeline stage.
+            key (str): The key of the stage inputs.
+            name (str): The artifact name.
+
+        Returns:
+            Optional[Path]: The path to the cached artifact, None if it is not cached.
+        """
+
+        if not self.enabled:
+            return None
+
+        artifact = self.entry(stage, key) / name
+
+        if not artifact.exists():
+            return None
+
+        os.utime(self.entry(stage, key))
+
+        return artifact
+
+    def restore(self, stage: str, key: str, dst: Union[str, Path]) -> bool:
+        """Copies a cached artifact to `dst` and records its key.
+
+        Args:
+            stage (str): The pipeline stage.
+            key (str): The key of the stage inputs.
+            dst (Union[str, Path]): The destination, its name is the artifact name.
+
+        Returns:
+            bool: True if the artifact was cached, False otherwise.
+        """
+
+        dst = Path(dst)
+        artifact = self.get(stage, key, dst.name)
+
+        if artifact is None:
+            return False
+
+        self.log(f"Restoring {dst.name} from cache entry {artifact.parent}", level="debug")
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        _copy(artifact, dst)
+        write_key(dst, key)
+
+        return True
+
+    def put(self, stage: str, key: str, src: Union[str, Path]) -> Optional[Path]:
+        """Stores a copy of a stage output and evicts least recently used entries.
+
+        Args:
+            stage (str): The pipeline stage.
+            key (str): The key of the stage inputs.
+            src (Union[str, Path]): The stage output file or directory.
+
+        Returns:
+            Optional[Path]: The path to the cached artifact.
+        """
+
+        if not self.enabled:
+            return None
+
+        src = Path(src)
+        entry = self.entry(stage, key)
+        entry.mkdir(parents=True, exist_ok=True)
+
+        _copy(src, entry / src.name)
+        os.utime(entry)
+
+        self.evict()
+
+        return entry / src.name
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in its maximum size."""
+
+        if self._max_size is None or not self._cache_dir.is_dir():
+            return
+
+        entries = sorted(
+            (entry for entry in self._cache_dir.glob("*/*") if entry.is_dir()),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        sizes = [_size(entry) for entry in entries]
+
+        total = sum(sizes)
+        max_size = self._max_size * 1024**3
+
+        for entry, size in zip(entries, sizes):
+            if total <= max_size:
+                break
+
+            self.log(f"Evicting cache entry {entry}", level="debug")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def log(self, msg: str, level: Optional[str] = "info"):
+        if self._logger is not None:
+            getattr(self._logger, level)(msg)
+
+        else:
+            print(msg)
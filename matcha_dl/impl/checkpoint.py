@@ -0,0 +1,260 @@
+import json
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import torch as th
+
+CHECKPOINT_PATTERN = re.compile(r"^(\d+)\.pt$")
+METRICS_FILE = "metrics.json"
+
+
+def _to_cpu(state: Any) -> Any:
+    """Copies the tensors of a (nested) state dict to CPU, so training can keep updating them
+    while the copy is written."""
+
+    if isinstance(state, th.Tensor):
+        return state.detach().to("cpu", copy=True)
+    if isinstance(state, dict):
+        return {key: _to_cpu(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(_to_cpu(value) for value in state)
+    return state
+
+
+class CheckpointManager:
+    """Writes, lists, prunes and loads the training checkpoints of a directory.
+
+    Checkpoints are `<epoch>.pt` files holding only tensors and plain values, so they load
+    with `torch.load(weights_only=True)`. A checkpoint is written to a temporary file renamed
+    over its final name, so an interrupted write never leaves a truncated checkpoint. Files
+    are ordered by epoch number, and after every write only the keep_last latest and the
+    keep_best best checkpoints, by lowest metric, are kept. The metrics are recorded in a
+    `metrics.json` file next to the checkpoints, so the best ones are still kept when training
+    resumes in a new manager.
+
+    With async_writes, the state is copied to CPU in the training loop and written by a
+    background thread, so checkpointing does not stall training. Write errors are raised by
+    the next `save`, `wait` or `load`.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        keep_last: Optional[int] = 3,
+        keep_best: Optional[int] = 1,
+        async_writes: Optional[bool] = True,
+    ) -> None:
+        """
+
+        Args:
+            directory (Union[str, Path]): The checkpoints directory.
+            keep_last (int, optional): The number of latest checkpoints kept, None keeps them
+                all. Defaults to 3.
+            keep_best (int, optional): The number of best checkpoints kept on top of the
+                latest ones, checkpoints saved without a metric are never the best.
+                Defaults to 1.
+            async_writes (bool, optional): Write checkpoints in a background thread.
+                Defaults to True.
+        """
+
+        self._directory = Path(directory)
+        self._keep_last = keep_last
+        self._keep_best = keep_best
+        self._async_writes = async_writes
+
+        self._metrics: Dict[int, float] = self._read_metrics()
+        self._lock = threading.Lock()
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._pending: Optional[Future] = None
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def checkpoints(self) -> List[int]:
+        """Gets the epochs of the checkpoints on disk, in increasing order."""
+
+        if not self._directory.is_dir():
+            return []
+
+        epochs = []
+
+        for file in self._directory.iterdir():
+            match = CHECKPOINT_PATTERN.match(file.name)
+
+            if match is not None and file.is_file():
+                epochs.append(int(match.group(1)))
+
+        return sorted(epochs)
+
+    @property
+    def last(self) -> Optional[int]:
+        """Gets the epoch of the latest checkpoint, None without checkpoints."""
+        checkpoints = self.checkpoints
+        return checkpoints[-1] if checkpoints else None
+
+    def path(self, epoch: int) -> Path:
+        return self._directory / f"{epoch}.pt"
+
+    def save(self, epoch: int, state: Dict[str, Any], metric: Optional[float] = None) -> Path:
+        """Saves the checkpoint of an epoch.
+
+        Args:
+            epoch (int): The epoch.
+            state (Dict[str, Any]): The state, state dicts and plain values only.
+            metric (float, optional): The metric ranking the best checkpoints, lower is
+                better, such as the validation loss. Defaults to None.
+
+        Returns:
+            Path: The path the checkpoint is written to.
+        """
+
+        self.wait()
+
+        state = {**_to_cpu(state), "epoch": epoch}
+
+        with self._lock:
+            # An overwritten checkpoint does not keep the metric of the previous one
+
+            if metric is not None:
+                self._metrics[epoch] = float(metric)
+            else:
+                self._metrics.pop(epoch, None)
+
+        if self._async_writes:
+            self._pending = self._get_executor().submit(self._write, epoch, state)
+        else:
+            self._write(epoch, state)
+
+        return self.path(epoch)
+
+    def wait(self) -> None:
+        """Waits for the pending write, raising its error if it failed."""
+
+        pending, self._pending = self._pending, None
+
+        if pending is not None:
+            pending.result()
+
+    def load(
+        self, epoch: Optional[Union[int, str]] = "last", map_location: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """Loads a checkpoint.
+
+        Args:
+            epoch (Union[int, str], optional): The epoch, "last" or a checkpoint file name.
+                Defaults to "last".
+            map_location (Any, optional): The `torch.load` map location. Defaults to None.
+
+        Returns:
+            Dict[str, Any]: The state of the checkpoint.
+        """
+
+        self.wait()
+
+        if epoch == "last":
+            epoch = self.last
+
+            if epoch is None:
+                raise FileNotFoundError(f"No checkpoints found in {self._directory}")
+
+        file_path = self.path(epoch) if isinstance(epoch, int) else self._directory / epoch
+
+        return th.load(file_path, map_location=map_location, weights_only=True)
+
+    def close(self) -> None:
+        """Waits for the pending write and stops the background thread."""
+
+        try:
+            self.wait()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+
+        # Forked data-parallel processes do not inherit the thread of the executor
+
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._executor_pid = os.getpid()
+
+        return self._executor
+
+    def _write(self, epoch: int, state: Dict[str, Any]) -> None:
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{epoch}.", suffix=".tmp", dir=self._directory)
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                th.save(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, self.path(epoch))
+
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        self._prune()
+        self._write_metrics()
+
+    def _prune(self) -> None:
+
+        if self._keep_last is None:
+            return
+
+        checkpoints = self.checkpoints
+
+        with self._lock:
+            metrics = {
+                epoch: self._metrics[epoch] for epoch in checkpoints if epoch in self._metrics
+            }
+
+        keep = set(checkpoints[-self._keep_last :] if self._keep_last > 0 else [])
+        keep.update(sorted(metrics, key=metrics.get)[: self._keep_best or 0])
+
+        for epoch in checkpoints:
+            if epoch not in keep:
+                self.path(epoch).unlink(missing_ok=True)
+
+                with self._lock:
+                    self._metrics.pop(epoch, None)
+
+    def _read_metrics(self) -> Dict[int, float]:
+
+        try:
+            with open(self._directory / METRICS_FILE, "r") as f:
+                return {int(epoch): float(metric) for epoch, metric in json.load(f).items()}
+
+        except (OSError, ValueError):
+            return {}
+
+    def _write_metrics(self) -> None:
+
+        with self._lock:
+            metrics = dict(sorted(self._metrics.items()))
+
+        fd, tmp_path = tempfile.mkstemp(prefix=".metrics.", suffix=".tmp", dir=self._directory)
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(metrics, f)
+
+            os.replace(tmp_path, self._directory / METRICS_FILE)
+
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
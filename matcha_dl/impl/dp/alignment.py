@@ -0,0 +1,203 @@
+from ast import literal_eval
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+ALIGNMENT_STRATEGIES = ["best", "top_k", "one_to_one"]
+
+DELTA_CHANGES = {"left_only": "added", "right_only": "removed", "both": "reranked"}
+
+
+def _strict_ranks(scores: np.ndarray) -> np.ndarray:
+    """Ranks scores ascending with ties broken by position, so every rank is unique."""
+    ranks = np.empty(len(scores), dtype=np.int64)
+    ranks[np.argsort(-scores, kind="stable")[::-1]] = np.arange(len(scores))
+    return ranks
+
+
+def _best_per_run(groups: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Selects the first best scored row of every run of equal groups, in linear time."""
+    starts = np.flatnonzero(np.concatenate([[True], groups[1:] != groups[:-1]]))
+    lengths = np.diff(np.append(starts, len(groups)))
+
+    best = np.repeat(np.maximum.reduceat(scores, starts), lengths)
+    candidates = np.flatnonzero(scores == best)
+
+    runs = np.repeat(np.arange(len(starts)), lengths)[candidates]
+    first = np.concatenate([[True], runs[1:] != runs[:-1]])
+
+    return candidates[first]
+
+
+def top_k_per_group(groups: np.ndarray, scores: np.ndarray, k: Optional[int] = 1) -> np.ndarray:
+    """Selects the k best scored rows of every group.
+
+    Args:
+        groups (np.ndarray): The integer group id of every row.
+        scores (np.ndarray): The score of every row.
+        k (int, optional): The number of rows per group. Defaults to 1.
+
+    Returns:
+        np.ndarray: The selected row indices, ordered by group id and descending score.
+    """
+
+    # Rows already sorted by group, such as the CSR rows of the matcha scores, are slices
+
+    if k == 1 and len(groups) and (groups[1:] >= groups[:-1]).all():
+        return _best_per_run(groups, scores)
+
+    order = np.lexsort((-scores, groups))
+    sorted_groups = groups[order]
+
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = sorted_groups[1:] != sorted_groups[:-1]
+
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+    rank = np.arange(len(order)) - first
+
+    return order[rank < k]
+
+
+def greedy_one_to_one(sources: np.ndarray, targets: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Selects a one-to-one alignment, equivalent to accepting pairs by descending score when
+    neither of their entities was already aligned.
+
+    Every round accepts the mutual best pairs, those that are the best remaining pair of both
+    their source and their target, and drops the remaining pairs that share an entity with them.
+
+    Args:
+        sources (np.ndarray): The integer source id of every pair.
+        targets (np.ndarray): The integer target id of every pair.
+        scores (np.ndarray): The score of every pair.
+
+    Returns:
+        np.ndarray: The selected row indices, ordered by descending score.
+    """
+
+    ranks = _strict_ranks(scores)
+
+    best_source = np.full(sources.max(initial=-1) + 1, -1, dtype=np.int64)
+    best_target = np.full(targets.max(initial=-1) + 1, -1, dtype=np.int64)
+
+    alive = np.arange(len(scores))
+    selected = []
+
+    while len(alive):
+        src, tgt, rank = sources[alive], targets[alive], ranks[alive]
+
+        best_source[src] = -1
+        best_target[tgt] = -1
+        np.maximum.at(best_source, src, rank)
+        np.maximum.at(best_target, tgt, rank)
+
+        mutual = (rank == best_source[src]) & (rank == best_target[tgt])
+        selected.append(alive[mutual])
+
+        taken_sources = np.zeros(len(best_source), dtype=bool)
+        taken_targets = np.zeros(len(best_target), dtype=bool)
+        taken_sources[src[mutual]] = True
+        taken_targets[tgt[mutual]] = True
+
+        alive = alive[~(taken_sources[src] | taken_targets[tgt])]
+
+    selected = np.concatenate(selected) if selected else alive
+
+    return selected[np.argsort(-ranks[selected])]
+
+
+def extract_alignment(
+    sources: np.ndarray,
+    targets: np.ndarray,
+    scores: np.ndarray,
+    strategy: Optional[str] = "best",
+    top_k: Optional[int] = 1,
+) -> np.ndarray:
+    """Extracts a global alignment from scored pairs.
+
+    Args:
+        sources (np.ndarray): The integer source id of every pair.
+        targets (np.ndarray): The integer target id of every pair.
+        scores (np.ndarray): The score of every pair.
+        strategy (str, optional): "best" keeps the best target of every source, "top_k" the
+            top_k best targets of every source and "one_to_one" a greedy one-to-one alignment.
+            Defaults to "best".
+        top_k (int, optional): The number of targets per source of the "top_k" strategy.
+            Defaults to 1.
+
+    Returns:
+        np.ndarray: The selected row indices.
+    """
+
+    if strategy == "best":
+        return top_k_per_group(sources, scores, 1)
+
+    elif strategy == "top_k":
+        return top_k_per_group(sources, scores, top_k)
+
+    elif strategy == "one_to_one":
+        return greedy_one_to_one(sources, targets, scores)
+
+    raise ValueError(
+        f"Alignment strategy {strategy} not recognized, expected one of {ALIGNMENT_STRATEGIES}"
+    )
+
+
+def _best_candidate(candidates: pd.Series) -> pd.Series:
+    """Gets the best scored candidate of every row of a local alignment."""
+
+    def best(cands):
+        cands = literal_eval(cands) if isinstance(cands, str) else cands
+        return max(cands, key=lambda cand: cand[1])[0] if len(cands) else None
+
+    return candidates.map(best)
+
+
+def alignment_delta(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """Compares an alignment with a previous alignment of the same ontologies.
+
+    Global alignments, (SrcEntity, TgtEntity, Score) tables, are compared by mapping: the
+    mappings only in the current alignment are "added" and the mappings only in the previous
+    one "removed", rescored mappings are not part of the delta. Local alignments,
+    (SrcEntity, TgtEntity, TgtCandidates) tables, are compared by row: the rows whose best
+    candidate changed are "reranked".
+
+    Args:
+        previous (pd.DataFrame): The previous alignment.
+        current (pd.DataFrame): The current alignment.
+
+    Returns:
+        pd.DataFrame: The changed rows, with their previous Score or best candidate and the
+            Change column.
+    """
+
+    keys = ["SrcEntity", "TgtEntity"]
+
+    if "TgtCandidates" in current:
+        previous = previous.assign(BestCandidate=_best_candidate(previous["TgtCandidates"]))
+        current = current.assign(BestCandidate=_best_candidate(current["TgtCandidates"]))
+        value = "BestCandidate"
+
+    else:
+        value = "Score"
+
+    delta = current.merge(
+        previous[[*keys, value]].rename(columns={value: f"Previous{value}"}),
+        on=keys,
+        how="outer",
+        indicator=True,
+    )
+
+    if value == "Score":
+        changed = delta["_merge"] != "both"
+    else:
+        # Rows without candidates in both alignments have no best candidate, they are unchanged
+        best, previous_best = delta[value], delta[f"Previous{value}"]
+        reranked = (best != previous_best) & ~(best.isna() & previous_best.isna())
+        changed = (delta["_merge"] != "both") | reranked
+
+    delta = delta[changed]
+
+    return delta.assign(Change=delta.pop("_merge").astype(str).map(DELTA_CHANGES)).reset_index(
+        drop=True
+    )
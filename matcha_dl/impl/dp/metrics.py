@@ -0,0 +1,44 @@
+from typing import Dict
+
+import numpy as np
+
+# Validation metrics, mapped to whether higher values are better
+
+VALIDATION_METRICS = {"loss": False, "mrr": True, "hits@1": True}
+
+
+def ranking_metrics(groups: np.ndarray, labels: np.ndarray, scores: np.ndarray) -> Dict[str, float]:
+    """Ranks every positive row among the negative rows of its group.
+
+    Ties are broken against the positive row, so constant scores do not rank first.
+
+    Args:
+        groups (np.ndarray): The integer group id of every row, such as the source entity.
+        labels (np.ndarray): The label of every row, positive rows are labelled 1.
+        scores (np.ndarray): The score of every row.
+
+    Returns:
+        Dict[str, float]: The mean reciprocal rank "mrr" and the fraction of positive rows
+            ranked first "hits@1" of the positive rows, NaN without positive rows.
+    """
+
+    positive = np.asarray(labels) > 0.5
+
+    if not positive.any():
+        return {"mrr": float("nan"), "hits@1": float("nan")}
+
+    # Negatives sort before positives of the same score
+
+    order = np.lexsort((positive, -np.asarray(scores), np.asarray(groups)))
+    sorted_groups = np.asarray(groups)[order]
+    negative = ~positive[order]
+
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = sorted_groups[1:] != sorted_groups[:-1]
+
+    negatives = np.cumsum(negative)
+    before_group = np.maximum.accumulate(np.where(starts, negatives - negative, 0))
+
+    ranks = (negatives - before_group)[~negative] + 1
+
+    return {"mrr": float(np.mean(1 / ranks)), "hits@1": float(np.mean(ranks == 1))}
@@ -0,0 +1,74 @@
+import io
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, Union
+
+import pandas as pd
+
+READ_SIZE = 1 << 26
+
+
+def tail_csv(
+    csv_file: Union[str, Path],
+    running: Callable[[], bool],
+    poll_interval: float = 0.5,
+    read_size: int = READ_SIZE,
+    **kwargs: Any,
+) -> Iterator[pd.DataFrame]:
+    """Reads a CSV file in chunks of complete rows while another process is still writing it.
+
+    Only complete lines are parsed, the trailing partial line is kept until the rest of it is
+    written. The file is read to its end once the writer is done.
+
+    Args:
+        csv_file (Union[str, Path]): The CSV file.
+        running (Callable[[], bool]): Tells whether the writer is still running.
+        poll_interval (float, optional): Seconds to wait for new rows. Defaults to 0.5.
+        read_size (int, optional): The maximum number of bytes parsed per chunk.
+            Defaults to 64 MB.
+        **kwargs (Any): Keyword arguments of `pd.read_csv`.
+
+    Yields:
+        pd.DataFrame: The chunks of rows, in file order.
+    """
+
+    csv_file = Path(csv_file)
+
+    while not csv_file.exists():
+        if not running():
+            if csv_file.exists():
+                break
+            raise FileNotFoundError(f"{csv_file} was not written")
+        time.sleep(poll_interval)
+
+    header = None
+    buffer = b""
+
+    with open(csv_file, "rb") as f:
+        while True:
+            # Check before reading, so the last read after the writer is done sees every row
+            finished = not running()
+            data = f.read(read_size)
+
+            if not data and finished:
+                if header is not None and buffer.strip():
+                    yield pd.read_csv(io.BytesIO(header + buffer), **kwargs)
+                return
+
+            if not data:
+                time.sleep(poll_interval)
+                continue
+
+            buffer += data
+
+            if header is None:
+                end = buffer.find(b"\n") + 1
+                if not end:
+                    continue
+                header, buffer = buffer[:end], buffer[end:]
+
+            end = buffer.rfind(b"\n") + 1
+
+            if end:
+                rows, buffer = buffer[:end], buffer[end:]
+                yield pd.read_csv(io.BytesIO(header + rows), **kwargs)
@@ -0,0 +1,107 @@
+import importlib.util
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import torch as th
+from torch import nn
+
+from matcha_dl.core.values import MATCHERS
+from matcha_dl.impl.inference import (
+    FEATURE_SPEC_FILE,
+    NUMPY_MODEL_FILE,
+    ONNX_MODEL_FILE,
+    TORCHSCRIPT_MODEL_FILE,
+    NumpyMlp,
+    write_feature_spec,
+)
+from matcha_dl.impl.models import MlpClassifier
+
+EXPORT_FORMATS = ["torchscript", "onnx", "numpy"]
+
+
+def to_numpy_mlp(model: MlpClassifier) -> NumpyMlp:
+    """Copies the layers of a MlpClassifier into a NumpyMlp.
+
+    Args:
+        model (MlpClassifier): The model.
+
+    Returns:
+        NumpyMlp: The NumPy model.
+    """
+
+    if not isinstance(model, MlpClassifier):
+        raise ValueError(f"NumPy export supports MlpClassifier models, not {type(model).__name__}")
+
+    linears = [module for module in model.modules() if isinstance(module, nn.Linear)]
+
+    return NumpyMlp(
+        [linear.weight.detach().cpu().numpy() for linear in linears],
+        [linear.bias.detach().cpu().numpy() for linear in linears],
+    )
+
+
+def export_model(
+    model: nn.Module,
+    output_dir: Union[str, Path],
+    formats: Optional[Iterable[str]] = ("torchscript", "numpy"),
+) -> Dict[str, str]:
+    """Exports a model for inference without the trainer, with its input feature spec.
+
+    "torchscript" writes a scripted model loaded with `torch.jit.load`, "onnx" an ONNX model
+    with a dynamic "features" batch axis, which requires the onnx package, and "numpy" the
+    layers of a MlpClassifier for `NumpyMlp`, which only needs NumPy.
+
+    Args:
+        model (nn.Module): The model.
+        output_dir (Union[str, Path]): The directory the files are written to.
+        formats (Iterable[str], optional): The export formats.
+            Defaults to ("torchscript", "numpy").
+
+    Returns:
+        Dict[str, str]: The path of every written file, by format, "feature_spec" included.
+    """
+
+    formats = list(formats)
+
+    for export_format in formats:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Export format {export_format} not recognized, expected one of {EXPORT_FORMATS}"
+            )
+
+    if "onnx" in formats and importlib.util.find_spec("onnx") is None:
+        raise ImportError("ONNX export requires the onnx package, install it with pip install onnx")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    device = next(model.parameters()).device
+    training = model.training
+    model.eval()
+
+    files = {"feature_spec": write_feature_spec(output_dir / FEATURE_SPEC_FILE)}
+
+    try:
+        if "torchscript" in formats:
+            files["torchscript"] = str(output_dir / TORCHSCRIPT_MODEL_FILE)
+            th.jit.script(model).save(files["torchscript"])
+
+        if "onnx" in formats:
+            files["onnx"] = str(output_dir / ONNX_MODEL_FILE)
+            th.onnx.export(
+                model,
+                (th.zeros(1, len(MATCHERS), device=device),),
+                files["onnx"],
+                input_names=["features"],
+                output_names=["scores"],
+                dynamic_axes={"features": {0: "pairs"}, "scores": {0: "pairs"}},
+                dynamo=False,
+            )
+
+        if "numpy" in formats:
+            files["numpy"] = to_numpy_mlp(model).save(output_dir / NUMPY_MODEL_FILE)
+
+    finally:
+        model.train(training)
+
+    return files
@@ -0,0 +1,159 @@
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+from matcha_dl.core.values import MATCHERS
+
+# Exported models only need NumPy to be read, this module must not import torch
+
+MODEL_FILE = "model.pt"
+FEATURE_SPEC_FILE = "feature_spec.json"
+NUMPY_MODEL_FILE = "model.npz"
+TORCHSCRIPT_MODEL_FILE = "model.ts"
+ONNX_MODEL_FILE = "model.onnx"
+
+EXPORT_FILES = [FEATURE_SPEC_FILE, NUMPY_MODEL_FILE, TORCHSCRIPT_MODEL_FILE, ONNX_MODEL_FILE]
+
+
+def feature_spec() -> Dict[str, Any]:
+    """Gets the input feature spec of the models.
+
+    Returns:
+        Dict[str, Any]: The matcher columns of the features, in input order, their dtype, the
+            noise filling the features of pairs without matcha scores and the output.
+    """
+
+    return {
+        "features": list(MATCHERS),
+        "dtype": "float32",
+        "missing_features": {"distribution": "uniform", "low": 0.0, "high": 0.4},
+        "output": {"name": "scores", "activation": "sigmoid"},
+    }
+
+
+def write_feature_spec(file_path: Union[str, Path]) -> str:
+    """Writes the input feature spec as JSON.
+
+    Args:
+        file_path (Union[str, Path]): The path to the JSON file.
+
+    Returns:
+        str: The path to the JSON file.
+    """
+
+    with open(file_path, "w") as f:
+        json.dump(feature_spec(), f, indent=2)
+
+    return str(file_path)
+
+
+def check_feature_spec(file_path: Union[str, Path]) -> None:
+    """Checks that a model was exported for the matcher columns of the matcha scores.
+
+    Args:
+        file_path (Union[str, Path]): The path to the feature spec JSON file.
+
+    Raises:
+        ValueError: If the features of the spec are not the matcher columns, in order.
+    """
+
+    with open(file_path, "r") as f:
+        features = json.load(f)["features"]
+
+    if features != list(MATCHERS):
+        raise ValueError(
+            f"Model features {features} do not match the matcha scores features {MATCHERS}"
+        )
+
+
+class NumpyMlp:
+    """NumPy inference of an exported MlpClassifier, without torch.
+
+    Hidden layers are ReLU activated linear layers, the output layer is sigmoid activated.
+
+    Attributes:
+        weights (List[np.ndarray]): The (out, in) weights of every linear layer.
+        biases (List[np.ndarray]): The bias of every linear layer.
+    """
+
+    def __init__(self, weights: List[np.ndarray], biases: List[np.ndarray]) -> None:
+        """
+
+        Args:
+            weights (List[np.ndarray]): The (out, in) weights of every linear layer, in order.
+            biases (List[np.ndarray]): The bias of every linear layer, in order.
+        """
+
+        # Transposed once, so a layer is a single (rows, in) @ (in, out) product
+
+        self._weights = [np.ascontiguousarray(w.T, dtype=np.float32) for w in weights]
+        self._biases = [np.asarray(b, dtype=np.float32) for b in biases]
+
+    @property
+    def weights(self) -> List[np.ndarray]:
+        return [w.T for w in self._weights]
+
+    @property
+    def biases(self) -> List[np.ndarray]:
+        return self._biases
+
+    def __call__(self, x: np.ndarray) -> np.ndarray:
+        """Scores features.
+
+        Args:
+            x (np.ndarray): The (rows, features) features.
+
+        Returns:
+            np.ndarray: The (rows, classes) scores.
+        """
+
+        x = np.asarray(x, dtype=np.float32)
+
+        for w, b in zip(self._weights[:-1], self._biases[:-1]):
+            x = np.maximum(x @ w + b, 0.0)
+
+        logits = x @ self._weights[-1] + self._biases[-1]
+
+        return 1.0 / (1.0 + np.exp(-logits))
+
+    def save(self, file_path: Union[str, Path]) -> str:
+        """Writes the layers to a .npz file.
+
+        Args:
+            file_path (Union[str, Path]): The path to the .npz file.
+
+        Returns:
+            str: The path to the .npz file.
+        """
+
+        layers = {}
+
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            layers[f"weight_{i}"] = w
+            layers[f"bias_{i}"] = b
+
+        with open(file_path, "wb") as f:
+            np.savez(f, **layers)
+
+        return str(file_path)
+
+    @classmethod
+    def load(cls, file_path: Union[str, Path]) -> "NumpyMlp":
+        """Reads the layers written by `save`.
+
+        Args:
+            file_path (Union[str, Path]): The path to the .npz file.
+
+        Returns:
+            NumpyMlp: The model.
+        """
+
+        with np.load(file_path) as layers:
+            n_layers = len(layers.files) // 2
+
+            return cls(
+                [layers[f"weight_{i}"] for i in range(n_layers)],
+                [layers[f"bias_{i}"] for i in range(n_layers)],
+            )
@@ -0,0 +1,42 @@
+import logging
+from typing import List, Optional
+
+_JVM_MAX_HEAP: Optional[str] = None
+
+
+def start_jvm(
+    max_heap: str = "8G",
+    classpath: Optional[List[str]] = None,
+    logger: Optional[logging.Logger] = None,
+) -> None:
+    """Starts the JVM used by in-process Java components, once per process.
+
+    The JVM can only be started once, so later calls are no-ops and the heap of the first call
+    is kept. Components running Matcha as a subprocess don't need it.
+
+    Args:
+        max_heap (str, optional): The maximum heap size of the JVM. Defaults to "8G".
+        classpath (List[str], optional): The JVM class path. Defaults to the deeponto jars.
+        logger (logging.Logger, optional): The logger. Defaults to None.
+    """
+
+    global _JVM_MAX_HEAP
+
+    import jpype
+
+    if jpype.isJVMStarted():
+        if logger is not None and _JVM_MAX_HEAP not in (None, max_heap):
+            logger.warning(
+                f"JVM already started with a {_JVM_MAX_HEAP} maximum heap, ignoring {max_heap}"
+            )
+        return
+
+    if classpath is None:
+        from deeponto import init_jvm
+
+        init_jvm(max_heap)
+
+    else:
+        jpype.startJVM(f"-Xmx{max_heap}", classpath=classpath, convertStrings=False)
+
+    _JVM_MAX_HEAP = max_heap
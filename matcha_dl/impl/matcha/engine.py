@@ -0,0 +1,251 @@
+import atexit
+import logging
+import multiprocessing as mp
+import os
+import sys
+import threading
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+_ENGINES: Dict[Tuple[str, str], "MatchaEngine"] = {}
+
+
+def main_class(jar_path: Union[str, Path]) -> str:
+    """Reads the Main-Class entry of a jar manifest."""
+    with zipfile.ZipFile(jar_path) as jar:
+        manifest = jar.read("META-INF/MANIFEST.MF").decode()
+
+    for line in manifest.splitlines():
+        if line.startswith("Main-Class:"):
+            return line.split(":", 1)[1].strip()
+
+    raise ValueError(f"No Main-Class found in the manifest of {jar_path}")
+
+
+@contextmanager
+def _redirect_output(log_file: str):
+    """Redirects the process stdout and stderr, Java output included, to a log file."""
+
+    import jpype
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    saved = os.dup(1), os.dup(2)
+
+    with open(log_file, "w") as f:
+        os.dup2(f.fileno(), 1)
+        os.dup2(f.fileno(), 2)
+
+        try:
+            yield
+
+        finally:
+            system = jpype.JClass("java.lang.System")
+            system.out.flush()
+            system.err.flush()
+
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+
+
+def _serve(conn, matcha_path: str, jar_path: str, max_heap: str) -> None:
+    """Worker loop: starts the JVM once and runs the Matcha main class for every task."""
+
+    import jpype
+
+    from matcha_dl.impl.jvm import start_jvm
+
+    os.chdir(matcha_path)
+
+    start_jvm(max_heap, classpath=[jar_path])
+    main = jpype.JClass(main_class(jar_path))
+
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+
+        if task is None:
+            break
+
+        args, log_file = task
+
+        try:
+            with _redirect_output(log_file):
+                main.main(jpype.JArray(jpype.JString)(args))
+
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+        else:
+            conn.send(("ok", None))
+
+
+class MatchaEngine:
+    """Long-lived Matcha worker process.
+
+    The worker starts a JVM with the Matcha jar once and runs the Matcha main class in it for
+    every task, so consecutive alignments skip the JVM startup and reuse the warmed-up JIT.
+    A Matcha main class calling `System.exit` ends the worker with its task, which sets
+    `exits_jvm`, as the JVM would then be started again for every task.
+    """
+
+    def __init__(
+        self,
+        matcha_path: Union[str, Path],
+        jar_path: Union[str, Path],
+        max_heap: Optional[str] = "8G",
+        **kwargs,
+    ) -> None:
+        """
+
+        Args:
+            matcha_path (Union[str, Path]): The matcha directory, the worker working directory.
+            jar_path (Union[str, Path]): The path to the matcha.jar file.
+            max_heap (str, optional): The maximum heap size of the worker JVM. Defaults to "8G".
+        """
+
+        self.matcha_path = str(matcha_path)
+        self.jar_path = str(jar_path)
+        self.max_heap = max_heap
+
+        self.logger = kwargs.get("logger")
+
+        self.exits_jvm = False
+
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self) -> None:
+        """Starts the worker process and waits for its JVM to be ready."""
+
+        if self.alive:
+            return
+
+        self.log(f"Starting Matcha engine with a {self.max_heap} maximum heap", level="debug")
+
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+
+        process = ctx.Process(
+            target=_serve,
+            args=(child_conn, self.matcha_path, self.jar_path, self.max_heap),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+
+        self._process = process
+
+        try:
+            self._conn.recv()
+        except EOFError:
+            self.close()
+            raise RuntimeError("Matcha engine failed to start")
+
+    def run(self, args: List[str], log_file: Union[str, Path]) -> None:
+        """Runs Matcha with the given command line arguments.
+
+        Args:
+            args (List[str]): The Matcha command line arguments.
+            log_file (Union[str, Path]): The file the Matcha output is written to.
+        """
+
+        with self._lock:
+            self.start()
+            self._conn.send(([str(arg) for arg in args], str(log_file)))
+
+            try:
+                status, error = self._conn.recv()
+
+            except EOFError:
+                self._process.join()
+                exitcode = self._process.exitcode
+                self.close()
+
+                if exitcode != 0:
+                    raise RuntimeError(f"Matcha engine exited with error code {exitcode}")
+
+                if not self.exits_jvm:
+                    self.log(
+                        "Matcha exited the JVM of the engine, so it does not persist across "
+                        "tasks, the next tasks run in a subprocess",
+                        level="warning",
+                    )
+
+                self.exits_jvm = True
+
+                return
+
+        if status == "error":
+            raise RuntimeError(f"Matcha engine returned with error: {error}")
+
+    def close(self) -> None:
+        """Stops the worker process."""
+
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self._conn.close()
+
+        if self._process is not None:
+            self._process.join(timeout=10)
+            if self._process.is_alive():
+                self._process.kill()
+
+        self._process = None
+        self._conn = None
+
+    def log(self, msg: str, level: Optional[str] = "info") -> None:
+        if self.logger:
+            getattr(self.logger, level)(msg)
+
+        else:
+            print(msg)
+
+
+def get_engine(
+    matcha_path: Union[str, Path],
+    jar_path: Union[str, Path],
+    max_heap: Optional[str] = "8G",
+    logger: Optional[logging.Logger] = None,
+) -> MatchaEngine:
+    """Gets the shared Matcha engine of a jar and heap size, created on first use.
+
+    Args:
+        matcha_path (Union[str, Path]): The matcha directory.
+        jar_path (Union[str, Path]): The path to the matcha.jar file.
+        max_heap (str, optional): The maximum heap size of the worker JVM. Defaults to "8G".
+        logger (logging.Logger, optional): The logger. Defaults to None.
+
+    Returns:
+        MatchaEngine: The engine.
+    """
+
+    key = (str(jar_path), max_heap)
+
+    if key not in _ENGINES:
+        _ENGINES[key] = MatchaEngine(matcha_path, jar_path, max_heap, logger=logger)
+
+    return _ENGINES[key]
+
+
+@atexit.register
+def _close_engines() -> None:
+    for engine in _ENGINES.values():
+        engine.close()
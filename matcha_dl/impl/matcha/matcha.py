@@ -1,5 +1,6 @@
 from pathlib import Path
 
+from matcha_dl import ensure_macha
 from matcha_dl.core.contracts.matcha import IMatcha
 
 
@@ -24,3 +25,9 @@ class Matcha(IMatcha):
             Path: The path to the matcha.jar file.
         """
         return (self.matcha_path / "matcha.jar").resolve()
+
+    def ensure_jar(self) -> None:
+        """
+        Download the matcha.jar file and its dependencies on first use.
+        """
+        ensure_macha()
@@ -1,19 +1,285 @@
-from matcha_dl.core.contracts.negative_sampler import INegativeSampler, List
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from matcha_dl.core.contracts.negative_sampler import INegativeSampler, List, Tuple
+from matcha_dl.core.entities.scores import MatchaScores
+
+# Maximum number of random keys drawn at once when sampling densely
+DENSE_CHUNK_SIZE = 1 << 24
 
 
 class RandomNegativeSampler(INegativeSampler):
 
-    def sample(self, sources: List, targets: List) -> List[List[str]]:
+    def sample(self, sources: List, targets: List, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+
+        sources = np.asarray(sources)
+        targets = np.asarray(targets)
+        candidates = pd.Index(pd.unique(targets))
+
+        positives = candidates.get_indexer(targets)
+
+        idx = self._sample_indices(positives, len(candidates), self.random)
+
+        return np.repeat(sources, idx.shape[1]), candidates.to_numpy()[idx.ravel()]
+
+    def _sample_indices(
+        self, positives: np.ndarray, n_candidates: int, random: np.random.Generator
+    ) -> np.ndarray:
+        """Draws `n_samples` distinct candidate indices per positive, excluding the positive.
+
+        Indices are drawn from [0, n_candidates - 1) and shifted past the positive index, so the
+        positive is never drawn. Duplicates within a row are redrawn until none remain.
+
+        Args:
+            positives (np.ndarray): The candidate index of every positive target.
+            n_candidates (int): The number of candidates.
+            random (np.random.Generator): The random generator.
+
+        Returns:
+            np.ndarray: The (positives, samples) candidate indices.
+        """
+
+        n_others = n_candidates - 1
+
+        if len(positives) == 0:
+            return np.zeros((0, min(self.n_samples, max(n_others, 0))), dtype=np.int64)
+
+        if n_others <= self.n_samples:
+
+            # Not enough candidates, every other candidate is a negative
+
+            idx = np.broadcast_to(np.arange(n_others), (len(positives), n_others)).copy()
+
+        elif 4 * self.n_samples >= n_others:
+
+            # Dense sampling, partial sort of random keys is cheaper than rejection
+
+            chunk = max(DENSE_CHUNK_SIZE // n_others, 1)
+
+            idx = np.concatenate(
+                [
+                    np.argpartition(
+                        random.random((len(positives[i : i + chunk]), n_others)),
+                        self.n_samples,
+                        axis=1,
+                    )[:, : self.n_samples]
+                    for i in range(0, len(positives), chunk)
+                ]
+            )
+
+        else:
+
+            idx = random.integers(0, n_others, size=(len(positives), self.n_samples))
+            idx.sort(axis=1)
+
+            dup = np.zeros(idx.shape, dtype=bool)
+            dup[:, 1:] = idx[:, 1:] == idx[:, :-1]
+
+            while dup.any():
+                rows = dup.any(axis=1)
+
+                redrawn = idx[rows]
+                redrawn[dup[rows]] = random.integers(0, n_others, size=dup.sum())
+                redrawn.sort(axis=1)
+
+                idx[rows] = redrawn
+
+                dup[:] = False
+                dup[:, 1:] = idx[:, 1:] == idx[:, :-1]
+
+        return idx + (idx >= positives[:, None])
+
+
+class HardNegativeSampler(RandomNegativeSampler):
+    """Samples negatives among the top-k matcha candidates of every source.
+
+    The reference targets of a source are never its hard negatives, and the hard negatives of
+    a source with several positives are distinct across its positives. Positives with fewer
+    than `n_samples` hard negatives are completed with random reference targets that are
+    neither a reference target nor a hard negative of the source, so every positive keeps
+    `n_samples` distinct negatives when there are enough reference targets.
+    """
+
+    def __init__(self, n_samples: int, seed: Optional[int] = 42, top_k: int = 20, **kwargs):
+        """
+
+        Args:
+            n_samples (int): The number of negatives per positive.
+            seed (int, optional): The seed for the random state. Defaults to 42.
+            top_k (int, optional): The number of best matcha candidates to sample from.
+                Defaults to 20.
+        """
+        super().__init__(n_samples, seed)
+
+        self._top_k = top_k
+
+    @property
+    def top_k(self) -> int:
+        return self._top_k
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return {**super().params, "top_k": self._top_k}
+
+    @property
+    def requires_scores(self) -> bool:
+        return True
+
+    def sample(
+        self, sources: List, targets: List, scores: Optional[MatchaScores] = None, **kwargs
+    ) -> Tuple[np.ndarray, np.ndarray]:
+
+        if scores is None:
+            raise ValueError("HardNegativeSampler requires the matcha scores index")
+
+        random = self.random
+
+        sources = np.asarray(sources)
+        targets = np.asarray(targets)
+
+        # Hard negatives, the top-k candidates without any reference target of the source
+
+        cands = scores.top_candidates(sources, self.top_k)
+
+        n_keys = int(max(cands.max(initial=0), targets.max(initial=0))) + 1
+        positive_keys = sources.astype(np.int64) * n_keys + targets
+        cands[np.isin(sources[:, None].astype(np.int64) * n_keys + cands, positive_keys)] = -1
+
+        keys = random.random(cands.shape)
+        keys[cands < 0] = np.inf
+
+        order = np.argsort(keys, axis=1)[:, : self.n_samples]
+        picked = np.take_along_axis(cands, order, axis=1)
+        hard = picked >= 0
+
+        # The positives of a source draw from the same candidates, a pair already drawn for
+        # another positive is completed with a random negative instead
+
+        picked_keys = sources[:, None].astype(np.int64) * n_keys + picked
+        drawn = pd.Series(picked_keys[hard]).duplicated().to_numpy()
+        hard[hard] = ~drawn
+
+        hard_sources = np.repeat(sources, picked.shape[1])[hard.ravel()]
+        hard_targets = picked[hard].astype(targets.dtype)
+
+        # Random negatives for the positives without enough hard negatives, among the reference
+        # targets that are neither a reference target nor a hard negative of the source
+
+        missing = self.n_samples - hard.sum(axis=1)
+        rows = (missing > 0).nonzero()[0]
+
+        candidates = pd.Index(pd.unique(targets))
+        codes, uniques = pd.factorize(sources)
+        codes = codes.astype(np.int64)
+
+        hard_codes = np.repeat(codes, picked.shape[1])[hard.ravel()]
+        hard_idx = candidates.get_indexer(hard_targets)
+
+        taken = np.unique(
+            np.concatenate(
+                [
+                    codes * len(candidates) + candidates.get_indexer(targets),
+                    hard_codes[hard_idx >= 0] * len(candidates) + hard_idx[hard_idx >= 0],
+                ]
+            )
+        )
+        available = len(candidates) - np.bincount(taken // len(candidates), minlength=len(uniques))
+
+        # The positives of a source share its available candidates, in order
+
+        counts = missing[rows]
+        starts = pd.Series(counts).groupby(codes[rows]).cumsum().to_numpy() - counts
+        counts = np.clip(available[codes[rows]] - starts, 0, counts)
+
+        idx = self._fill_indices(codes[rows], starts, counts, taken, len(candidates), random)
+        fill = idx >= 0
+
+        random_sources = np.repeat(sources[rows], idx.shape[1])[fill.ravel()]
+        random_targets = candidates.to_numpy()[idx[fill]]
+
+        return (
+            np.concatenate([hard_sources, random_sources]),
+            np.concatenate([hard_targets, random_targets]),
+        )
+
+    def _fill_indices(
+        self,
+        codes: np.ndarray,
+        starts: np.ndarray,
+        counts: np.ndarray,
+        taken: np.ndarray,
+        n_candidates: int,
+        random: np.random.Generator,
+    ) -> np.ndarray:
+        """Draws candidate indices per row, distinct across the rows of a source and excluding the
+        candidates taken by the source.
+
+        Args:
+            codes (np.ndarray): The source code of every row.
+            starts (np.ndarray): The number of indices drawn for the previous rows of the source.
+            counts (np.ndarray): The number of indices to draw for every row, so the rows of a
+                source draw at most the number of candidates it has not taken.
+            taken (np.ndarray): The sorted `code * n_candidates + index` keys of the taken
+                candidates.
+            n_candidates (int): The number of candidates.
+            random (np.random.Generator): The random generator.
+
+        Returns:
+            np.ndarray: The (rows, n_samples) candidate indices, padded with -1.
+        """
+
+        slots = np.arange(self.n_samples) < counts[:, None]
+        idx = np.full(slots.shape, -1, dtype=np.int64)
+
+        if not slots.any():
+            return idx
+
+        if 4 * self.n_samples >= n_candidates:
+
+            # Dense sampling, a random order of the candidates of every source with the taken
+            # ones last, split between the rows of the source
+
+            uniques, inverse = np.unique(codes, return_inverse=True)
+
+            chunk = max(DENSE_CHUNK_SIZE // n_candidates, 1)
+            width = int(np.where(counts > 0, starts + counts, 0).max())
+
+            order = np.concatenate(
+                [
+                    np.argsort(
+                        np.where(
+                            np.isin(
+                                uniques[i : i + chunk, None] * n_candidates
+                                + np.arange(n_candidates),
+                                taken,
+                            ),
+                            np.inf,
+                            random.random((len(uniques[i : i + chunk]), n_candidates)),
+                        ),
+                        axis=1,
+                    )[:, :width]
+                    for i in range(0, len(uniques), chunk)
+                ]
+            )
+
+            pos = np.minimum(starts[:, None] + np.arange(self.n_samples), width - 1)
+
+            return np.where(slots, order[inverse[:, None], pos], -1)
+
+        # Rejection sampling, taken and already drawn candidates are redrawn until none remain
+
+        redraw = slots
+
+        while redraw.any():
+            idx[redraw] = random.integers(0, n_candidates, size=redraw.sum())
+
+            keys = codes[:, None] * n_candidates + idx
 
-        cands = {
-            src: [cand for cand in targets if cand != trg] for src, trg in zip(sources, targets)
-        }
+            drawn = np.zeros(slots.shape, dtype=bool)
+            drawn[slots] = pd.Series(keys[slots]).duplicated().to_numpy()
 
-        if len(targets) < self.n_samples + 1:
-            return [[source, candidate, 0.0] for source in sources for candidate in cands[source]]
+            redraw = slots & (drawn | np.isin(keys, taken))
 
-        return [
-            [source, candidate, 0.0]
-            for source in sources
-            for candidate in self.random.choice(cands[source], self.n_samples, replace=False)
-        ]
+        return idx
@@ -1,42 +1,55 @@
-from ast import literal_eval
-from typing import Dict, List, Union
+from typing import Callable, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 from matcha_dl.core.contracts.processor import IProcessor
 from matcha_dl.core.entities.dataset import MlpDataset
+from matcha_dl.core.entities.scores import CSV_KWARGS, MatchaScores, MatchaScoresBuilder
+from matcha_dl.core.values import MATCHERS
+from matcha_dl.impl.dp.tail import tail_csv
+
+
+def _pair_keys(sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Encodes (source, target) id pairs as int64 keys, independently of the vocabulary size."""
+    return (np.asarray(sources, dtype=np.int64) << 32) | np.asarray(targets, dtype=np.int64)
 
 
 class MainProcessor(IProcessor):
 
-    def _process(self) -> pd.DataFrame:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Training set joined while the scores file was written, see `_load_matcha_scores`
+        self._streamed_training = None
+
+    def _process(self, sources: Optional[np.ndarray] = None) -> MlpDataset:
         """Processes the data.
 
+        Args:
+            sources (np.ndarray, optional): The source ids the rows are built for. Negatives
+                are still sampled over all the references, so the rows of a source do not
+                depend on which other sources are rebuilt. Defaults to None, all the sources.
+
         Returns:
-            pd.DataFrame: The processed data.
+            MlpDataset: The processed data.
         """
 
-        if self.refs is not None:
-
-            # get training set
-            self.log("Creating Training Set...", level="debug")
+        streamed, self._streamed_training = self._streamed_training, None
 
-            # get positive samples from refs
-            positive_set = self.refs
+        if self.refs is not None:
 
-            # get negative samples from sampler
-            self.log("#Sampling Negative Samples...", level="debug")
-            negative_set = pd.DataFrame(
-                self.sampler.sample(positive_set.SrcEntity, positive_set.TgtEntity),
-                columns=["SrcEntity", "TgtEntity", "Score"],
-            )
+            if streamed is not None and sources is None:
+                # features joined while the scores file was written, only the noise is left
+                training_set, training_features, found = streamed
+                training_features = self._fill_missing(training_features, found)
 
-            # combine positive and negative samples
-            training_set = pd.concat([positive_set, negative_set], ignore_index=True)
+            else:
+                training_set = self._get_training_set(sources)
 
-            # get scores features from matcha
-            self.log("#Getting Scores...", level="debug")
-            training_set = self._get_scores(training_set)
+                # get scores features from matcha
+                self.log("#Getting Scores...", level="debug")
+                training_features = self._get_scores(training_set)
 
             # assign training label
             training_set["train"] = True
@@ -44,7 +57,9 @@ class MainProcessor(IProcessor):
 
             self.log("#Shuffling Training Set...", level="debug")
 
-            training_set = training_set.sample(frac=1).reset_index(drop=True)
+            order = self.random.permutation(len(training_set))
+            training_set = training_set.iloc[order].reset_index(drop=True)
+            training_features = training_features[order]
 
             # Inference set
 
@@ -55,8 +70,8 @@ class MainProcessor(IProcessor):
                 level="debug",
             )
 
-            inference_sources = set(self.matcha_scores.keys()) - set(
-                self.refs["SrcEntity"].unique()
+            inference_sources = np.setdiff1d(
+                self.matcha_scores.sources, self.refs["SrcEntity"].to_numpy()
             )
 
         else:
@@ -66,7 +81,10 @@ class MainProcessor(IProcessor):
 
             # if no refs, get all sources from matcha
 
-            inference_sources = set(self.matcha_scores.keys())
+            inference_sources = self.matcha_scores.sources
+
+        if sources is not None:
+            inference_sources = np.intersect1d(inference_sources, sources)
 
         if self.candidates is not None:
 
@@ -80,16 +98,8 @@ class MainProcessor(IProcessor):
 
             # inference_sources = self.candidates.SrcEntity
 
-        self.log("#Getting candidates from sources", level="debug")
-        inference_set = pd.DataFrame(
-            self._get_cands(inference_sources), columns=["SrcEntity", "TgtEntity", "Score"]
-        )
-
-        # get scores features from matcha
-
-        self.log("#Getting Scores...", level="debug")
-
-        inference_set = self._get_scores(inference_set)
+        self.log("#Getting candidates and scores from sources", level="debug")
+        inference_set, inference_features = self._get_cands(inference_sources, only=sources)
 
         # assign inference label
 
@@ -103,90 +113,209 @@ class MainProcessor(IProcessor):
             self.log("#Combining Training and Inference Sets...", level="debug")
 
             dataset = pd.concat([training_set, inference_set], ignore_index=True)
+            features = np.concatenate([training_features, inference_features])
 
         else:
             dataset = inference_set
+            features = inference_features
 
         dataset.rename(columns={"Score": "Labels"}, inplace=True)
 
         self.log("#Processing Done", level="debug")
 
-        return MlpDataset(dataset, ref=self.refs, candidates=self.candidates)
+        return MlpDataset(
+            dataset, features=features, ref=self.refs, candidates=self.candidates, vocab=self.vocab
+        )
+
+    def _get_training_set(self, sources: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Gets the positive and negative training pairs.
+
+        Args:
+            sources (np.ndarray, optional): The source ids the pairs are kept for, see
+                `_process`. Defaults to None, all the sources.
+
+        Returns:
+            pd.DataFrame: The (SrcEntity, TgtEntity, Score) pairs, positives first.
+        """
+
+        # get training set
+        self.log("Creating Training Set...", level="debug")
+
+        # get positive samples from refs
+        positive_set = self.refs
+
+        # get negative samples from sampler
+        self.log("#Sampling Negative Samples...", level="debug")
+        with self.profiler.stage("sampling") as stage:
+            negative_sources, negative_targets = self.sampler.sample(
+                positive_set.SrcEntity, positive_set.TgtEntity, scores=self.matcha_scores
+            )
+            stage["rows"] = len(negative_sources)
+
+        negative_set = pd.DataFrame(
+            {"SrcEntity": negative_sources, "TgtEntity": negative_targets, "Score": 0.0}
+        )
+
+        # a reference pair is never a negative, even when sampled for another positive
+        positive_keys = pd.MultiIndex.from_frame(positive_set[["SrcEntity", "TgtEntity"]])
+        negative_set = negative_set[
+            ~pd.MultiIndex.from_frame(negative_set[["SrcEntity", "TgtEntity"]]).isin(
+                positive_keys
+            )
+        ]
+
+        if sources is not None:
+            positive_set = positive_set[np.isin(positive_set["SrcEntity"], sources)]
+            negative_set = negative_set[np.isin(negative_set["SrcEntity"], sources)]
+
+        # combine positive and negative samples
+        return pd.concat([positive_set, negative_set], ignore_index=True)
+
+    def _load_matcha_scores(
+        self, csv_file: str, running: Optional[Callable[[], bool]] = None
+    ) -> MatchaScores:
+        """Reads matcha scores file and parses it into an index, interning the entities into
+        the processor vocabulary.
 
-    def _matcha_scores_to_dict(self, csv_file: str) -> Dict:
-        """Reads matcha scores file and parses it into a dict.
+        While Matcha is still writing the file, it is tailed chunk by chunk. Unless the sampler
+        draws negatives from the scores, the training pairs are then built before the scores
+        are complete and every chunk is joined against them as it arrives, so building the
+        training set overlaps with Matcha. A pair keeps its last scores in the file, as in
+        the index.
 
         Args:
             csv_file (str): The CSV file.
+            running (Callable[[], bool], optional): Tells whether Matcha is still writing the
+                CSV file. Defaults to None.
 
         Returns:
-            Dict: The dictionary of matcha scores.
+            MatchaScores: The matcha scores index.
         """
 
-        df = pd.read_csv(csv_file)
+        if running is None:
+            return MatchaScores.from_csv(csv_file, vocab=self.vocab)
+
+        builder = MatchaScoresBuilder(vocab=self.vocab)
+
+        training_set = None
+
+        if self.refs is not None and not self.sampler.requires_scores:
+            training_set = self._get_training_set()
+
+            keys, inverse = np.unique(
+                _pair_keys(training_set["SrcEntity"], training_set["TgtEntity"]),
+                return_inverse=True,
+            )
+
+            features = np.zeros((len(keys), len(MATCHERS)), dtype=np.float32)
+            found = np.zeros(len(keys), dtype=bool)
+
+        for chunk in tail_csv(csv_file, running, **CSV_KWARGS):
+            chunk_sources, chunk_targets, chunk_features = builder.add(chunk)
+
+            if training_set is None or not len(keys):
+                continue
+
+            with self.profiler.stage("feature_join", rows=len(chunk)):
+                chunk_keys = _pair_keys(chunk_sources, chunk_targets)
+
+                # the last row of a pair in the chunk overrides the earlier ones
+                _, last = np.unique(chunk_keys[::-1], return_index=True)
+                rows = len(chunk_keys) - 1 - last
+
+                pos = np.minimum(np.searchsorted(keys, chunk_keys[rows]), len(keys) - 1)
+                hit = keys[pos] == chunk_keys[rows]
 
-        return {
-            src_ent: {
-                row["Entity 2"]: row[["LM", "WM", "SM", "BKM", "LLMM"]].values.tolist()
-                for _, row in df[df["Entity 1"] == src_ent].iterrows()
-            }
-            for src_ent in df["Entity 1"].unique()
-        }
+                features[pos[hit]] = chunk_features[rows[hit]]
+                found[pos[hit]] = True
 
-    def _get_scores(self, dataset: pd.DataFrame) -> pd.DataFrame:
-        """Adds matcha scores to the dataset.
+        if training_set is not None:
+            self._streamed_training = training_set, features[inverse], found[inverse]
+
+        return builder.build()
+
+    def _get_scores(self, dataset: pd.DataFrame) -> np.ndarray:
+        """Joins the (SrcEntity, TgtEntity) pairs of the dataset against the matcha scores.
+
+        Pairs without matcha scores are filled with uniform(0, 0.4) noise.
 
         Args:
             dataset (pd.DataFrame): The dataset.
 
         Returns:
-            pd.DataFrame: The dataset with scores.
+            np.ndarray: The (rows, matchers) float32 features of the dataset.
         """
 
-        feats = []
-        flag = 0
+        with self.profiler.stage("feature_join", rows=len(dataset)):
+            feats, found = self.matcha_scores.lookup(dataset["SrcEntity"], dataset["TgtEntity"])
 
-        for _, row in dataset.iterrows():
-            scores = self.matcha_scores.get(row["SrcEntity"], {}).get(row["TgtEntity"], [])
+        return self._fill_missing(feats, found)
 
-            if scores:
-                feats.append(scores)
-                flag += 1
-            else:
-                feats.append(self.random.uniform(low=0.0, high=0.4, size=(5,)).tolist())
+    def _fill_missing(self, feats: np.ndarray, found: np.ndarray) -> np.ndarray:
+        """Fills the features of the pairs without matcha scores with uniform(0, 0.4) noise.
 
-        dataset["Features"] = feats
+        Args:
+            feats (np.ndarray): The (rows, matchers) features.
+            found (np.ndarray): The boolean mask of the pairs with matcha scores.
+
+        Returns:
+            np.ndarray: The filled features.
+        """
 
-        return dataset
+        missing = ~found
 
-    def _get_cands(self, sources: List[str]) -> List[List[Union[str, int]]]:
+        feats[missing] = self.random.uniform(
+            low=0.0, high=0.4, size=(missing.sum(), feats.shape[1])
+        )
+
+        return feats
+
+    def _get_cands(
+        self, sources: np.ndarray, only: Optional[np.ndarray] = None
+    ) -> Tuple[pd.DataFrame, np.ndarray]:
         """Gets candidates from matcha for global matching, or candidates from file for ranking (local matching).
 
         Args:
-            sources (List[str]): The sources.
+            sources (np.ndarray): The source ids.
+            only (np.ndarray, optional): Restricts the candidates from file to these source
+                ids. Defaults to None.
 
         Returns:
-            List[List[Union[str, int]]]: The candidates.
+            Tuple[pd.DataFrame, np.ndarray]: The (SrcEntity, TgtEntity, Score) candidates and
+                their (rows, matchers) float32 features.
         """
 
         if self.candidates is not None:
 
             # Local Matching Candidates
-            # Retrieved from candidates input file
+            # Retrieved from candidates input file, their scores are joined
+
+            srcs, cands = self.candidates.pairs()
 
-            return [
-                [source, cand, 0]
-                for source, _, target_cands in self.candidates.values
-                for cand in literal_eval(target_cands)
-            ]
+            if only is not None:
+                keep = np.isin(srcs, only)
+                srcs, cands = srcs[keep], cands[keep]
+
+            cands = pd.DataFrame({"SrcEntity": srcs, "TgtEntity": cands, "Score": 0})
+
+            return cands, self._get_scores(cands)
 
         else:
 
             # Global Matching Candidates
-            # Retrieved from matcha
-
-            return [
-                [source, cand, 0]
-                for source in sources
-                for cand in self.matcha_scores.get(source).keys()
-            ]
+            # Retrieved from matcha, the candidates of a source are a row of the CSR scores, so
+            # their scores are sliced rather than joined
+
+            with self.profiler.stage("feature_join") as stage:
+                rows = self.matcha_scores.rows(sources)
+                stage["rows"] = len(rows)
+
+                cands = pd.DataFrame(
+                    {
+                        "SrcEntity": self.matcha_scores.source_ids[rows],
+                        "TgtEntity": self.matcha_scores.target_ids[rows],
+                        "Score": 0,
+                    }
+                )
+
+                return cands, self.matcha_scores.features[rows]
@@ -0,0 +1,207 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RUN_REPORT_FILE = "run_report.json"
+
+
+def peak_rss_mb(children: bool = False) -> Optional[float]:
+    """Gets the peak resident set size of the process, or of its largest child process, in MB.
+
+    Args:
+        children (bool, optional): Whether to get the peak of the child processes, such as a
+            Matcha JVM. Defaults to False.
+
+    Returns:
+        Optional[float]: The peak RSS in MB, None where it is not available.
+    """
+
+    if resource is None:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    rss = rss.ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return rss / 1024**2 if sys.platform == "darwin" else rss / 1024
+
+
+class Profiler:
+    """Collects the wall time, CPU time, peak RSS increase and row count of pipeline stages.
+
+    Stages are recorded with the `stage` context manager. They may nest, the self times of a
+    stage exclude the stages nested in it. Stages recorded more than once are aggregated.
+    CPU time is the CPU time of the whole process, all threads included.
+
+    The peak RSS is a high-water mark over the life of the process, so a stage records how much
+    it raised it, the largest over its calls. A stage using less memory than an earlier one
+    records 0, the peak RSS of the run is in the report totals.
+    """
+
+    def __init__(self, enabled: Optional[bool] = True) -> None:
+        """
+
+        Args:
+            enabled (bool, optional): Whether to record stages. Defaults to True.
+        """
+
+        self.enabled = enabled
+
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self._wall_time = time.perf_counter()
+        self._cpu_time = time.process_time()
+
+    @property
+    def stages(self) -> Dict[str, Dict[str, Any]]:
+        return self._stages
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Records a stage.
+
+        Args:
+            name (str): The stage name.
+            rows (int, optional): The number of rows the stage handles. It can also be set on
+                the yielded record. Defaults to None.
+
+        Yields:
+            Dict[str, Any]: The stage record, counters set on it are added to the report.
+        """
+
+        record = {"rows": rows}
+
+        if not self.enabled:
+            yield record
+            return
+
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append([0.0, 0.0])
+
+        wall_time = time.perf_counter()
+        cpu_time = time.process_time()
+        rss = peak_rss_mb(), peak_rss_mb(children=True)
+
+        try:
+            yield record
+
+        finally:
+            wall_time = time.perf_counter() - wall_time
+            cpu_time = time.process_time() - cpu_time
+
+            nested_wall_time, nested_cpu_time = stack.pop()
+
+            if stack:
+                stack[-1][0] += wall_time
+                stack[-1][1] += cpu_time
+
+            self._add(
+                name,
+                record,
+                rss,
+                wall_time=wall_time,
+                cpu_time=cpu_time,
+                self_wall_time=wall_time - nested_wall_time,
+                self_cpu_time=cpu_time - nested_cpu_time,
+            )
+
+    def _add(
+        self,
+        name: str,
+        record: Dict[str, Any],
+        rss: Tuple[Optional[float], Optional[float]],
+        **times: float,
+    ) -> None:
+
+        rss_start, children_rss_start = rss
+
+        increases = {
+            "peak_rss_increase_mb": None if rss_start is None else peak_rss_mb() - rss_start,
+            "peak_children_rss_increase_mb": (
+                None
+                if children_rss_start is None
+                else peak_rss_mb(children=True) - children_rss_start
+            ),
+        }
+
+        with self._lock:
+            stage = self._stages.setdefault(
+                name, {"calls": 0, **{key: 0.0 for key in times}, "rows": None}
+            )
+
+            stage["calls"] += 1
+
+            for key, value in times.items():
+                stage[key] += value
+
+            for key, value in record.items():
+                if value is not None:
+                    stage[key] = (stage.get(key) or 0) + value
+
+            for key, value in increases.items():
+                if value is not None:
+                    stage[key] = max(stage.get(key) or 0.0, value)
+
+    def report(self, **info: Any) -> Dict[str, Any]:
+        """Gets the run report.
+
+        Args:
+            **info (Any): Information about the run added to the report.
+
+        Returns:
+            Dict[str, Any]: The run totals and the stages, in the order they first ran.
+        """
+
+        return {
+            **info,
+            "wall_time": time.perf_counter() - self._wall_time,
+            "cpu_time": time.process_time() - self._cpu_time,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_children_rss_mb": peak_rss_mb(children=True),
+            "stages": self._stages,
+        }
+
+    def save(self, file_path: Union[str, Path], **info: Any) -> str:
+        """Writes the run report as JSON.
+
+        Args:
+            file_path (Union[str, Path]): The path to the JSON file.
+            **info (Any): Information about the run added to the report.
+
+        Returns:
+            str: The path to the JSON file.
+        """
+
+        tmp_path = Path(str(file_path) + ".tmp")
+
+        with open(tmp_path, "w") as f:
+            json.dump(self.report(**info), f, indent=2, default=str)
+
+        os.replace(tmp_path, file_path)
+
+        return str(file_path)
+
+    def add_to_writer(self, writer: Any, step: Optional[int] = 0) -> None:
+        """Adds the stage metrics to a TensorBoard SummaryWriter.
+
+        Args:
+            writer (SummaryWriter): The writer.
+            step (int, optional): The global step of the scalars. Defaults to 0.
+        """
+
+        for name, stage in self._stages.items():
+            for key, value in stage.items():
+                if isinstance(value, (int, float)):
+                    writer.add_scalar(f"Profile/{name}/{key}", value, step)
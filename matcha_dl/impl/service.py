@@ -0,0 +1,390 @@
+from ast import literal_eval
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Sequence, TextIO, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.entities.vocab import EntityVocab
+from matcha_dl.core.values import MATCHA_SCORES_FILE
+from matcha_dl.impl.dp.utils import read_table
+from matcha_dl.impl.inference import (
+    FEATURE_SPEC_FILE,
+    MODEL_FILE,
+    NUMPY_MODEL_FILE,
+    NumpyMlp,
+    check_feature_spec,
+)
+from matcha_dl.impl.profiler import Profiler
+
+DataFrame = pd.DataFrame
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """The splitmix64 finalizer, spreads uint64 keys over the 64 bits."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def pair_noise(
+    sources: Sequence[str], targets: Sequence[str], n_features: int, seed: Optional[int] = 42
+) -> np.ndarray:
+    """Draws uniform(0, 0.4) noise features from a hash of every (source, target) pair, so a
+    pair gets the same features whatever the requests it is scored in.
+
+    Args:
+        sources (Sequence[str]): The source entity of every pair.
+        targets (Sequence[str]): The target entity of every pair.
+        n_features (int): The number of features.
+        seed (int, optional): The seed. Defaults to 42.
+
+    Returns:
+        np.ndarray: The (pairs, n_features) float32 noise.
+    """
+
+    keys = _mix(pd.util.hash_array(np.asarray(sources, dtype=object)) ^ np.uint64(seed))
+    keys = _mix(keys ^ pd.util.hash_array(np.asarray(targets, dtype=object)))
+
+    bits = _mix(keys[:, None] + _GOLDEN * np.arange(1, n_features + 1, dtype=np.uint64))
+
+    return ((bits >> np.uint64(11)) * 2.0**-53 * 0.4).astype(np.float32)
+
+
+def load_model(file_path: Union[str, Path], device: Optional[str] = "cpu") -> Any:
+    """Loads a model for inference, by file suffix.
+
+    ".npz" files are NumPy models, loaded without torch, ".ts" files TorchScript models and
+    any other file a model saved by `ITrainer.save_model`. The feature spec written next to an
+    exported model is checked against the matcha scores features.
+
+    Args:
+        file_path (Union[str, Path]): The path to the model file.
+        device (str, optional): The device of torch models. Defaults to "cpu".
+
+    Returns:
+        Any: The model, a NumpyMlp or a torch module in evaluation mode.
+    """
+
+    file_path = Path(file_path)
+    spec_file = file_path.parent / FEATURE_SPEC_FILE
+
+    if spec_file.exists():
+        check_feature_spec(spec_file)
+
+    if file_path.suffix == ".npz":
+        return NumpyMlp.load(file_path)
+
+    import torch as th
+
+    if file_path.suffix == ".ts":
+        return th.jit.load(str(file_path), map_location=device).eval()
+
+    from matcha_dl.impl import models
+
+    saved = th.load(file_path, map_location=device, weights_only=True)
+
+    model = getattr(models, saved["model"])(**saved["model_params"])
+    model.load_state_dict(saved["model_state_dict"])
+
+    return model.to(device).eval()
+
+
+class RankingService:
+    """Ranks the candidate targets of source entities with a trained model.
+
+    The model and the matcha scores index are loaded once and kept between requests, so a
+    request only costs a feature lookup and a forward pass. The features of pairs without
+    matcha scores are filled with uniform(0, 0.4) noise, as in processing, drawn from a hash
+    of the pair so rankings do not depend on how requests are batched. Without a model,
+    candidates are scored by their best matcha score, as in unsupervised alignment.
+
+    Entities are looked up in the index vocabulary and never interned, so serving unknown
+    entities does not grow it. Torch is only imported to score with torch models, a NumpyMlp
+    model scores with NumPy alone.
+    """
+
+    def __init__(
+        self,
+        matcha_scores: MatchaScores,
+        model: Optional[Any] = None,
+        device: Optional[str] = "cpu",
+        seed: Optional[int] = 42,
+        **kwargs,
+    ) -> None:
+        """
+
+        Args:
+            matcha_scores (MatchaScores): The matcha scores index.
+            model (Any, optional): The trained model, a torch module or a NumpyMlp.
+                Defaults to None.
+            device (str, optional): The device of the model. Defaults to "cpu".
+            seed (int, optional): The seed of the noise features of pairs without matcha
+                scores. Defaults to 42.
+        """
+
+        self._matcha_scores = matcha_scores
+        self._model = model
+        self._device = device
+        self._seed = seed
+
+        if model is not None and not isinstance(model, NumpyMlp):
+            self._model = model.to(device).eval()
+
+        # Load Kwargs
+
+        self._logger = kwargs.get("logger")
+        self._profiler: Profiler = kwargs.get("profiler") or Profiler(enabled=False)
+
+    @property
+    def matcha_scores(self) -> MatchaScores:
+        return self._matcha_scores
+
+    @property
+    def vocab(self) -> EntityVocab:
+        return self._matcha_scores.vocab
+
+    @property
+    def model(self) -> Optional[Any]:
+        return self._model
+
+    @property
+    def profiler(self) -> Profiler:
+        return self._profiler
+
+    def features(self, sources: Sequence[str], targets: Sequence[str]) -> np.ndarray:
+        """Gets the matcha features of (source, target) pairs.
+
+        Args:
+            sources (Sequence[str]): The source entity of every pair.
+            targets (Sequence[str]): The target entity of every pair.
+
+        Returns:
+            np.ndarray: The (pairs, matchers) float32 features.
+        """
+
+        with self.profiler.stage("feature_join", rows=len(sources)):
+            feats, found = self.matcha_scores.lookup(
+                self.vocab.ids(sources), self.vocab.ids(targets)
+            )
+
+            missing = ~found
+
+            feats[missing] = pair_noise(
+                np.asarray(sources, dtype=object)[missing],
+                np.asarray(targets, dtype=object)[missing],
+                feats.shape[1],
+                seed=self._seed,
+            )
+
+        return feats
+
+    def score(self, sources: Sequence[str], targets: Sequence[str]) -> np.ndarray:
+        """Scores (source, target) pairs.
+
+        Args:
+            sources (Sequence[str]): The source entity of every pair.
+            targets (Sequence[str]): The target entity of every pair.
+
+        Returns:
+            np.ndarray: The score of every pair.
+        """
+
+        feats = self.features(sources, targets)
+
+        with self.profiler.stage("prediction", rows=len(feats)):
+            if self.model is None:
+                return feats.max(axis=1)
+
+            if isinstance(self.model, NumpyMlp):
+                return self.model(feats)[:, 0]
+
+            import torch as th
+
+            with th.no_grad():
+                logits = self.model(th.as_tensor(feats, dtype=th.float32, device=self._device))
+
+            return logits.squeeze(1).cpu().numpy()
+
+    def rank(self, source: str, candidates: Sequence[str]) -> List[Tuple[str, float]]:
+        """Ranks the candidate targets of a source entity.
+
+        Args:
+            source (str): The source entity.
+            candidates (Sequence[str]): The candidate target entities.
+
+        Returns:
+            List[Tuple[str, float]]: The candidates and their scores, by descending score.
+        """
+
+        return self.rank_many([source], [candidates])[0]
+
+    def rank_many(
+        self, sources: Sequence[str], candidates: Sequence[Sequence[str]]
+    ) -> List[List[Tuple[str, float]]]:
+        """Ranks the candidate targets of many source entities in a single forward pass.
+
+        Args:
+            sources (Sequence[str]): The source entities.
+            candidates (Sequence[Sequence[str]]): The candidate target entities of every source.
+
+        Returns:
+            List[List[Tuple[str, float]]]: The candidates and their scores of every source, by
+                descending score.
+        """
+
+        indptr = np.zeros(len(candidates) + 1, dtype=np.int64)
+        np.cumsum([len(cands) for cands in candidates], out=indptr[1:])
+
+        targets = [cand for cands in candidates for cand in cands]
+        scores = self.score(np.repeat(np.asarray(sources, dtype=object), np.diff(indptr)), targets)
+
+        rankings = []
+
+        for start, end in zip(indptr[:-1], indptr[1:]):
+            order = start + np.argsort(-scores[start:end], kind="stable")
+            rankings.append([(targets[i], float(scores[i])) for i in order])
+
+        return rankings
+
+    def rank_frame(self, df: DataFrame) -> DataFrame:
+        """Ranks the rows of a candidates dataframe.
+
+        Args:
+            df (DataFrame): The (SrcEntity, TgtEntity, TgtCandidates) candidates, TgtEntity
+                being optional and TgtCandidates lists or their string representation.
+
+        Returns:
+            DataFrame: The rows with TgtCandidates replaced by the ranked (candidate, score)
+                lists.
+        """
+
+        candidates = [
+            literal_eval(cands) if isinstance(cands, str) else list(cands)
+            for cands in df["TgtCandidates"]
+        ]
+
+        return df.assign(TgtCandidates=self.rank_many(df["SrcEntity"].tolist(), candidates))
+
+    def rank_file(self, cands_file: str, output_file: str) -> str:
+        """Ranks a candidates file, written with the columns of the local alignment.
+
+        Unlike the local alignment, the candidates of every row are sorted by descending score
+        and keep their score, none is scored 0.0 for being below a threshold.
+
+        Args:
+            cands_file (str): The candidates file.
+            output_file (str): The tsv file the rankings are written to.
+
+        Returns:
+            str: The path to the tsv file.
+        """
+
+        ranked = self.rank_frame(read_table(cands_file))
+        ranked.assign(TgtCandidates=ranked["TgtCandidates"].map(str)).to_csv(
+            output_file, sep="\t", index=False
+        )
+
+        return str(output_file)
+
+    def serve(self, requests: Iterable[str], responses: TextIO) -> int:
+        """Ranks a stream of tsv requests, one response line per request line.
+
+        A request is a `SrcEntity[<tab>TgtEntity]<tab>TgtCandidates` line, the candidates
+        being a list literal. The response is the request with the ranked (candidate, score)
+        list. Header lines are skipped, responses are flushed as they are written.
+
+        Args:
+            requests (Iterable[str]): The request lines, such as stdin.
+            responses (TextIO): The response stream, such as stdout.
+
+        Returns:
+            int: The number of requests served.
+        """
+
+        served = 0
+
+        for line in requests:
+            fields = line.rstrip("\r\n").split("\t")
+
+            if not fields[0] or fields[0] == "SrcEntity":
+                continue
+
+            try:
+                ranking = self.rank(fields[0], literal_eval(fields[-1]))
+                responses.write("\t".join([*fields[:-1], str(ranking)]) + "\n")
+
+            except (ValueError, SyntaxError) as e:
+                self.log(f"Skipping malformed request {line.strip()!r}: {e}", level="warning")
+                responses.write("\t".join([*fields[:-1], "[]"]) + "\n")
+
+            responses.flush()
+            served += 1
+
+        return served
+
+    @classmethod
+    def load(
+        cls,
+        scores_file: str,
+        model_file: Optional[str] = None,
+        device: Optional[str] = "cpu",
+        **kwargs: Any,
+    ) -> "RankingService":
+        """Loads a service from a matcha scores file and a model file.
+
+        Args:
+            scores_file (str): The matcha scores file.
+            model_file (str, optional): The model file, see `load_model`. If None, candidates
+                are ranked by their best matcha score. Defaults to None.
+            device (str, optional): The device of the model. Defaults to "cpu".
+            **kwargs (Any): Keyword arguments of the service.
+
+        Returns:
+            RankingService: The service.
+        """
+
+        matcha_scores = MatchaScores.from_csv(scores_file)
+        model = load_model(model_file, device=device) if model_file is not None else None
+
+        return cls(matcha_scores, model=model, device=device, **kwargs)
+
+    @classmethod
+    def from_output_dir(cls, output_dir: str, **kwargs: Any) -> "RankingService":
+        """Loads a service from the output directory of an alignment.
+
+        The NumPy export of the model is preferred to the torch model, so the service starts
+        without importing torch, unless the torch model was saved after it.
+
+        Args:
+            output_dir (str): The output directory, holding the matcha scores and, if the
+                alignment was supervised, the model.
+            **kwargs (Any): Keyword arguments of `load`.
+
+        Returns:
+            RankingService: The service.
+        """
+
+        numpy_file, torch_file = Path(output_dir) / NUMPY_MODEL_FILE, Path(output_dir) / MODEL_FILE
+
+        model_file = None
+
+        if torch_file.exists():
+            model_file = str(torch_file)
+
+        if numpy_file.exists() and (
+            not torch_file.exists() or numpy_file.stat().st_mtime >= torch_file.stat().st_mtime
+        ):
+            model_file = str(numpy_file)
+
+        return cls.load(str(Path(output_dir) / MATCHA_SCORES_FILE), model_file=model_file, **kwargs)
+
+    def log(self, msg: str, level: Optional[str] = "info"):
+        if self._logger is not None:
+            getattr(self._logger, level)(msg)
+
+        else:
+            print(msg)
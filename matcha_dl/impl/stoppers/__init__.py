@@ -0,0 +1 @@
+from .earlystoping import EarlyStopping
@@ -1,13 +1,66 @@
+import copy
+import io
+import math
+import os
+import socket
 import warnings
-from typing import List, Optional
+from typing import Any, Dict, Iterator, Optional, Tuple
 
-import numpy as np
 import torch as th
-from torch.utils.data import DataLoader, TensorDataset
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, DistributedSampler, TensorDataset
 from torch.utils.tensorboard import SummaryWriter
 from tqdm import tqdm
 
-from matcha_dl.core.contracts.trainer import EntityMapping, ITrainer
+from matcha_dl.core.contracts.trainer import ITrainer, Predictions
+from matcha_dl.impl.dp.metrics import ranking_metrics
+
+TRAINING_MODES = ["minibatch", "batched", "lbfgs"]
+LR_SCALING_RULES = ["linear", "sqrt"]
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _train_worker(
+    rank: int, trainer: "MLPTrainer", world_size: int, port: int, queue: Any, args: Tuple
+) -> None:
+    """Trains a DistributedDataParallel replica of the model in a forked training process."""
+
+    th.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+
+    dist.init_process_group(
+        "gloo", init_method=f"tcp://127.0.0.1:{port}", rank=rank, world_size=world_size
+    )
+
+    try:
+        trainer._rank = rank
+        trainer._world_size = world_size
+        trainer._model = DistributedDataParallel(trainer._model)
+
+        trainer._train(*args)
+
+        # The main process resumes from the state of the first rank, every replica is equal
+
+        if trainer.is_main:
+            buffer = io.BytesIO()
+            th.save(
+                {
+                    "epoch": trainer.epoch,
+                    "model_state_dict": trainer.model.state_dict(),
+                    "optimizer_state_dict": trainer.optimizer.state_dict(),
+                    "stopper_state": vars(trainer.earlystoping) if trainer.earlystoping else None,
+                },
+                buffer,
+            )
+            queue.put(buffer.getvalue())
+
+    finally:
+        dist.destroy_process_group()
 
 
 class MLPTrainer(ITrainer):
@@ -17,84 +70,443 @@ class MLPTrainer(ITrainer):
         epochs: Optional[int] = 50,
         batch_size: Optional[int] = None,
         save_interval: Optional[int] = 5,
+        mode: Optional[str] = "minibatch",
+        lr_scaling: Optional[str] = None,
+        base_batch_size: Optional[int] = 1,
+        workers: Optional[int] = 1,
+        validation_split: Optional[float] = 0.0,
+        **kwargs,
     ):
+        """Trains the model.
+
+        Args:
+            epochs (int, optional): The number of epochs. Defaults to 50.
+            batch_size (int, optional): The batch size, None is a full batch in the "batched"
+                mode. Defaults to None.
+            save_interval (int, optional): The number of epochs between checkpoints, the last
+                epoch is always saved. Defaults to 5.
+            mode (str, optional): "minibatch" iterates a DataLoader, "batched" iterates shuffled
+                index slices over the in-memory tensors and "lbfgs" runs full-batch L-BFGS.
+                Defaults to "minibatch".
+            lr_scaling (str, optional): Scales the learning rate by batch_size / base_batch_size,
+                "linear" or "sqrt". Defaults to None.
+            base_batch_size (int, optional): The batch size the learning rate was tuned for.
+                Defaults to 1.
+            workers (int, optional): The number of CPU training processes. More than one
+                trains a DistributedDataParallel replica of the model in every process with the
+                gloo backend, every process handling a shard of every batch, so batch_size
+                stays the global batch size. Defaults to 1.
+            validation_split (float, optional): The fraction of the reference sources held out
+                to compute a validation loss after every epoch, required by early stopping.
+                When early stopping is set, the model of the best validation epoch is restored
+                once training ends and saved as the last checkpoint. Defaults to 0.0.
+        """
+
+        if mode not in TRAINING_MODES:
+            raise ValueError(
+                f"Training mode {mode} not recognized, expected one of {TRAINING_MODES}"
+            )
 
         warnings.filterwarnings("ignore", category=UserWarning)
 
-        writer = SummaryWriter(self.logs_dir)
+        if self.earlystoping is not None and not validation_split:
+            raise ValueError("Early stopping requires a validation split")
+
+        if validation_split:
+            self.dataset.split_validation(validation_split, seed=self.seed)
+
+        # Data-parallel shards are padded by the DistributedSampler, only an empty training
+        # set leaves an epoch without batches
+
+        if not self.dataset.dataframe["train"].any():
+            raise ValueError(
+                "The training set is empty, check the reference file and the validation split"
+            )
+
+        if mode == "batched":
+            batch_size = batch_size or int(self.dataset.dataframe["train"].sum())
+
+        if mode == "lbfgs" and not isinstance(self._optimizer, th.optim.LBFGS):
+            self._optimizer = th.optim.LBFGS(
+                self._model.parameters(), line_search_fn="strong_wolfe"
+            )
+        elif lr_scaling is not None:
+            self._scale_lr(batch_size or 1, base_batch_size, lr_scaling)
+
+        if workers > 1 and self.device.type != "cpu":
+            self.log(f"Data-parallel training runs on CPU only, training on {self.device}")
+            workers = 1
+
+        if workers > 1:
+            self._train_distributed(workers, epochs, batch_size, save_interval, mode)
+        else:
+            self._train(epochs, batch_size, save_interval, mode)
+
+    def _train(self, epochs: int, batch_size: Optional[int], save_interval: int, mode: str):
+
+        writer = SummaryWriter(self.logs_dir) if self.is_main else None
+
+        if mode == "minibatch":
+            loader = self._load_data(kind="train", batch_size=batch_size)
+            n_rows = len(loader.dataset)
+        else:
+            x, y = self._load_tensors(kind="train")
+            n_rows = len(x)
+
+            if mode == "lbfgs" and self.world_size > 1:
+                x, y = x[self._rank :: self.world_size], y[self._rank :: self.world_size]
+
+        # Every data-parallel process validates on the whole set, so they all stop together
+
+        validation = None
+
+        if "validation" in self.dataset.dataframe:
+            validation = self._load_tensors(kind="validation")
+
+        best_state, best_epoch = None, None
+        validation_loss = None
+
+        with tqdm(
+            total=epochs,
+            initial=self.epoch - 1,
+            unit="epoch",
+            disable=mode == "minibatch" or not self.is_main,
+        ) as pbar:
+
+            while self.epoch <= epochs:
+                self._model.train()
+
+                with self.profiler.stage("training_epoch", rows=n_rows):
+                    if mode == "minibatch":
+                        loss = self._train_epoch_minibatch(loader, writer)
+                    elif mode == "batched":
+                        loss = self._train_epoch_batched(x, y, batch_size)
+                    else:
+                        loss = self._train_epoch_lbfgs(x, y)
+
+                if mode != "minibatch" and writer is not None:
+                    writer.add_scalar("Loss/train", loss, self.epoch)
+                    pbar.set_postfix(loss=loss)
+                    pbar.update()
+
+                stop = False
+
+                if validation is not None:
+                    validation_loss = self._validate(*validation)
+
+                    if writer is not None:
+                        writer.add_scalar("Loss/validation", validation_loss, self.epoch)
+
+                    if self.earlystoping is not None:
+                        self.earlystoping(loss, validation_loss)
+
+                        if self.earlystoping.improved:
+                            best_state = copy.deepcopy(self.model.state_dict())
+                            best_epoch = self.epoch
+
+                        stop = self.earlystoping.early_stop
+
+                # The last epoch is always saved, so training resumes where it stopped
+
+                if self.epoch % save_interval == 0 or self.epoch == epochs or stop:
+                    self.save_checkpoint(metric=validation_loss)
+
+                self._epoch += 1
+
+                if stop:
+                    if self.is_main:
+                        self.log(f"Early stopping at epoch {self.epoch - 1}")
+                    break
+
+        if best_state is not None:
+            self.model.load_state_dict(best_state)
+
+            if self.is_main:
+                self.log(
+                    f"Restored the model of epoch {best_epoch}, validation loss "
+                    f"{self.earlystoping.best_loss:.6f}"
+                )
+
+            # The last checkpoint holds the restored model, so training resumes, such as on an
+            # incremental run, from the model that is saved and aligned with
+
+            if best_epoch != self.epoch - 1:
+                self._epoch -= 1
+                self.save_checkpoint(metric=self.earlystoping.best_loss)
+                self._epoch += 1
+
+        # Checkpoints written in the background are on disk once training returns
+
+        self.checkpoint_manager.wait()
+
+        if writer is not None:
+            writer.flush()
+            writer.close()
+
+    def _train_distributed(
+        self, workers: int, epochs: int, batch_size: Optional[int], save_interval: int, mode: str
+    ):
+
+        if "fork" not in th.multiprocessing.get_all_start_methods():
+            raise RuntimeError("Data-parallel training requires the fork start method")
+
+        self.log(f"Training with {workers} data-parallel processes")
+
+        # Forked processes inherit the trainer and its tensors without pickling them
+
+        ctx = th.multiprocessing.get_context("fork")
+        queue = ctx.SimpleQueue()
+
+        processes = th.multiprocessing.start_processes(
+            _train_worker,
+            args=(self, workers, _free_port(), queue, (epochs, batch_size, save_interval, mode)),
+            nprocs=workers,
+            join=False,
+            start_method="fork",
+        )
+
+        state = None
+
+        # Raises if a training process fails
+
+        while not processes.join(timeout=1):
+            if state is None and not queue.empty():
+                state = queue.get()
+
+        if state is None:
+            state = queue.get()
+
+        state = th.load(io.BytesIO(state))
+
+        self.model.load_state_dict(state["model_state_dict"])
+        self._optimizer.load_state_dict(state["optimizer_state_dict"])
+        self._epoch = state["epoch"]
+
+        if state["stopper_state"] is not None:
+            vars(self._earlystoping).update(state["stopper_state"])
+
+    def _train_epoch_minibatch(self, loader: DataLoader, writer: Optional[SummaryWriter]) -> float:
+        _iter = 1
 
-        while self.epoch <= epochs:
-            self._model.train()
-            _iter = 1
+        if isinstance(loader.sampler, DistributedSampler):
+            loader.sampler.set_epoch(self.epoch)
 
-            with tqdm(self._load_data(kind="train", batch_size=batch_size), unit="batch") as tepoch:
+        with tqdm(loader, unit="batch", disable=not self.is_main) as tepoch:
 
-                for data, target in tepoch:
-                    tepoch.set_description(f"Epoch {self.epoch}")
+            for data, target in tepoch:
+                tepoch.set_description(f"Epoch {self.epoch}")
 
-                    self._optimizer.zero_grad()
-                    logits = self._model(data)
-                    loss = self._loss(logits, target)
+                self._optimizer.zero_grad()
+                logits = self._model(data)
+                loss = self._loss(logits, target)
+
+                if writer is not None:
                     writer.add_scalar("Loss/train", loss, _iter)
 
-                    loss.backward()
-                    self._optimizer.step()
+                loss.backward()
+                self._optimizer.step()
+
+                tepoch.set_postfix(loss=loss.item())
+
+                _iter += 1
+
+        return loss.item()
+
+    def _train_epoch_batched(self, x: th.Tensor, y: th.Tensor, batch_size: int) -> float:
+
+        if getattr(self, "_perm", None) is None or len(self._perm) != len(x):
+            self._perm = th.empty(len(x), dtype=th.long, device=x.device)
+
+        # Shuffle the index tensor in place and slice it, the loss is accumulated on device to
+        # avoid a host sync per batch. Data-parallel processes draw the same permutation, as
+        # they share the seed, and each takes its shard of every batch
+
+        th.randperm(len(x), out=self._perm)
+
+        total = th.zeros((), device=x.device)
+        count = th.zeros((), device=x.device)
+
+        for start in range(0, len(x), batch_size):
+            idx = self._shard(self._perm[start : start + batch_size])
+
+            self._optimizer.zero_grad(set_to_none=True)
+            loss = self._loss(self._model(x[idx]), y[idx])
+
+            loss.backward()
+            self._optimizer.step()
+
+            total += loss.detach() * len(idx)
+            count += len(idx)
+
+        if self.world_size > 1:
+            dist.all_reduce(total)
+            dist.all_reduce(count)
+
+        return (total / count).item()
+
+    def _train_epoch_lbfgs(self, x: th.Tensor, y: th.Tensor) -> float:
+
+        def closure():
+            self._optimizer.zero_grad()
+            loss = self._loss(self._model(x), y)
+            loss.backward()
+
+            # The line search of every process must see the same loss
+
+            if self.world_size > 1:
+                loss = loss.detach()
+                dist.all_reduce(loss)
+                loss /= self.world_size
+
+            return loss
+
+        return self._optimizer.step(closure).item()
+
+    def _validate(self, x: th.Tensor, y: th.Tensor) -> float:
+        """Computes the validation loss in a single batched pass."""
+
+        self.model.eval()
+
+        with th.no_grad():
+            loss = self._loss(self.model(x), y).item()
+
+        self._model.train()
+
+        return loss
+
+    def evaluate(self, kind: Optional[str] = "validation") -> Dict[str, float]:
+        """Evaluates the model on the rows of a kind.
+
+        Args:
+            kind (str, optional): The kind of rows. Defaults to "validation".
+
+        Returns:
+            Dict[str, float]: The loss, and the ranking metrics of the positive pairs among the
+                pairs of their source, see `ranking_metrics`.
+        """
+
+        x, y = self._load_tensors(kind)
+
+        self.model.eval()
 
-                    tepoch.set_postfix(loss=loss.item())
+        with th.no_grad():
+            scores = self.model(x)
+            loss = self._loss(scores, y).item()
 
-                    _iter += 1
+        self._model.train()
 
-            if self.epoch % save_interval == 0:
-                self.save_checkpoint()
+        groups = self.dataset.dataframe["SrcEntity"].to_numpy()
+        groups = groups[self.dataset.dataframe[kind].to_numpy(dtype=bool)]
 
-            self._epoch += 1
+        metrics = ranking_metrics(
+            groups, y.squeeze(1).cpu().numpy(), scores.squeeze(1).cpu().numpy()
+        )
 
-        writer.flush()
-        writer.close()
+        return {"loss": loss, **metrics}
+
+    def _shard(self, idx: th.Tensor) -> th.Tensor:
+        """Gets the shard of a batch of the current process, every shard has the same size."""
+
+        if self.world_size == 1:
+            return idx
+
+        size = -(-len(idx) // self.world_size)
+        pos = self._rank + self.world_size * th.arange(size, device=idx.device)
+
+        return idx[pos % len(idx)]
+
+    def _scale_lr(self, batch_size: int, base_batch_size: int, rule: str) -> None:
+
+        if rule not in LR_SCALING_RULES:
+            raise ValueError(
+                f"LR scaling {rule} not recognized, expected one of {LR_SCALING_RULES}"
+            )
+
+        factor = batch_size / base_batch_size
+        factor = factor if rule == "linear" else math.sqrt(factor)
+
+        # The unscaled lr is kept in the param groups, so resumed optimizers are not rescaled
+
+        for group in self._optimizer.param_groups:
+            group["lr"] = group.setdefault("base_lr", group["lr"]) * factor
+
+        self.log(f"Learning rate scaled by {factor:.2f} ({rule}) for batch size {batch_size}")
 
     def repair(self, **kwargs):
 
         # TODO add AML repair
         pass
 
-    def predict(self, threshold: Optional[float] = 0.7, **kwargs) -> List[EntityMapping]:
+    def predict(
+        self, threshold: Optional[float] = 0.7, chunk_size: Optional[int] = 100000, **kwargs
+    ) -> Iterator[Predictions]:
 
         kind = "inference"
 
-        df = self.dataset.dataframe.copy()
-        df = df[df[kind] == True]
+        df = self.dataset.dataframe
+        rows = df[kind].to_numpy(dtype=bool).nonzero()[0]
+        sources = df["SrcEntity"].to_numpy()
+        targets = df["TgtEntity"].to_numpy()
 
-        # if supervised use model to calculate scores
-        if self.dataset.reference is not None:
+        # if supervised use model to calculate scores, if unsupervised use max score from matcha
+        supervised = self.dataset.reference is not None
 
-            data, _ = self._load_data(kind=kind)
+        if supervised:
             self._model.eval()
-            with th.no_grad():
-                logits = self._model(data)
 
-            df["Scores"] = logits.cpu()
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
 
-            return [
-                EntityMapping(dp["SrcEntity"], dp["TgtEntity"], "=", dp["Scores"])
-                for _, dp in df.iterrows()
-                if dp["Scores"] >= threshold
-            ]
+            # The consumer of the chunk is not part of the prediction stage
 
-        # if unsupervised use max score from matcha
-        else:
+            with self.profiler.stage("prediction", rows=len(chunk)):
+                feats = self.dataset.features[chunk]
+
+                if supervised:
+                    with th.no_grad():
+                        logits = self._model(
+                            th.as_tensor(feats, dtype=th.float32, device=self.device)
+                        )
+
+                    scores = logits.squeeze(1).cpu().numpy()
+
+                else:
+                    scores = feats.max(axis=1)
+
+                keep = (scores >= threshold).nonzero()[0]
 
-            df["matcha"] = np.array(df["Features"].values.tolist()).max(axis=1)
+                preds = Predictions(
+                    index=start + keep,
+                    sources=sources[chunk[keep]],
+                    targets=targets[chunk[keep]],
+                    scores=scores[keep],
+                )
 
-            return [
-                EntityMapping(dp["SrcEntity"], dp["TgtEntity"], "=", dp["matcha"])
-                for _, dp in df.iterrows()
-                if dp["matcha"] >= threshold
-            ]
+            yield preds
 
     def _load_data(
         self, kind: Optional[str] = "train", batch_size: Optional[int] = 1
     ) -> DataLoader:
 
+        x, y = self._load_tensors(kind)
+
+        if kind == "train":
+            ds = TensorDataset(x, y)
+
+            if self.world_size > 1:
+                sampler = DistributedSampler(
+                    ds, num_replicas=self.world_size, rank=self._rank, seed=self.seed
+                )
+                local_batch_size = -(-batch_size // self.world_size) if batch_size else None
+
+                return DataLoader(ds, batch_size=local_batch_size, sampler=sampler)
+
+            return DataLoader(ds, batch_size=batch_size, shuffle=True)
+
+        return x, y
+
+    def _load_tensors(self, kind: Optional[str] = "train") -> Tuple[th.Tensor, th.Tensor]:
+
         x = self.dataset.x(kind)
         y = self.dataset.y(kind)
 
@@ -105,9 +517,4 @@ class MLPTrainer(ITrainer):
         y = y.unsqueeze(1)
         y = y.to(self.device)
 
-        if kind == "train":
-            ds = TensorDataset(x, y)
-
-            return DataLoader(ds, batch_size=batch_size, shuffle=True)
-
         return x, y
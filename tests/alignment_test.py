@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from matcha_dl.impl.dp.alignment import (
+    alignment_delta,
+    greedy_one_to_one,
+    top_k_per_group,
+)
+
+
+def _reference_one_to_one(sources, targets, scores):
+    """Accepts pairs by descending score, ties by position, when neither entity is aligned."""
+
+    aligned_sources, aligned_targets, selected = set(), set(), []
+
+    for i in np.argsort(-scores, kind="stable"):
+        if sources[i] not in aligned_sources and targets[i] not in aligned_targets:
+            aligned_sources.add(sources[i])
+            aligned_targets.add(targets[i])
+            selected.append(i)
+
+    return np.array(selected, dtype=np.int64)
+
+
+def test_top_k_per_group_empty():
+    groups = np.array([], dtype=np.int64)
+    scores = np.array([], dtype=np.float32)
+
+    assert len(top_k_per_group(groups, scores, 1)) == 0
+    assert len(top_k_per_group(groups, scores, 3)) == 0
+
+
+def test_top_k_per_group_single_candidate():
+    groups = np.array([2, 0, 1])
+    scores = np.array([0.1, 0.5, 0.3])
+
+    assert top_k_per_group(groups, scores, 1).tolist() == [1, 2, 0]
+    assert top_k_per_group(groups, scores, 2).tolist() == [1, 2, 0]
+
+
+def test_top_k_per_group_ties_keep_first_row():
+    groups = np.array([0, 0, 0, 1])
+    scores = np.array([0.5, 0.9, 0.9, 0.2])
+
+    # Sorted groups take the linear path, unsorted ones the sorting path
+    assert top_k_per_group(groups, scores, 1).tolist() == [1, 3]
+
+    groups, scores = groups[::-1].copy(), scores[::-1].copy()
+
+    assert top_k_per_group(groups, scores, 1).tolist() == [1, 0]
+
+
+def test_top_k_per_group_order():
+    groups = np.array([1, 0, 1, 0, 1])
+    scores = np.array([0.2, 0.4, 0.8, 0.6, 0.5])
+
+    assert top_k_per_group(groups, scores, 2).tolist() == [3, 1, 2, 4]
+
+
+def test_greedy_one_to_one_empty():
+    empty = np.array([], dtype=np.int64)
+
+    assert len(greedy_one_to_one(empty, empty, np.array([], dtype=np.float32))) == 0
+
+
+def test_greedy_one_to_one_single_candidate():
+    sources = np.array([0, 1, 2])
+    targets = np.array([2, 0, 1])
+    scores = np.array([0.3, 0.9, 0.6])
+
+    assert greedy_one_to_one(sources, targets, scores).tolist() == [1, 2, 0]
+
+
+def test_greedy_one_to_one_conflicts():
+    sources = np.array([0, 0, 1, 1])
+    targets = np.array([0, 1, 0, 1])
+    scores = np.array([0.9, 0.8, 0.7, 0.1])
+
+    assert greedy_one_to_one(sources, targets, scores).tolist() == [0, 3]
+
+
+def test_greedy_one_to_one_ties_keep_first_pair():
+    sources = np.array([0, 1, 1])
+    targets = np.array([0, 0, 1])
+    scores = np.array([0.5, 0.5, 0.5])
+
+    assert greedy_one_to_one(sources, targets, scores).tolist() == [0, 2]
+
+
+def test_greedy_one_to_one_matches_sequential_greedy():
+    random = np.random.default_rng(0)
+
+    for _ in range(50):
+        n = random.integers(1, 60)
+        sources = random.integers(0, 8, n)
+        targets = random.integers(0, 8, n)
+        scores = random.integers(0, 5, n) / 4
+
+        assert (
+            greedy_one_to_one(sources, targets, scores).tolist()
+            == _reference_one_to_one(sources, targets, scores).tolist()
+        )
+
+
+def test_alignment_delta_global():
+    previous = pd.DataFrame(
+        {"SrcEntity": ["a", "b", "c"], "TgtEntity": ["x", "y", "z"], "Score": [0.9, 0.8, 0.7]}
+    )
+    current = pd.DataFrame(
+        {"SrcEntity": ["a", "b", "d"], "TgtEntity": ["x", "w", "z"], "Score": [0.5, 0.8, 0.7]}
+    )
+
+    delta = alignment_delta(previous, current)
+    changes = dict(zip(zip(delta["SrcEntity"], delta["TgtEntity"]), delta["Change"]))
+
+    # The rescored (a, x) mapping is not part of the delta
+    assert changes == {
+        ("b", "w"): "added",
+        ("b", "y"): "removed",
+        ("c", "z"): "removed",
+        ("d", "z"): "added",
+    }
+
+
+def test_alignment_delta_empty():
+    empty = pd.DataFrame(columns=["SrcEntity", "TgtEntity", "Score"])
+    current = pd.DataFrame({"SrcEntity": ["a"], "TgtEntity": ["x"], "Score": [0.9]})
+
+    assert len(alignment_delta(empty, empty)) == 0
+    assert alignment_delta(empty, current)["Change"].tolist() == ["added"]
+    assert alignment_delta(current, empty)["Change"].tolist() == ["removed"]
+
+
+def test_alignment_delta_local():
+    previous = pd.DataFrame(
+        {
+            "SrcEntity": ["a", "b", "c", "d"],
+            "TgtEntity": ["x", "y", "z", "w"],
+            "TgtCandidates": [
+                "[('x', 0.9), ('y', 0.1)]",
+                "[('y', 0.6)]",
+                "[]",
+                "[('w', 0.5), ('z', 0.5)]",
+            ],
+        }
+    )
+    current = previous.assign(
+        TgtCandidates=[
+            "[('x', 0.2), ('y', 0.7)]",
+            "[('y', 0.3)]",
+            "[]",
+            "[('w', 0.4), ('z', 0.4)]",
+        ]
+    )
+
+    delta = alignment_delta(previous, current)
+
+    # Only a changed its best candidate, ties keep the first candidate and rows without
+    # candidates are unchanged
+    assert delta["SrcEntity"].tolist() == ["a"]
+    assert delta["BestCandidate"].tolist() == ["y"]
+    assert delta["PreviousBestCandidate"].tolist() == ["x"]
+    assert delta["Change"].tolist() == ["reranked"]
@@ -0,0 +1,91 @@
+import os
+
+from matcha_dl.impl.cache import StageCache, cache_key, read_key, write_key
+
+KB = 1024**-2  # 1 KB in GB
+
+
+def _file(path, text):
+    path.write_text(text)
+    return path
+
+
+def _age(cache, stage, key, seconds):
+    """Sets the last use of a cache entry to some seconds ago."""
+    entry = cache.entry(stage, key)
+    os.utime(entry, (entry.stat().st_atime - seconds, entry.stat().st_mtime - seconds))
+
+
+def test_cache_key_follows_the_inputs(tmp_path):
+    scores = _file(tmp_path / "scores.csv", "a,b\n1,2\n")
+    key = cache_key(scores, None, seed=1, sampler={"n_samples": 3})
+
+    assert key == cache_key(scores, None, sampler={"n_samples": 3}, seed=1)
+    assert key != cache_key(scores, None, seed=2, sampler={"n_samples": 3})
+    assert key != cache_key(None, scores, seed=1, sampler={"n_samples": 3})
+
+    # A rewritten input invalidates the key, even at the same path
+    _file(scores, "a,b\n1,3\n")
+    os.utime(scores, ns=(0, scores.stat().st_mtime_ns + 1))
+
+    assert key != cache_key(scores, None, seed=1, sampler={"n_samples": 3})
+
+
+def test_read_and_write_key(tmp_path):
+    output = _file(tmp_path / "output.csv", "")
+
+    assert read_key(output) is None
+
+    write_key(output, "abc")
+
+    assert read_key(output) == "abc"
+
+
+def test_put_and_restore(tmp_path):
+    cache = StageCache(tmp_path / "cache", max_size=1)
+
+    output = tmp_path / "run" / "dataset"
+    output.mkdir(parents=True)
+    _file(output / "features.npy", "features")
+
+    assert not cache.restore("processor", "k1", tmp_path / "other" / "dataset")
+
+    cache.put("processor", "k1", output)
+
+    restored = tmp_path / "other" / "dataset"
+
+    assert cache.restore("processor", "k1", restored)
+    assert (restored / "features.npy").read_text() == "features"
+    assert read_key(restored) == "k1"
+
+    # Restoring again replaces the previous copy
+    _file(restored / "stale.npy", "")
+
+    assert cache.restore("processor", "k1", restored)
+    assert not (restored / "stale.npy").exists()
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    cache = StageCache(tmp_path / "cache", max_size=2.5 * KB)
+
+    for i, key in enumerate(["k1", "k2"]):
+        cache.put("matcha", key, _file(tmp_path / "scores.csv", "x" * 1024))
+        _age(cache, "matcha", key, 100 - i)
+
+    # k1 is used, so k2 is the least recently used once k3 is added
+    assert cache.get("matcha", "k1", "scores.csv") is not None
+
+    cache.put("matcha", "k3", _file(tmp_path / "scores.csv", "x" * 1024))
+
+    assert cache.get("matcha", "k2", "scores.csv") is None
+    assert cache.get("matcha", "k1", "scores.csv") is not None
+    assert cache.get("matcha", "k3", "scores.csv") is not None
+
+
+def test_disabled_cache(tmp_path):
+    cache = StageCache(tmp_path / "cache", max_size=0)
+
+    assert not cache.enabled
+    assert cache.put("matcha", "k1", _file(tmp_path / "scores.csv", "x")) is None
+    assert cache.get("matcha", "k1", "scores.csv") is None
+    assert not (tmp_path / "cache").exists()
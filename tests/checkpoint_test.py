@@ -0,0 +1,115 @@
+import pytest
+import torch as th
+
+from matcha_dl.impl import checkpoint
+from matcha_dl.impl.checkpoint import CheckpointManager
+
+
+def _state(value: float):
+    return {"model_state_dict": {"weight": th.full((2, 2), value)}}
+
+
+@pytest.mark.parametrize("async_writes", [False, True])
+def test_checkpoints_are_ordered_by_epoch(tmp_path, async_writes):
+    manager = CheckpointManager(tmp_path, keep_last=None, async_writes=async_writes)
+
+    for epoch in [9, 10, 2]:
+        manager.save(epoch, _state(epoch))
+
+    (tmp_path / "notes.txt").write_text("")
+    (tmp_path / "best.pt").write_text("")
+
+    manager.wait()
+
+    assert manager.checkpoints == [2, 9, 10]
+    assert manager.last == 10
+
+    state = manager.load()
+
+    assert state["epoch"] == 10
+    assert (state["model_state_dict"]["weight"] == 10).all()
+    assert manager.load("9.pt")["epoch"] == 9
+
+    manager.close()
+
+
+def test_retention_keeps_the_latest_and_the_best(tmp_path):
+    manager = CheckpointManager(tmp_path, keep_last=2, keep_best=1, async_writes=False)
+
+    for epoch, metric in [(1, 0.5), (2, 0.1), (3, 0.4), (4, None), (5, 0.3)]:
+        manager.save(epoch, _state(epoch), metric=metric)
+
+    assert manager.checkpoints == [2, 4, 5]
+
+
+def test_best_checkpoints_are_kept_after_a_resume(tmp_path):
+    manager = CheckpointManager(tmp_path, keep_last=1, keep_best=1, async_writes=False)
+
+    for epoch, metric in [(1, 0.5), (2, 0.1), (3, 0.4)]:
+        manager.save(epoch, _state(epoch), metric=metric)
+
+    assert manager.checkpoints == [2, 3]
+
+    resumed = CheckpointManager(tmp_path, keep_last=1, keep_best=1, async_writes=False)
+
+    for epoch, metric in [(4, 0.3), (5, None)]:
+        resumed.save(epoch, _state(epoch), metric=metric)
+
+    assert resumed.checkpoints == [2, 5]
+
+    # An overwritten checkpoint without a metric is no longer the best
+    resumed.save(2, _state(2))
+    resumed.save(6, _state(6), metric=0.9)
+
+    assert resumed.checkpoints == [6]
+
+
+def test_retention_keeps_everything_without_keep_last(tmp_path):
+    manager = CheckpointManager(tmp_path, keep_last=None, async_writes=False)
+
+    for epoch in range(1, 6):
+        manager.save(epoch, _state(epoch))
+
+    assert manager.checkpoints == [1, 2, 3, 4, 5]
+
+
+def test_saved_state_is_copied(tmp_path):
+    manager = CheckpointManager(tmp_path)
+    state = _state(1)
+
+    manager.save(1, state)
+    state["model_state_dict"]["weight"].fill_(2)
+
+    assert (manager.load(1)["model_state_dict"]["weight"] == 1).all()
+
+    manager.close()
+
+
+@pytest.mark.parametrize("async_writes", [False, True])
+def test_failed_writes_keep_the_previous_checkpoint(tmp_path, monkeypatch, async_writes):
+    manager = CheckpointManager(tmp_path, keep_last=1, async_writes=async_writes)
+    manager.save(1, _state(1))
+    manager.wait()
+
+    def truncated_save(state, f):
+        f.write(b"truncated")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(checkpoint.th, "save", truncated_save)
+
+    with pytest.raises(OSError):
+        manager.save(1, _state(2))
+        manager.wait()
+
+    monkeypatch.undo()
+
+    # No temporary file is left and the checkpoint is not overwritten
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["1.pt", "metrics.json"]
+    assert (manager.load(1)["model_state_dict"]["weight"] == 1).all()
+
+    manager.close()
+
+
+def test_load_without_checkpoints(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CheckpointManager(tmp_path / "missing").load()
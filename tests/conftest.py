@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from matcha_dl.core.values import MATCHERS, SOURCE_COLUMN, TARGET_COLUMN
+
+N_SOURCES = 40
+N_REFS = 20
+N_CANDIDATES = 8
+
+
+def make_scores(n_sources: int = N_SOURCES, seed: int = 0) -> pd.DataFrame:
+    """Matcha scores where every source has its own target and random others as candidates,
+    the true pair scoring highest. The last row repeats a pair with new scores."""
+
+    random = np.random.default_rng(seed)
+    rows = []
+
+    for i in range(n_sources):
+        others = random.choice(np.delete(np.arange(n_sources), i), N_CANDIDATES - 1, False)
+
+        for j in [i, *others]:
+            low, high = (0.6, 1.0) if j == i else (0.0, 0.5)
+            rows.append([f"s#{i}", f"t#{j}", *random.uniform(low, high, len(MATCHERS))])
+
+    rows.append([rows[1][0], rows[1][1], *[0.45] * len(MATCHERS)])
+
+    return pd.DataFrame(rows, columns=[SOURCE_COLUMN, TARGET_COLUMN, *MATCHERS])
+
+
+@pytest.fixture
+def inputs(tmp_path: Path) -> Dict[str, str]:
+    """Writes a matcha scores file, a reference file of the first sources and a candidates
+    file of the others."""
+
+    scores = make_scores()
+    scores.to_csv(tmp_path / "matcha_scores.csv", index=False)
+
+    pd.DataFrame(
+        {
+            "SrcEntity": [f"s#{i}" for i in range(N_REFS)],
+            "TgtEntity": [f"t#{i}" for i in range(N_REFS)],
+            "Score": 1.0,
+        }
+    ).to_csv(tmp_path / "train.tsv", sep="\t", index=False)
+
+    cands = scores[scores[SOURCE_COLUMN].isin([f"s#{i}" for i in range(N_REFS, N_SOURCES)])]
+    cands = cands.groupby(SOURCE_COLUMN, sort=False)[TARGET_COLUMN].agg(list)
+
+    pd.DataFrame(
+        {
+            "SrcEntity": cands.index,
+            "TgtEntity": [f"t#{source[2:]}" for source in cands.index],
+            "TgtCandidates": cands.map(str).to_numpy(),
+        }
+    ).to_csv(tmp_path / "test.cands.tsv", sep="\t", index=False)
+
+    return {
+        "scores_file": str(tmp_path / "matcha_scores.csv"),
+        "ref_file": str(tmp_path / "train.tsv"),
+        "cands_file": str(tmp_path / "test.cands.tsv"),
+    }
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from matcha_dl.core.entities.dataset import MlpDataset
+from matcha_dl.core.entities.vocab import EntityVocab
+from matcha_dl.impl.negative_sampler import RandomNegativeSampler
+from matcha_dl.impl.processor import MainProcessor
+
+
+def _dataset(inputs) -> MlpDataset:
+    return MainProcessor(sampler=RandomNegativeSampler(n_samples=3), seed=7).process(
+        inputs["scores_file"], inputs["ref_file"], inputs["cands_file"]
+    )
+
+
+def _entities(dataset: MlpDataset) -> pd.DataFrame:
+    """The dataset table with the entity ids resolved."""
+
+    df = dataset.dataframe[["SrcEntity", "TgtEntity", "Labels", "train", "inference"]]
+
+    return df.assign(
+        SrcEntity=dataset.vocab.decode(df["SrcEntity"]),
+        TgtEntity=dataset.vocab.decode(df["TgtEntity"]),
+    ).reset_index(drop=True)
+
+
+def test_binary_round_trip(inputs, tmp_path):
+    dataset = _dataset(inputs)
+    path = tmp_path / "dataset"
+
+    assert not MlpDataset.exists(path)
+    assert dataset.save(path) == str(path)
+    assert MlpDataset.exists(path)
+
+    loaded = MlpDataset.load(path)
+
+    pd.testing.assert_frame_equal(_entities(loaded), _entities(dataset), check_dtype=False)
+    np.testing.assert_array_equal(loaded.features, dataset.features)
+
+    # Features are memory-mapped, not copied
+    assert isinstance(loaded.features, np.memmap) or isinstance(loaded.features.base, np.memmap)
+
+    np.testing.assert_array_equal(loaded.x("inference"), dataset.x("inference"))
+    np.testing.assert_array_equal(loaded.y(), dataset.y())
+
+
+def test_binary_load_remaps_into_a_shared_vocab(inputs, tmp_path):
+    dataset = _dataset(inputs)
+    dataset.save(tmp_path / "dataset")
+
+    vocab = EntityVocab(["unrelated", *dataset.vocab.entities[::-1]])
+    loaded = MlpDataset.load(tmp_path / "dataset", vocab=vocab)
+
+    assert loaded.vocab is vocab
+    pd.testing.assert_frame_equal(_entities(loaded), _entities(dataset), check_dtype=False)
+
+
+def test_save_replaces_a_previous_dataset(inputs, tmp_path):
+    dataset = _dataset(inputs)
+    path = tmp_path / "dataset"
+
+    dataset.save(path)
+
+    half = MlpDataset(
+        dataset.dataframe[: len(dataset.dataframe) // 2],
+        dataset.features[: len(dataset.dataframe) // 2],
+        vocab=dataset.vocab,
+    )
+    half.save(path)
+
+    assert len(MlpDataset.load(path).dataframe) == len(half.dataframe)
+    assert not (tmp_path / "dataset.tmp").exists()
+
+
+def test_csv_round_trip(inputs, tmp_path):
+    dataset = _dataset(inputs)
+    path = tmp_path / "dataset.csv"
+
+    dataset.save(path)
+
+    assert MlpDataset.exists(path)
+
+    loaded = MlpDataset.load(path)
+
+    pd.testing.assert_frame_equal(_entities(loaded), _entities(dataset), check_dtype=False)
+    np.testing.assert_allclose(loaded.features, dataset.features)
@@ -0,0 +1,84 @@
+import importlib.util
+
+import numpy as np
+import pytest
+import torch as th
+
+from matcha_dl.core.values import MATCHERS
+from matcha_dl.impl.export import export_model
+from matcha_dl.impl.inference import FEATURE_SPEC_FILE, check_feature_spec
+from matcha_dl.impl.models import MlpClassifier
+from matcha_dl.impl.service import load_model
+
+
+@pytest.fixture
+def model():
+    th.manual_seed(0)
+    return MlpClassifier(layers=[16, 8], n=len(MATCHERS), n_classes=1)
+
+
+@pytest.fixture
+def features():
+    return np.random.default_rng(0).random((257, len(MATCHERS)), dtype=np.float32)
+
+
+def _scores(model, features):
+    model.eval()
+
+    with th.no_grad():
+        return model(th.as_tensor(features)).numpy()
+
+
+def test_torchscript_and_numpy_parity(model, features, tmp_path):
+    files = export_model(model, tmp_path, formats=["torchscript", "numpy"])
+
+    assert set(files) == {"feature_spec", "torchscript", "numpy"}
+
+    expected = _scores(model, features)
+
+    with th.no_grad():
+        scripted = th.jit.load(files["torchscript"])(th.as_tensor(features)).numpy()
+
+    np.testing.assert_allclose(scripted, expected, rtol=0, atol=1e-6)
+    np.testing.assert_allclose(load_model(files["numpy"])(features), expected, rtol=0, atol=1e-6)
+
+
+def test_export_keeps_the_training_mode(model, tmp_path):
+    model.train()
+    export_model(model, tmp_path, formats=["numpy"])
+
+    assert model.training
+
+
+def test_onnx_parity(model, features, tmp_path):
+    pytest.importorskip("onnx")
+    onnxruntime = pytest.importorskip("onnxruntime")
+
+    files = export_model(model, tmp_path, formats=["onnx"])
+
+    session = onnxruntime.InferenceSession(files["onnx"])
+    (scores,) = session.run(["scores"], {"features": features})
+
+    np.testing.assert_allclose(scores, _scores(model, features), rtol=0, atol=1e-6)
+
+
+@pytest.mark.skipif(importlib.util.find_spec("onnx") is not None, reason="onnx is installed")
+def test_onnx_export_requires_onnx(model, tmp_path):
+    with pytest.raises(ImportError):
+        export_model(model, tmp_path, formats=["onnx"])
+
+
+def test_unknown_export_format(model, tmp_path):
+    with pytest.raises(ValueError):
+        export_model(model, tmp_path, formats=["tflite"])
+
+
+def test_feature_spec_is_checked(model, tmp_path):
+    files = export_model(model, tmp_path, formats=["numpy"])
+
+    check_feature_spec(files["feature_spec"])
+
+    (tmp_path / FEATURE_SPEC_FILE).write_text('{"features": ["LM"]}')
+
+    with pytest.raises(ValueError):
+        load_model(files["numpy"])
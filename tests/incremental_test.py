@@ -0,0 +1,229 @@
+import logging
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from matcha_dl import AlignmentRunner
+from matcha_dl.core.actions.alignment import load_previous_run
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.values import MATCHA_SCORES_FILE, MATCHERS, PROCESSED_DATASET
+from matcha_dl.impl.matcha.matcha import Matcha
+from matcha_dl.impl.negative_sampler import RandomNegativeSampler
+from matcha_dl.impl.processor import MainProcessor
+from tests.conftest import N_REFS
+
+logger = logging.getLogger("matcha-dl")
+
+# Sources of the changed matcha scores and of the added references
+RESCORED = "s#3"
+ADDED = [f"s#{i}" for i in range(N_REFS - 5, N_REFS)]
+
+
+def _processor() -> MainProcessor:
+    return MainProcessor(sampler=RandomNegativeSampler(n_samples=3), seed=7)
+
+
+def _rows(dataset) -> pd.DataFrame:
+    """The dataset rows with the entity ids resolved, and the features, in a stable order."""
+
+    df = dataset.dataframe[["SrcEntity", "TgtEntity", "Labels", "train", "inference"]]
+
+    return (
+        pd.concat(
+            [
+                df.assign(
+                    SrcEntity=dataset.vocab.decode(df["SrcEntity"]),
+                    TgtEntity=dataset.vocab.decode(df["TgtEntity"]),
+                ).reset_index(drop=True),
+                pd.DataFrame(np.asarray(dataset.features), columns=MATCHERS),
+            ],
+            axis=1,
+        )
+        .astype({"Labels": np.float32})
+        .sort_values(["SrcEntity", "TgtEntity", "train", "inference"])
+        .reset_index(drop=True)
+    )
+
+
+@pytest.fixture
+def versions(inputs, tmp_path):
+    """Writes the previous references, without the added ones, and the new matcha scores, with
+    the rescored source."""
+
+    refs = pd.read_csv(inputs["ref_file"], sep="\t")
+    refs[~refs["SrcEntity"].isin(ADDED)].to_csv(tmp_path / "refs_v1.tsv", sep="\t", index=False)
+
+    scores = pd.read_csv(inputs["scores_file"])
+    scores.loc[scores["Entity 1"] == RESCORED, MATCHERS[0]] = 0.99
+    scores.to_csv(tmp_path / "scores_v2.csv", index=False)
+
+    return {
+        "ref_file": str(tmp_path / "refs_v1.tsv"),
+        "scores_file": str(tmp_path / "scores_v2.csv"),
+    }
+
+
+def _previous_run(inputs, versions, output_dir, cands_file=None):
+    """Processes the previous inputs into an output directory and loads them back."""
+
+    output_dir.mkdir()
+    shutil.copy(inputs["scores_file"], output_dir / MATCHA_SCORES_FILE)
+
+    _processor().process(
+        str(output_dir / MATCHA_SCORES_FILE),
+        versions["ref_file"],
+        cands_file,
+        output_file=str(output_dir / PROCESSED_DATASET),
+    )
+
+    return load_previous_run(str(output_dir), logger)
+
+
+def test_load_previous_run_without_a_previous_run(tmp_path):
+    assert load_previous_run(str(tmp_path), logger) is None
+
+
+def test_update_without_changes_keeps_every_row(inputs, versions, tmp_path):
+    previous_scores, previous = _previous_run(inputs, versions, tmp_path / "out")
+
+    updated = _processor().update(
+        previous,
+        np.array([], dtype=np.int32),
+        inputs["scores_file"],
+        versions["ref_file"],
+        matcha_scores=previous_scores,
+    )
+
+    pd.testing.assert_frame_equal(_rows(updated), _rows(previous))
+
+
+def test_update_rebuilds_the_affected_sources(inputs, versions, tmp_path):
+    previous_scores, previous = _previous_run(inputs, versions, tmp_path / "out")
+
+    scores = MatchaScores.from_csv(versions["scores_file"], vocab=previous.vocab)
+    changed = scores.diff(previous_scores)
+
+    assert previous.vocab.decode(changed).tolist() == [RESCORED]
+
+    updated = _processor().update(
+        previous, changed, versions["scores_file"], inputs["ref_file"], matcha_scores=scores
+    )
+
+    rows, previous_rows = _rows(updated), _rows(previous)
+    affected = [RESCORED, *ADDED]
+
+    # The rows of the other sources are kept, negatives included
+    pd.testing.assert_frame_equal(
+        rows[~rows["SrcEntity"].isin(affected)].reset_index(drop=True),
+        previous_rows[~previous_rows["SrcEntity"].isin(affected)].reset_index(drop=True),
+    )
+
+    # The added references are trained on, with their negatives, and the pairs of the
+    # rescored source have the new scores
+    train = rows[rows["train"]]
+
+    for source in ADDED:
+        assert train[(train["SrcEntity"] == source) & (train["Labels"] == 1)][
+            "TgtEntity"
+        ].tolist() == [f"t#{source[2:]}"]
+        assert (train["SrcEntity"] == source).sum() == 4
+
+    rescored = rows[rows["SrcEntity"] == RESCORED]
+    rescored = rescored[
+        rescored["TgtEntity"].isin(scores.vocab.decode(scores.candidates(changed)[1]))
+    ]
+
+    assert len(rescored) > 0
+    assert (rescored[MATCHERS[0]] == np.float32(0.99)).all()
+
+    # As many rows as processing the new inputs from scratch
+    expected = _processor().process(versions["scores_file"], inputs["ref_file"])
+
+    assert len(rows) == len(_rows(expected))
+
+
+def test_update_rebuilds_the_sources_with_changed_candidates(inputs, versions, tmp_path):
+    previous_scores, previous = _previous_run(
+        inputs, versions, tmp_path / "out", cands_file=inputs["cands_file"]
+    )
+
+    cands = pd.read_csv(inputs["cands_file"], sep="\t")
+    cands.loc[0, "TgtCandidates"] = str(["t#0", "t#1"])
+    cands.to_csv(tmp_path / "cands_v2.tsv", sep="\t", index=False)
+
+    updated = _processor().update(
+        previous,
+        np.array([], dtype=np.int32),
+        inputs["scores_file"],
+        versions["ref_file"],
+        str(tmp_path / "cands_v2.tsv"),
+        matcha_scores=previous_scores,
+    )
+
+    rows = _rows(updated)
+    source = cands.loc[0, "SrcEntity"]
+
+    assert sorted(rows[rows["inference"] & (rows["SrcEntity"] == source)]["TgtEntity"]) == [
+        "t#0",
+        "t#1",
+    ]
+    pd.testing.assert_frame_equal(
+        rows[rows["SrcEntity"] != source].reset_index(drop=True),
+        _rows(previous).pipe(lambda df: df[df["SrcEntity"] != source]).reset_index(drop=True),
+    )
+
+
+def test_incremental_alignment(inputs, versions, tmp_path, monkeypatch):
+    # Matcha writes the scores of the current version of the source ontology
+    ontologies = {"v1": inputs["scores_file"], "v2": versions["scores_file"]}
+
+    def run_matcha(self, args):
+        with open(args[0]) as f:
+            shutil.copy(ontologies[f.read()], args[2])
+
+    monkeypatch.setattr(Matcha, "ensure_jar", lambda self: None)
+    monkeypatch.setattr(Matcha, "_run_subprocess", run_matcha)
+
+    source, target = tmp_path / "source.owl", tmp_path / "target.owl"
+    target.write_text("target")
+
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(
+        "training_params:\n  epochs: 2\n  mode: batched\n  batch_size: 64\n"
+        "incremental_params:\n  epochs: 1\n"
+    )
+
+    output_dir = tmp_path / "out"
+
+    def run(version, ref_file, incremental):
+        source.write_text(version)
+        AlignmentRunner(
+            str(source),
+            str(target),
+            str(output_dir),
+            ref_file,
+            config_file=str(config_file),
+            incremental=incremental,
+        ).run()
+
+    run("v1", versions["ref_file"], incremental=False)
+
+    alignment = output_dir / "alignment" / "src2tgt.maps_global.tsv"
+    checkpoints = output_dir / "training_checkpoints"
+
+    assert alignment.is_file()
+    assert (checkpoints / "2.pt").is_file()
+
+    run("v2", inputs["ref_file"], incremental=True)
+
+    # The model of the last checkpoint is fine-tuned for one epoch
+    assert (checkpoints / "3.pt").is_file()
+
+    delta = pd.read_csv(alignment.with_name("src2tgt.maps_global_delta.tsv"), sep="\t")
+
+    assert set(delta["Change"]) <= {"added", "removed"}
+
+    # The added references are no longer aligned
+    assert not set(pd.read_csv(alignment, sep="\t")["SrcEntity"]) & set(ADDED)
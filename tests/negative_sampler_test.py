@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.values import MATCHERS, SOURCE_COLUMN, TARGET_COLUMN
+from matcha_dl.impl.negative_sampler import HardNegativeSampler, RandomNegativeSampler
+from tests.conftest import N_REFS, make_scores
+
+
+def _references(scores: MatchaScores):
+    """The s#i -> t#i references of the first sources, s#0 with a second reference among its
+    best candidates."""
+
+    sources = [f"s#{i}" for i in range(N_REFS)]
+    targets = [f"t#{i}" for i in range(N_REFS)]
+
+    second = scores.vocab.entities[scores.top_candidates(scores.vocab.ids(["s#0"]), 2)[0, 1]]
+
+    return (
+        scores.vocab.ids([*sources, "s#0"]),
+        scores.vocab.ids([*targets, second]),
+    )
+
+
+@pytest.mark.parametrize("n_samples", [2, 10, 50])
+def test_random_negatives_are_distinct_and_valid(n_samples):
+    # Sparse, dense and exhaustive sampling of 40 candidates
+    random = np.random.default_rng(0)
+
+    sources = np.arange(200)
+    targets = random.integers(1000, 1040, len(sources))
+
+    negative_sources, negative_targets = RandomNegativeSampler(n_samples).sample(sources, targets)
+    negatives = pd.DataFrame({"source": negative_sources, "target": negative_targets})
+
+    n_candidates = len(np.unique(targets))
+
+    assert (negatives.groupby("source").size() == min(n_samples, n_candidates - 1)).all()
+    assert not negatives.duplicated().any()
+    assert negatives["target"].isin(targets).all()
+    assert (negatives["target"].to_numpy() != targets[negatives["source"]]).all()
+
+
+def test_random_negatives_are_seeded():
+    sources, targets = np.arange(50), np.arange(100, 150)
+
+    first, second, other = (
+        RandomNegativeSampler(5, seed=seed).sample(sources, targets)[1] for seed in [1, 1, 2]
+    )
+
+    np.testing.assert_array_equal(first, second)
+    assert (first != other).any()
+
+
+def test_random_negatives_without_positives():
+    sources, targets = RandomNegativeSampler(5).sample(np.array([], dtype=np.int32), [])
+
+    assert len(sources) == len(targets) == 0
+
+
+@pytest.mark.parametrize("n_samples, top_k", [(5, 3), (5, 8), (8, 3)])
+def test_hard_negatives_are_distinct_and_valid(n_samples, top_k):
+    scores = MatchaScores.from_frame(make_scores())
+    sources, targets = _references(scores)
+
+    negatives = pd.DataFrame(
+        dict(
+            zip(
+                ["source", "target"],
+                HardNegativeSampler(n_samples, top_k=top_k).sample(sources, targets, scores=scores),
+            )
+        )
+    )
+    positives = pd.DataFrame({"source": sources, "target": targets})
+
+    expected = positives.groupby("source").size() * n_samples
+
+    assert negatives.groupby("source").size().sort_index().equals(expected.sort_index())
+    assert not negatives.duplicated().any()
+    assert len(negatives.merge(positives)) == 0
+
+
+def test_hard_negatives_fill_without_enough_references():
+    scores = MatchaScores.from_frame(make_scores())
+    sources, targets = _references(scores)
+
+    negatives = pd.DataFrame(
+        dict(
+            zip(
+                ["source", "target"],
+                HardNegativeSampler(30, top_k=3).sample(sources, targets, scores=scores),
+            )
+        )
+    )
+    positives = pd.DataFrame({"source": sources, "target": targets})
+
+    # Every reference target that is not a positive of the source is a negative
+    fill = negatives[negatives["target"].isin(targets)]
+
+    n_candidates = len(np.unique(targets))
+
+    assert (
+        fill.groupby("source").size() == n_candidates - positives.groupby("source").size()
+    ).all()
+    assert not negatives.duplicated().any()
+    assert len(negatives.merge(positives)) == 0
+
+
+def test_hard_negatives_fill_is_seeded():
+    scores = MatchaScores.from_frame(make_scores())
+    sources, targets = _references(scores)
+
+    first, second = (
+        HardNegativeSampler(5, seed=3, top_k=3).sample(sources, targets, scores=scores)
+        for _ in range(2)
+    )
+
+    np.testing.assert_array_equal(first[1], second[1])
+
+
+def test_top_candidates_of_an_empty_index():
+    scores = MatchaScores.from_frame(
+        pd.DataFrame(columns=[SOURCE_COLUMN, TARGET_COLUMN, *MATCHERS])
+    )
+
+    cands = scores.top_candidates(np.array([0, 1, 2]), 4)
+
+    assert cands.shape == (3, 4)
+    assert (cands == -1).all()
@@ -0,0 +1,125 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from matcha_dl.impl.dp.tail import tail_csv
+from matcha_dl.impl.negative_sampler import HardNegativeSampler, RandomNegativeSampler
+from matcha_dl.impl.processor import MainProcessor
+
+TIMEOUT = 30
+
+
+def _write_while(scores_file, target_file, wait: threading.Event, rows: int):
+    """Copies the first rows of a scores file, waits for the event, then copies the rest,
+    ending on a line split across two writes."""
+
+    lines = open(scores_file).read().splitlines(keepends=True)
+
+    with open(target_file, "w") as f:
+        f.writelines(lines[: rows + 1])
+        f.flush()
+
+        wait.wait(TIMEOUT)
+
+        rest = "".join(lines[rows + 1 :])
+        f.write(rest[:10])
+        f.flush()
+        f.write(rest[10:])
+
+
+def _assert_same_dataset(dataset, expected):
+    pd.testing.assert_frame_equal(dataset.dataframe, expected.dataframe)
+    np.testing.assert_array_equal(dataset.features, expected.features)
+
+
+def test_tail_csv_reads_complete_rows_only(tmp_path):
+    csv_file = tmp_path / "scores.csv"
+    csv_file.write_text("a,b\n1,2\n3,")
+
+    done = threading.Event()
+    chunks = tail_csv(csv_file, lambda: not done.is_set(), poll_interval=0.01)
+
+    assert next(chunks).to_dict("list") == {"a": [1], "b": [2]}
+
+    with open(csv_file, "a") as f:
+        f.write("4\n5,6")
+
+    assert next(chunks).to_dict("list") == {"a": [3], "b": [4]}
+
+    done.set()
+
+    assert next(chunks).to_dict("list") == {"a": [5], "b": [6]}
+    assert next(chunks, None) is None
+
+
+@pytest.mark.parametrize("cands", [False, True])
+def test_streamed_process_matches_process(inputs, tmp_path, cands):
+    cands_file = inputs["cands_file"] if cands else None
+
+    expected = MainProcessor(sampler=RandomNegativeSampler(n_samples=3), seed=7).process(
+        inputs["scores_file"], inputs["ref_file"], cands_file
+    )
+
+    processor = MainProcessor(
+        sampler=RandomNegativeSampler(n_samples=3), seed=7, scores_key="scores"
+    )
+
+    # The second half of the file is only written once the training set is built
+
+    sampled = threading.Event()
+    sample = processor.sampler.sample
+
+    def sample_and_signal(*args, **kwargs):
+        sampled.set()
+        return sample(*args, **kwargs)
+
+    processor.sampler.sample = sample_and_signal
+
+    streamed_file = tmp_path / "streamed.csv"
+    writer = threading.Thread(
+        target=_write_while, args=(inputs["scores_file"], streamed_file, sampled, 100)
+    )
+    writer.start()
+
+    dataset = processor.process(
+        str(streamed_file), inputs["ref_file"], cands_file, running=writer.is_alive
+    )
+
+    writer.join()
+
+    assert sampled.is_set()
+    _assert_same_dataset(dataset, expected)
+
+
+def test_streamed_process_with_hard_negatives(inputs, tmp_path):
+    expected = MainProcessor(sampler=HardNegativeSampler(n_samples=2, top_k=5), seed=7).process(
+        inputs["scores_file"], inputs["ref_file"]
+    )
+
+    processor = MainProcessor(
+        sampler=HardNegativeSampler(n_samples=2, top_k=5), seed=7, scores_key="scores"
+    )
+
+    started = threading.Event()
+    started.set()
+
+    streamed_file = tmp_path / "streamed.csv"
+    writer = threading.Thread(
+        target=_write_while, args=(inputs["scores_file"], streamed_file, started, 100)
+    )
+    writer.start()
+
+    dataset = processor.process(str(streamed_file), inputs["ref_file"], running=writer.is_alive)
+
+    writer.join()
+
+    _assert_same_dataset(dataset, expected)
+
+
+def test_streaming_requires_scores_key(inputs):
+    processor = MainProcessor(sampler=RandomNegativeSampler(n_samples=3))
+
+    with pytest.raises(ValueError):
+        processor.process(inputs["scores_file"], inputs["ref_file"], running=lambda: False)
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.core.entities.vocab import EntityVocab
+from matcha_dl.core.values import MATCHERS, SOURCE_COLUMN, TARGET_COLUMN
+from tests.conftest import make_scores
+
+
+def _frame(rows):
+    return pd.DataFrame(
+        [[source, target, *[score] * len(MATCHERS)] for source, target, score in rows],
+        columns=[SOURCE_COLUMN, TARGET_COLUMN, *MATCHERS],
+    )
+
+
+def test_vocab_ids_follow_first_appearance(tmp_path):
+    vocab = EntityVocab()
+
+    assert vocab.add(["b", "a", "b"]).tolist() == [0, 1, 0]
+    assert vocab.add(["c", "a"]).tolist() == [2, 1]
+    assert vocab.ids(["a", "unknown"]).tolist() == [1, -1]
+    assert vocab.decode(np.array([2, 0])).tolist() == ["c", "b"]
+    assert "c" in vocab and "d" not in vocab
+
+    loaded = EntityVocab.load(vocab.save(tmp_path / "vocab.txt"))
+
+    assert loaded.entities.tolist() == ["b", "a", "c"]
+    assert len(EntityVocab.load(EntityVocab().save(tmp_path / "empty.txt"))) == 0
+
+
+def test_duplicated_pairs_keep_the_last_scores():
+    scores = MatchaScores.from_frame(
+        _frame([("s1", "t1", 0.1), ("s1", "t2", 0.2), ("s1", "t1", 0.3)])
+    )
+
+    assert len(scores) == 2
+    assert scores.get("s1", "t1")[0] == pytest.approx(0.3)
+    assert scores.get("s1", "t3") is None
+    assert scores.get("unknown", "t1", default=0) == 0
+
+
+def test_lookup_and_candidates():
+    scores = MatchaScores.from_frame(
+        _frame([("s2", "t1", 0.5), ("s1", "t2", 0.2), ("s1", "t1", 0.9), ("s3", "t3", 0.4)])
+    )
+    vocab = scores.vocab
+
+    features, found = scores.lookup(
+        vocab.ids(["s1", "s1", "s2", "s3"]), vocab.ids(["t1", "t3", "t1", "t9"])
+    )
+
+    assert found.tolist() == [True, False, True, False]
+    np.testing.assert_allclose(features[:, 0], [0.9, 0, 0.5, 0])
+
+    # Candidates are grouped by source in the given order, unknown sources are ignored
+    sources, targets = scores.candidates(vocab.ids(["s3", "unknown", "s1"]))
+
+    assert vocab.decode(sources).tolist() == ["s3", "s1", "s1"]
+    assert sorted(vocab.decode(targets[1:]).tolist()) == ["t1", "t2"]
+
+    top = scores.top_candidates(vocab.ids(["s1", "s2", "unknown"]), 2)
+
+    assert top[0].tolist() == vocab.ids(["t1", "t2"]).tolist()
+    assert top[1].tolist() == [vocab.ids(["t1"])[0], -1]
+    assert top[2].tolist() == [-1, -1]
+
+    assert "s1" in scores and "t1" not in scores
+
+
+def test_entities_interned_after_the_index_have_no_scores():
+    scores = MatchaScores.from_frame(_frame([("s1", "t1", 0.5)]))
+    new = scores.vocab.add(["s9"])
+
+    _, found = scores.lookup(new, scores.vocab.ids(["t1"]))
+
+    assert not found.any()
+    assert "s9" not in scores
+    assert len(scores.candidates(new)[0]) == 0
+
+
+def test_chunks_and_csv_build_the_same_index(tmp_path):
+    df = make_scores()
+    df.to_csv(tmp_path / "scores.csv", index=False)
+
+    expected = MatchaScores.from_frame(df)
+
+    for scores in [
+        MatchaScores.from_chunks([df[i : i + 7] for i in range(0, len(df), 7)]),
+        MatchaScores.from_csv(str(tmp_path / "scores.csv")),
+    ]:
+        assert scores.vocab.entities.equals(expected.vocab.entities)
+        np.testing.assert_array_equal(scores.source_ids, expected.source_ids)
+        np.testing.assert_array_equal(scores.target_ids, expected.target_ids)
+        np.testing.assert_allclose(scores.features, expected.features)
+
+
+def test_diff():
+    vocab = EntityVocab()
+
+    previous = MatchaScores.from_frame(
+        _frame([("s1", "t1", 0.5), ("s2", "t2", 0.5), ("s3", "t3", 0.5)]), vocab=vocab
+    )
+    current = MatchaScores.from_frame(
+        _frame([("s1", "t1", 0.5), ("s2", "t2", 0.7), ("s4", "t4", 0.5)]), vocab=vocab
+    )
+
+    assert vocab.decode(current.diff(previous)).tolist() == ["s2", "s3", "s4"]
+
+    with pytest.raises(ValueError):
+        current.diff(MatchaScores.from_frame(_frame([("s1", "t1", 0.5)])))
+
+
+def test_matrix_is_the_csr_index():
+    scores = MatchaScores.from_frame(make_scores())
+    matrix = scores.matrix()
+
+    assert matrix.shape == (len(scores.vocab), len(scores.vocab))
+    assert matrix.nnz == len(scores)
+
+    sources, targets = scores.source_ids, scores.target_ids
+
+    np.testing.assert_allclose(matrix[sources, targets], scores.features.max(axis=1))
+    np.testing.assert_allclose(scores.matrix(MATCHERS[1])[sources, targets], scores.features[:, 1])
@@ -0,0 +1,163 @@
+import asyncio
+import json
+
+from matcha_dl.core.entities.scores import MatchaScores
+from matcha_dl.delivery.server import RankingServer
+from matcha_dl.impl.service import RankingService
+from tests.conftest import make_scores
+
+FAILING_SOURCE = "s#fail"
+
+
+class FailingService(RankingService):
+    """Fails to score any pair of FAILING_SOURCE."""
+
+    def score(self, sources, targets):
+        if FAILING_SOURCE in list(sources):
+            raise RuntimeError("scoring failed")
+        return super().score(sources, targets)
+
+
+def make_server(**kwargs) -> RankingServer:
+    service = FailingService(MatchaScores.from_frame(make_scores()))
+    return RankingServer(service, port=0, **kwargs)
+
+
+async def request(port: int, path: str, payload=None, body: bytes = None):
+    """Sends a single HTTP request over a new connection, returns the status and JSON body."""
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    if body is None:
+        body = json.dumps(payload).encode() if payload is not None else b""
+
+    method = "GET" if payload is None and not body else "POST"
+
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+
+    head, content = response.split(b"\r\n\r\n", 1)
+
+    return int(head.split(b" ")[1]), json.loads(content)
+
+
+def serve(test, **kwargs):
+    """Runs a test coroutine against a started server."""
+
+    async def main():
+        server = make_server(**kwargs)
+        await server.start()
+
+        try:
+            return await test(server)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_are_batched():
+    async def test(server):
+        queries = [{"source": f"s#{i}", "candidates": [f"t#{i}", "t#0", "t#1"]} for i in range(8)]
+
+        responses = await asyncio.gather(*(request(server.port, "/rank", q) for q in queries))
+
+        for query, (status, answer) in zip(queries, responses):
+            assert status == 200
+            assert answer["source"] == query["source"]
+            assert sorted(c for c, _ in answer["ranking"]) == sorted(query["candidates"])
+
+            scores = [score for _, score in answer["ranking"]]
+            assert scores == sorted(scores, reverse=True)
+
+        return (await request(server.port, "/metrics"))[1]
+
+    metrics = serve(test, max_batch_size=64, max_delay=0.5)
+
+    assert metrics["requests"] == 8
+    assert metrics["batches"] == 1
+    assert metrics["batch_size_max"] == 8
+    assert metrics["batch_size_p50"] == 8
+    assert 0 < metrics["latency_p50_ms"] <= metrics["latency_p99_ms"]
+
+
+def test_batch_size_is_bounded():
+    async def test(server):
+        queries = [{"source": f"s#{i}", "candidates": ["t#0"]} for i in range(6)]
+        await asyncio.gather(*(request(server.port, "/rank", q) for q in queries))
+
+        return (await request(server.port, "/metrics"))[1]
+
+    metrics = serve(test, max_batch_size=4, max_delay=0.5)
+
+    assert metrics["requests"] == 6
+    assert metrics["batch_size_max"] <= 4
+
+
+def test_malformed_queries():
+    async def test(server):
+        return [
+            await request(server.port, "/rank", body=b"{not json"),
+            await request(server.port, "/rank", {"source": 1, "candidates": []}),
+            await request(server.port, "/rank", {"source": "s#0", "candidates": "t#0"}),
+            await request(server.port, "/rank", {"candidates": ["t#0"]}),
+            await request(server.port, "/rank", [{"source": "s#0", "candidates": ["t#0"]}, 3]),
+            await request(server.port, "/unknown", {}),
+            await request(server.port, "/rank"),
+        ]
+
+    statuses = [status for status, _ in serve(test)]
+
+    assert statuses == [400, 400, 400, 400, 400, 404, 405]
+
+
+def test_failing_request_is_isolated():
+    async def test(server):
+        return await asyncio.gather(
+            request(server.port, "/rank", {"source": "s#0", "candidates": ["t#0", "t#1"]}),
+            request(server.port, "/rank", {"source": FAILING_SOURCE, "candidates": ["t#0"]}),
+            request(server.port, "/rank", {"source": "s#1", "candidates": ["t#1"]}),
+        )
+
+    (ok, _), (failed, error), (other, _) = serve(test, max_delay=0.5)
+
+    assert (ok, failed, other) == (200, 500, 200)
+    assert "scoring failed" in error["error"]
+
+
+def test_list_queries():
+    async def test(server):
+        return await request(
+            server.port,
+            "/rank",
+            [{"source": "s#0", "candidates": ["t#0"]}, {"source": "s#1", "candidates": []}],
+        )
+
+    status, answers = serve(test)
+
+    assert status == 200
+    assert [answer["source"] for answer in answers] == ["s#0", "s#1"]
+    assert answers[1]["ranking"] == []
+
+
+def test_server_restarts():
+    async def main():
+        server = make_server()
+
+        for _ in range(2):
+            await server.start()
+
+            status, _ = await request(
+                server.port, "/rank", {"source": "s#0", "candidates": ["t#0"]}
+            )
+            assert status == 200
+
+            await server.stop()
+
+    asyncio.run(main())
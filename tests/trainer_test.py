@@ -0,0 +1,142 @@
+import pytest
+import torch as th
+
+from matcha_dl.core.values import MATCHERS, N_CLASSES
+from matcha_dl.impl.losses.bceloss import BCELossWeighted
+from matcha_dl.impl.models.model import MlpClassifier
+from matcha_dl.impl.negative_sampler import RandomNegativeSampler
+from matcha_dl.impl.processor import MainProcessor
+from matcha_dl.impl.stoppers import EarlyStopping
+from matcha_dl.impl.trainer import MLPTrainer
+
+
+@pytest.fixture
+def dataset(inputs):
+    return MainProcessor(sampler=RandomNegativeSampler(n_samples=3), seed=7).process(
+        inputs["scores_file"], inputs["ref_file"]
+    )
+
+
+def make_trainer(dataset, output_dir, **kwargs) -> MLPTrainer:
+    return MLPTrainer(
+        dataset=dataset,
+        model=MlpClassifier,
+        loss=BCELossWeighted,
+        optimizer=th.optim.Adam,
+        loss_params={"weight": [0.2, 0.8]},
+        optimizer_params={"lr": 0.01},
+        model_params={"layers": [16], "n": len(MATCHERS), "n_classes": N_CLASSES},
+        output_dir=output_dir,
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize(
+    "mode, batch_size", [("minibatch", 16), ("batched", 16), ("batched", None), ("lbfgs", None)]
+)
+def test_training_modes(dataset, tmp_path, mode, batch_size):
+    trainer = make_trainer(dataset, tmp_path)
+    initial = trainer.evaluate("train")["loss"]
+
+    trainer.train(epochs=4, batch_size=batch_size, save_interval=2, mode=mode)
+
+    assert trainer.epoch == 5
+    assert trainer.evaluate("train")["loss"] < initial
+    assert trainer.checkpoints == ["2.pt", "4.pt"]
+
+    if mode == "lbfgs":
+        assert isinstance(trainer.optimizer, th.optim.LBFGS)
+
+
+def test_training_resumes_from_the_last_checkpoint(dataset, tmp_path):
+    make_trainer(dataset, tmp_path).train(epochs=3, batch_size=16, mode="batched")
+
+    trainer = make_trainer(dataset, tmp_path, use_last_checkpoint=True)
+
+    assert trainer.epoch == 4
+
+    trainer.train(epochs=5, batch_size=16, mode="batched")
+
+    assert trainer.epoch == 6
+
+
+def test_unknown_training_mode(dataset, tmp_path):
+    with pytest.raises(ValueError):
+        make_trainer(dataset, tmp_path).train(epochs=1, mode="sgd")
+
+
+def test_data_parallel_matches_single_process(dataset, tmp_path):
+    # Full batches of an even number of rows split into equal shards, so the averaged
+    # gradients of the two processes are the full batch gradients
+    assert dataset.dataframe["train"].sum() % 2 == 0
+
+    # The model is initialized before the trainer seeds torch
+    th.manual_seed(0)
+    single = make_trainer(dataset, tmp_path / "single")
+    single.train(epochs=3, batch_size=None, mode="batched")
+
+    th.manual_seed(0)
+    parallel = make_trainer(dataset, tmp_path / "parallel")
+    parallel.train(epochs=3, batch_size=None, mode="batched", workers=2)
+
+    assert parallel.epoch == single.epoch == 4
+    assert parallel.checkpoints == single.checkpoints == ["3.pt"]
+
+    for name, value in single.model.state_dict().items():
+        th.testing.assert_close(parallel.model.state_dict()[name], value, rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize("mode", ["minibatch", "lbfgs"])
+def test_data_parallel_modes(dataset, tmp_path, mode):
+    trainer = make_trainer(dataset, tmp_path)
+    initial = trainer.evaluate("train")["loss"]
+
+    trainer.train(epochs=2, batch_size=16, mode=mode, workers=2)
+
+    assert trainer.epoch == 3
+    assert trainer.evaluate("train")["loss"] < initial
+    assert trainer.checkpoints == ["2.pt"]
+
+
+def test_validation_split_holds_out_sources(dataset, tmp_path):
+    trainer = make_trainer(dataset, tmp_path)
+    trainer.train(epochs=1, batch_size=16, mode="batched", validation_split=0.25)
+
+    df = trainer.dataset.dataframe
+    train, validation = set(df[df["train"]]["SrcEntity"]), set(df[df["validation"]]["SrcEntity"])
+
+    assert len(validation) == 5
+    assert not train & validation
+    assert 0 < trainer.evaluate("validation")["loss"]
+
+
+def test_early_stopping_restores_the_best_epoch(dataset, tmp_path):
+    # Only the first epoch improves the validation loss
+    th.manual_seed(0)
+    best = make_trainer(dataset, tmp_path / "best")
+    best.train(epochs=1, batch_size=16, mode="batched", validation_split=0.25)
+
+    th.manual_seed(0)
+    trainer = make_trainer(
+        dataset, tmp_path / "stopped", earlystoping=EarlyStopping(tolerance=2, min_delta=1e3)
+    )
+    trainer.train(epochs=10, batch_size=16, mode="batched", validation_split=0.25)
+
+    # Stopped after two epochs without improvement, the last checkpoint holds the best model
+    assert trainer.epoch == 4
+    assert trainer.checkpoints == ["3.pt"]
+
+    for name, value in best.model.state_dict().items():
+        th.testing.assert_close(trainer.model.state_dict()[name], value)
+
+    resumed = make_trainer(dataset, tmp_path / "stopped", use_last_checkpoint=True)
+
+    for name, value in best.model.state_dict().items():
+        th.testing.assert_close(resumed.model.state_dict()[name], value)
+
+
+def test_early_stopping_requires_a_validation_split(dataset, tmp_path):
+    trainer = make_trainer(dataset, tmp_path, earlystoping=EarlyStopping())
+
+    with pytest.raises(ValueError):
+        trainer.train(epochs=1)